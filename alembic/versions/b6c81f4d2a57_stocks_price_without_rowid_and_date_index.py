@@ -0,0 +1,49 @@
+"""stocks price without rowid and date index
+
+Revision ID: b6c81f4d2a57
+Revises: e41b7a6d9c03
+Create Date: 2026-10-18 16:42:09.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6c81f4d2a57'
+down_revision = 'e41b7a6d9c03'
+branch_labels = None
+depends_on = None
+
+COLUMNS = '"Ticker", "Date", "Close", "Volume", "StockSplits", "IndexName"'
+
+
+def _rebuild_stocks_price(with_rowid):
+    # SQLite cannot change a table's rowid setting in place: copy into a new table and swap
+    op.create_table('_STOCKS_PRICE_rebuild',
+    sa.Column('Ticker', sa.String(), nullable=False),
+    sa.Column('Date', sa.Date(), nullable=False),
+    sa.Column('Close', sa.Float(), nullable=True),
+    sa.Column('Volume', sa.Integer(), nullable=True),
+    sa.Column('StockSplits', sa.Integer(), nullable=True),
+    sa.Column('IndexName', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('Ticker', 'Date'),
+    sqlite_with_rowid=with_rowid
+    )
+    op.execute(
+        f'INSERT INTO "_STOCKS_PRICE_rebuild" ({COLUMNS}) '
+        f'SELECT {COLUMNS} FROM "STOCKS_PRICE" ORDER BY "Ticker", "Date"'
+    )
+    op.drop_table('STOCKS_PRICE')
+    op.rename_table('_STOCKS_PRICE_rebuild', 'STOCKS_PRICE')
+
+
+def upgrade():
+    _rebuild_stocks_price(with_rowid=False)
+    op.create_index('ix_STOCKS_PRICE_Date_Ticker_Close', 'STOCKS_PRICE', ['Date', 'Ticker', 'Close'], unique=False)
+    op.execute('ANALYZE "STOCKS_PRICE"')
+
+
+def downgrade():
+    op.drop_index('ix_STOCKS_PRICE_Date_Ticker_Close', table_name='STOCKS_PRICE')
+    _rebuild_stocks_price(with_rowid=True)
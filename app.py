@@ -2,6 +2,12 @@ import dash
 from dash import html, dcc
 import dash_bootstrap_components as dbc
 from components.navbar import create_navbar
+from sqlitedb.connection import ReadOnlySession
+from sqlitedb.read import set_read_session
+
+# The app never writes: read through the read-only engine (query_only, no
+# WAL pragma on connect) while the daily run commits through Session
+set_read_session(ReadOnlySession)
 
 # Initialize Dash app
 app = dash.Dash(
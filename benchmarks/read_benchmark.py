@@ -0,0 +1,89 @@
+"""
+read_data_from_sqlite benchmark: ORM instances vs the raw-cursor columnar path.
+
+Builds a temporary STOCKS_PRICE table (default 4,000 tickers x 250 sessions,
+one million rows) and times a full-table read and a date-window read with
+the old ORM materialization and with the current read_data_from_sqlite.
+
+Usage (from the repository root):
+    python benchmarks/read_benchmark.py --tickers 4000 --days 250 --repeat 3
+"""
+import argparse
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from scanner_benchmark import build_database
+
+from data.trading_calendar import get_trading_calendar
+from sqlitedb.connection import Session
+from sqlitedb.models import StocksPrice
+from sqlitedb.read import read_data_from_sqlite
+
+
+def orm_read(model, date_range=None, columns_to_select=None) -> pd.DataFrame:
+    """The previous read path: ORM instances turned into a DataFrame via __dict__."""
+    session = Session()
+    try:
+        query = session.query(model)
+        if columns_to_select:
+            query = query.with_entities(*[getattr(model, col) for col in columns_to_select])
+        if date_range:
+            query = query.filter(model.Date.between(*date_range))
+        results = query.all()
+        if columns_to_select:
+            return pd.DataFrame(results, columns=columns_to_select)
+        df = pd.DataFrame([item.__dict__ for item in results])
+        return df.drop(columns="_sa_instance_state")
+    finally:
+        session.close()
+
+
+def best_of(repeat: int, fn) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        df = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="read_data_from_sqlite benchmark")
+    parser.add_argument("--tickers", type=int, default=4000)
+    parser.add_argument("--days", type=int, default=250)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    calendar = get_trading_calendar()
+    last_session = calendar.roll_back(date.today())
+    sessions = calendar.trading_days(calendar.shift(last_session, -(args.days - 1)), last_session)
+    window = (sessions[-60], sessions[-1])
+    columns = ["Date", "Ticker", "Close"]
+
+    # (name, case it is compared against, read)
+    cases = [
+        ("orm full table", None, lambda: orm_read(StocksPrice)),
+        ("columnar full table", "orm full table", lambda: read_data_from_sqlite(StocksPrice, use_cache=False)),
+        ("orm window", None, lambda: orm_read(StocksPrice, window, columns)),
+        ("columnar window", "orm window", lambda: read_data_from_sqlite(
+            StocksPrice, date_range=window, columns_to_select=columns, use_cache=False)),
+        ("columnar window, typed", "orm window", lambda: read_data_from_sqlite(
+            StocksPrice, date_range=window, columns_to_select=columns, columnar=True, use_cache=False)),
+    ]
+    with tempfile.TemporaryDirectory(prefix="read_benchmark_") as work_dir:
+        build_database(Path(work_dir) / "read_benchmark.db", args.tickers, sessions)
+        print(f"{args.tickers * len(sessions):,} rows in STOCKS_PRICE")
+        timings = {}
+        for name, baseline, fn in cases:
+            timings[name], df = best_of(args.repeat, fn)
+            memory = df.memory_usage(deep=True).sum() / 2**20
+            speedup = f"x{timings[baseline] / timings[name]:.1f}" if baseline else ""
+            print(f"{name:<26}{timings[name]:>8.2f}s {len(df):>11,} rows {memory:>8.1f} MiB  {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Scanner benchmark suite.
+
+Generates synthetic price histories into a temporary SQLite database built
+from the project models, times each pipeline stage at several universe sizes
+and history lengths, and appends the numbers to benchmarks/history.json so
+regressions between commits show up as numbers.
+
+Usage (from the repository root):
+    python benchmarks/scanner_benchmark.py --sizes 500 5000 50000 --history-days 260 520
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+# data/main.py imports its siblings as top-level modules, like when run as a script
+sys.path.insert(0, str(REPO_ROOT / "data"))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from sqlitedb.connection import Session  # noqa: E402
+from sqlitedb.models import Base, IndexPrice, StocksPrice  # noqa: E402
+from sqlitedb.query_cache import QueryCache, set_query_cache  # noqa: E402
+from data.trading_calendar import get_trading_calendar  # noqa: E402
+
+HISTORY_PATH = REPO_ROOT / "benchmarks" / "history.json"
+LOOKBACK_PERIODS = ["1d", "3d", "5d", "14d", "21d", "1mo", "2mo", "3mo", "4mo", "5mo", "6mo", "1y"]
+THRESHOLDS = [0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 1, 2]
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    started = time.perf_counter()
+    yield
+    timings[stage] = round(time.perf_counter() - started, 4)
+    print(f"  {stage:<28} {timings[stage]:>10.3f}s")
+
+
+def generate_prices(tickers: List[str], sessions: List[date], seed: int = 0) -> pd.DataFrame:
+    """Random-walk closes for every ticker on every session, as STOCKS_PRICE rows."""
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0.0003, 0.02, (len(sessions), len(tickers)))
+    closes = rng.uniform(10, 500, len(tickers)) * np.exp(np.cumsum(log_returns, axis=0))
+    return pd.DataFrame({
+        "Ticker": np.tile(tickers, len(sessions)),
+        "Date": np.repeat(np.array(sessions, dtype=object), len(tickers)),
+        "Close": closes.ravel(),
+        "Volume": rng.integers(100_000, 10_000_000, closes.size),
+        "StockSplits": 0,
+    })
+
+
+def build_database(db_path: Path, n_tickers: int, sessions: List[date]) -> List[str]:
+    """Create the schema in a fresh SQLite file, bind the app Session to it and load prices."""
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    Session.configure(bind=engine)
+    tickers = [f"S{i:05d}" for i in range(n_tickers)]
+    generate_prices(tickers, sessions).to_sql(
+        StocksPrice.__tablename__, engine, if_exists="append", index=False, chunksize=50_000
+    )
+    index_df = generate_prices(["^GSPC", "^IXIC"], sessions, seed=1)
+    index_df["Name"] = index_df["Ticker"]
+    index_df.drop(columns=["Volume", "StockSplits"]).to_sql(
+        IndexPrice.__tablename__, engine, if_exists="append", index=False
+    )
+    return tickers
+
+
+def run_case(n_tickers: int, history_days: int, work_dir: Path) -> Dict[str, float]:
+    import main as pipeline
+    from data.report_generating import filter_data_by_thresholds, generate_excel_report
+    from data.return_engine import (
+        PERIOD_DAYS,
+        calculate_returns_matrix,
+        get_lookback_window_start,
+        load_close_matrix,
+    )
+
+    calendar = get_trading_calendar()
+    report_date = calendar.roll_back(date.today())
+    sessions = calendar.sessions[calendar.sessions.index(report_date) - history_days + 1:][:history_days]
+    report_ts = pd.Timestamp(report_date)
+    timings: Dict[str, float] = {}
+    print(f"{n_tickers} tickers x {history_days} days")
+    # get_top_gainers reads the same window again; time it against SQLite, not the query cache
+    set_query_cache(QueryCache(max_bytes=0))
+
+    with timed(timings, "generate_database"):
+        tickers = build_database(work_dir / f"bench_{n_tickers}_{history_days}.db", n_tickers, sessions)
+
+    with timed(timings, "load_close_matrix"):
+        close_matrix = load_close_matrix(
+            StocksPrice,
+            tickers,
+            get_lookback_window_start(report_ts, LOOKBACK_PERIODS, PERIOD_DAYS),
+            report_ts,
+        )
+
+    with timed(timings, "calculate_returns_matrix"):
+        calculate_returns_matrix(close_matrix, LOOKBACK_PERIODS, PERIOD_DAYS, report_ts)
+
+    # The per-ticker path is timed on a sample and scaled, it is too slow at 50k
+    sample = tickers[:min(len(tickers), 500)]
+    long_df = close_matrix[sample].stack().rename("Close").reset_index()
+    long_df.columns = ["Date", "Ticker", "Close"]
+    long_df["Date"] = long_df["Date"].dt.date
+    per_ticker = {ticker: df for ticker, df in long_df.groupby("Ticker")}
+    with timed(timings, "calculate_returns_sample"):
+        for ticker in sample:
+            pipeline.calculate_returns(
+                per_ticker[ticker], LOOKBACK_PERIODS, PERIOD_DAYS, ticker, report_ts
+            )
+    timings["calculate_returns_scaled"] = round(
+        timings["calculate_returns_sample"] * len(tickers) / len(sample), 4
+    )
+
+    with timed(timings, "get_top_gainers"):
+        top_gainers = pipeline.get_top_gainers(
+            tickers,
+            LOOKBACK_PERIODS,
+            mode="db_rerun",
+            all_tickers=set(tickers),
+            start_date=report_ts,
+            end_date=report_ts + pd.Timedelta(days=1),
+            use_snapshot_cache=False,
+        )
+
+    top_gainers["CompanyName"] = top_gainers["Ticker"]
+    top_gainers["Sector"] = "Synthetic"
+    top_gainers["Industry"] = "Synthetic"
+    columns = ["Ticker", "CompanyName", "Sector", "Industry"]
+    with timed(timings, "filter_data_by_thresholds"):
+        for period in LOOKBACK_PERIODS:
+            filter_data_by_thresholds(
+                THRESHOLDS, THRESHOLDS, period, top_gainers,
+                columns + [f"{period}_return", f"{period}_SP500_return"],
+            )
+
+    os.makedirs(work_dir / "reports", exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        with timed(timings, "generate_excel_report"):
+            generate_excel_report(
+                top_gainers, LOOKBACK_PERIODS, THRESHOLDS, THRESHOLDS,
+                report_date.strftime("%Y-%m-%d"), columns, "benchmark",
+            )
+    except ImportError as e:
+        print(f"  generate_excel_report skipped: {e}")
+    finally:
+        os.chdir(cwd)
+    return timings
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def record_results(results: List[dict], history_path: Path = HISTORY_PATH) -> None:
+    history = []
+    if history_path.exists():
+        history = json.loads(history_path.read_text())
+    history.append({
+        "commit": current_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    })
+    history_path.write_text(json.dumps(history, indent=2))
+    print(f"Results appended to {history_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scanner benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000, 50000],
+                        help="Universe sizes (number of tickers)")
+    parser.add_argument("--history-days", type=int, nargs="+", default=[260],
+                        help="History lengths in trading sessions")
+    parser.add_argument("--history-file", type=Path, default=HISTORY_PATH,
+                        help="JSON file the results are appended to")
+    args = parser.parse_args()
+
+    # main.py reads its static inputs relative to the repository root at import
+    os.chdir(REPO_ROOT)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="scanner_benchmark_") as work_dir:
+        for history_days in args.history_days:
+            for n_tickers in args.sizes:
+                timings = run_case(n_tickers, history_days, Path(work_dir))
+                results.append({"tickers": n_tickers, "history_days": history_days, "timings": timings})
+    record_results(results, args.history_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,26 @@ def stock_filters():
             id='stock-exchange-dropdown',
             options=[
                 {'label': 'NASDAQ', 'value': 'NASDAQ'},
-                {'label': 'NYSE', 'value': 'NYSE'}
+                {'label': 'S&P 500', 'value': 'SP500'}
             ],
             value='NASDAQ'
         ),
         html.Br(),
-        html.Label("Percentage Increase (Yearly):"),
+        html.Label("Return Window:"),
+        dcc.Dropdown(
+            id='return-window-dropdown',
+            options=[
+                {'label': '1 Month', 'value': '1mo'},
+                {'label': '3 Months', 'value': '3mo'},
+                {'label': '6 Months', 'value': '6mo'},
+                {'label': 'Year to Date', 'value': 'ytd'},
+                {'label': '1 Year', 'value': '1y'},
+                {'label': '2 Years', 'value': '2y'}
+            ],
+            value='1y'
+        ),
+        html.Br(),
+        html.Label("Percentage Increase:"),
         dcc.Input(
             id='percentage-increase',
             type='number',
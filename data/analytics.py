@@ -0,0 +1,339 @@
+"""
+In-process DuckDB analytics over the price store.
+
+Screens such as "top gainers by sector over 3 months" run as SQL over
+vectorized, multi-threaded DuckDB scans instead of pandas over whole
+tables. Prices come from the Parquet store when PRICE_STORE=parquet and it
+has been populated, otherwise from the SQLite file attached read-only.
+Holdings (sector, industry, company name) are small and are read from
+SQLite. When DuckDB cannot attach SQLite, prices are loaded into memory
+instead; those frames and the holdings are read again once the SQLite file
+(or its WAL) changes, so a long-running Dash app sees each ingest.
+
+Window returns follow calculate_returns_matrix: each period's lookback close
+is the first stored close among the session and its neighbours from the
+trading calendar. A missing lookback gives a return of 0, and tickers with
+no close on the report date are left out.
+
+duckdb is optional; get_analytics_engine() raises ImportError without it.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+from data.return_engine import PERIOD_DAYS, get_lookback_table
+from sqlitedb.connection import DATABASE_PATH
+from sqlitedb.models import NASDAQHoldings, SP500Holdings
+from sqlitedb.read import read_data_from_sqlite
+from sqlitedb.storage import PARQUET_STORE_DIR, ParquetStore
+
+logger = logging.getLogger('stock_analytics')
+
+# DuckDB worker threads, all cores when unset
+ANALYTICS_THREADS = os.getenv("ANALYTICS_THREADS")
+# Holdings tables per screener universe
+UNIVERSES = {"SP500": SP500Holdings, "NASDAQ": NASDAQHoldings}
+
+
+class AnalyticsEngine:
+    """
+    DuckDB connection exposing the views stock_prices and index_prices
+    (Ticker, Date, Close) and holdings (Ticker, Sector, Industry,
+    CompanyName, Universe), plus the screener queries built on them.
+    """
+
+    def __init__(self, database_path: str = DATABASE_PATH, parquet_dir: Optional[Path] = None):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("The analytics engine needs duckdb: pip install duckdb") from e
+        config = {"threads": int(ANALYTICS_THREADS)} if ANALYTICS_THREADS else {}
+        self.connection = duckdb.connect(":memory:", config=config)
+        self._lock = threading.Lock()
+        self.database_path = database_path
+        self.parquet_dir = Path(parquet_dir or PARQUET_STORE_DIR)
+        self._signature = self._database_signature()
+        self.source = self._create_price_views()
+        self.refresh_holdings()
+        logger.info(f"Analytics engine reading prices from {self.source}.")
+
+    def _create_price_views(self) -> str:
+        tables = {"stock_prices": "STOCKS_PRICE", "index_prices": "INDEX_PRICE"}
+        use_parquet = os.getenv("PRICE_STORE") == ParquetStore.name and all(
+            any((self.parquet_dir / table).glob("**/*.parquet")) for table in tables.values()
+        )
+        if use_parquet:
+            for view, table in tables.items():
+                files = (self.parquet_dir / table).as_posix() + "/**/*.parquet"
+                self.connection.execute(
+                    f"CREATE VIEW {view} AS SELECT Ticker, Date, Close "
+                    f"FROM read_parquet('{files}', hive_partitioning = true)"
+                )
+            return f"parquet {self.parquet_dir}"
+        try:
+            self.connection.execute(
+                f"ATTACH '{Path(self.database_path).as_posix()}' AS price_db (TYPE sqlite, READ_ONLY)"
+            )
+        except Exception as e:
+            # The sqlite extension is downloaded on first use; without it the
+            # prices are loaded once through the columnar SQLite reader
+            logger.warning(f"Could not attach SQLite to DuckDB ({e}), loading prices into memory.")
+            self._load_price_frames()
+            for view in tables:
+                self.connection.execute(
+                    f"CREATE VIEW {view} AS SELECT Ticker, CAST(Date AS DATE) AS Date, Close FROM {view}_frame"
+                )
+            return "memory"
+        for view, table in tables.items():
+            self.connection.execute(
+                f"CREATE VIEW {view} AS SELECT Ticker, CAST(Date AS DATE) AS Date, Close FROM price_db.{table}"
+            )
+        return f"sqlite {self.database_path}"
+
+    def _database_signature(self) -> tuple:
+        """Modification time and size of the SQLite file and its WAL, which commits go to first."""
+        signature = []
+        for path in (Path(self.database_path), Path(f"{self.database_path}-wal")):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load_price_frames(self) -> None:
+        """Register the stored closes as the frames behind the in-memory price views."""
+        from sqlitedb.models import IndexPrice, StocksPrice
+
+        for view, model in {"stock_prices": StocksPrice, "index_prices": IndexPrice}.items():
+            # DuckDB holds the frame, so the query cache keeps no second copy
+            frame = read_data_from_sqlite(
+                model, columns_to_select=["Ticker", "Date", "Close"], columnar=True, use_cache=False
+            )
+            frame["Ticker"] = frame["Ticker"].astype(str)
+            self.connection.register(f"{view}_frame", frame)
+
+    def refresh(self) -> bool:
+        """
+        Reload holdings, and in-memory prices, if the SQLite file changed since
+        they were read. Attached SQLite and Parquet views read live data.
+
+        Returns:
+            bool: Whether anything was reloaded.
+        """
+        signature = self._database_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        if self.source == "memory":
+            with self._lock:
+                self._load_price_frames()
+        self.refresh_holdings()
+        logger.info(f"Reloaded analytics data after {self.database_path} changed.")
+        return True
+
+    def refresh_holdings(self) -> None:
+        """Reload sector and industry data, e.g. after the holdings tables are refreshed."""
+        frames = []
+        for universe, model in UNIVERSES.items():
+            holdings_df = read_data_from_sqlite(model, columns_to_select=["Ticker", "Sector", "Industry", "CompanyName"])
+            frames.append(holdings_df.assign(Universe=universe))
+        # A ticker in both lists keeps its S&P 500 classification, as in enrich_with_sector_industry
+        holdings_df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=["Ticker"])
+        with self._lock:
+            self.connection.register("holdings", holdings_df)
+
+    def query(self, sql: str, params: Optional[list] = None, **frames: pd.DataFrame) -> pd.DataFrame:
+        """
+        Run SQL and return the result as a DataFrame.
+
+        Parameters:
+            sql (str): Query over stock_prices, index_prices, holdings and the given frames.
+            params (Optional[list]): Positional ? parameters.
+            **frames (pd.DataFrame): Frames registered under their keyword for this query.
+
+        Returns:
+            pd.DataFrame: Query result.
+        """
+        self.refresh()
+        with self._lock:
+            for name, frame in frames.items():
+                self.connection.register(name, frame)
+            try:
+                return self.connection.execute(sql, params or []).df()
+            finally:
+                for name in frames:
+                    self.connection.unregister(name)
+
+    def latest_date(self) -> Optional[pd.Timestamp]:
+        latest = self.query("SELECT max(Date) AS Date FROM stock_prices")["Date"].iloc[0]
+        return None if pd.isna(latest) else pd.Timestamp(latest)
+
+    def _returns_sql(self, periods: List[str], universe: Optional[str]) -> str:
+        """CTEs report, lookback_close and returns for the given periods."""
+        universe_filter = ""
+        if universe is not None:
+            if universe not in UNIVERSES:
+                raise ValueError(f"Unknown universe '{universe}', expected one of {list(UNIVERSES)}")
+            universe_filter = f"AND Ticker IN (SELECT Ticker FROM holdings WHERE Universe = '{universe}')"
+        return_columns = ",\n".join(
+            f"""        coalesce(round(r.ReportClose / max(lc.LookbackClose) FILTER (WHERE lc.Period = '{period}') - 1, 4), 0)
+            AS "{period}_return\""""
+            for period in periods
+        )
+        return f"""
+WITH report AS (
+    SELECT Ticker, Close AS ReportClose
+    FROM stock_prices
+    WHERE Date = CAST(? AS DATE) AND Close IS NOT NULL
+        AND (NOT ? OR Ticker IN (SELECT Ticker FROM screen_tickers))
+        {universe_filter}
+),
+lookback_close AS (
+    -- First stored close in the lookback session's candidate order
+    SELECT l.Period, p.Ticker, arg_min(p.Close, l.Rank) AS LookbackClose
+    FROM lookback AS l
+    JOIN stock_prices AS p ON p.Date = l.LookbackDate
+    WHERE p.Close IS NOT NULL AND p.Ticker IN (SELECT Ticker FROM report)
+    GROUP BY l.Period, p.Ticker
+),
+returns AS (
+    SELECT r.Ticker,
+{return_columns}
+    FROM report AS r
+    LEFT JOIN lookback_close AS lc ON lc.Ticker = r.Ticker
+    GROUP BY r.Ticker, r.ReportClose
+)"""
+
+    def _run_returns_query(self, select_sql: str, periods: List[str], report_date, tickers, universe,
+                           params: Optional[list] = None) -> pd.DataFrame:
+        if report_date is None:
+            report_date = self.latest_date()
+            if report_date is None:
+                return pd.DataFrame(columns=["Ticker"] + [f"{period}_return" for period in periods])
+        report_date = pd.Timestamp(report_date).date()
+        lookback_table = get_lookback_table(report_date, PERIOD_DAYS)
+        lookback_df = pd.DataFrame(
+            [
+                (period, rank, pd.Timestamp(lookback_date))
+                for period in periods
+                for rank, lookback_date in enumerate(lookback_table[period])
+            ],
+            columns=["Period", "Rank", "LookbackDate"],
+        )
+        lookback_df["LookbackDate"] = lookback_df["LookbackDate"].dt.date
+        screen_tickers = pd.DataFrame({"Ticker": pd.Series(list(tickers or []), dtype=object)})
+        sql = self._returns_sql(periods, universe) + "\n" + select_sql
+        return self.query(
+            sql,
+            [report_date.isoformat(), tickers is not None] + (params or []),
+            lookback=lookback_df,
+            screen_tickers=screen_tickers,
+        )
+
+    def window_returns(self, periods: List[str], report_date=None, tickers: Optional[List[str]] = None,
+                       universe: Optional[str] = None) -> pd.DataFrame:
+        """
+        Returns per ticker over each period, like get_top_gainers without benchmarks.
+
+        Parameters:
+            periods (List[str]): Periods from PERIOD_DAYS, e.g. ['1d', '1mo', '3mo'].
+            report_date: Date the returns are measured up to, the latest stored date by default.
+            tickers (Optional[List[str]]): Tickers to screen, every stored ticker when omitted.
+            universe (Optional[str]): Restrict to a holdings universe ('SP500' or 'NASDAQ').
+
+        Returns:
+            pd.DataFrame: Ticker and a '<period>_return' column per period, sorted by
+                the first period's return, descending.
+        """
+        return self._run_returns_query(
+            f'SELECT * FROM returns ORDER BY "{periods[0]}_return" DESC, Ticker',
+            periods, report_date, tickers, universe,
+        )
+
+    def sector_returns(self, period: str, report_date=None, tickers: Optional[List[str]] = None,
+                       universe: Optional[str] = None) -> pd.DataFrame:
+        """
+        Return statistics per sector over one period.
+
+        Returns:
+            pd.DataFrame: Sector, Tickers, MeanReturn, MedianReturn, BestTicker and
+                BestReturn, sorted by MeanReturn, descending.
+        """
+        column = f'"{period}_return"'
+        return self._run_returns_query(
+            f"""
+SELECT coalesce(h.Sector, 'N/A') AS Sector,
+    count(*) AS Tickers,
+    round(avg(r.{column}), 4) AS MeanReturn,
+    round(median(r.{column}), 4) AS MedianReturn,
+    arg_max(r.Ticker, r.{column}) AS BestTicker,
+    max(r.{column}) AS BestReturn
+FROM returns AS r
+LEFT JOIN holdings AS h ON h.Ticker = r.Ticker
+GROUP BY ALL
+ORDER BY MeanReturn DESC""",
+            [period], report_date, tickers, universe,
+        )
+
+    def top_gainers_by_sector(self, period: str, top_n: int = 5, report_date=None,
+                              tickers: Optional[List[str]] = None, universe: Optional[str] = None) -> pd.DataFrame:
+        """
+        The top_n tickers by return within each sector.
+
+        Returns:
+            pd.DataFrame: Sector, SectorRank, Ticker, CompanyName, Industry and the
+                period's return column, ordered by sector and rank.
+        """
+        column = f'"{period}_return"'
+        return self._run_returns_query(
+            f"""
+SELECT *
+FROM (
+    SELECT coalesce(h.Sector, 'N/A') AS Sector,
+        rank() OVER (PARTITION BY coalesce(h.Sector, 'N/A') ORDER BY r.{column} DESC) AS SectorRank,
+        r.Ticker, h.CompanyName, h.Industry, r.{column}
+    FROM returns AS r
+    LEFT JOIN holdings AS h ON h.Ticker = r.Ticker
+)
+WHERE SectorRank <= ?
+ORDER BY Sector, SectorRank, Ticker""",
+            [period], report_date, tickers, universe, params=[top_n],
+        )
+
+    def screen(self, period: str, min_return: float, report_date=None, universe: Optional[str] = None) -> pd.DataFrame:
+        """
+        Tickers whose return over period is at least min_return, with their sector.
+
+        Returns:
+            pd.DataFrame: Ticker, CompanyName, Sector, Industry and the period's return
+                column, sorted by return, descending.
+        """
+        column = f'"{period}_return"'
+        return self._run_returns_query(
+            f"""
+SELECT r.Ticker, h.CompanyName, h.Sector, h.Industry, r.{column}
+FROM returns AS r
+LEFT JOIN holdings AS h ON h.Ticker = r.Ticker
+WHERE r.{column} >= ?
+ORDER BY r.{column} DESC, r.Ticker""",
+            [period], report_date, None, universe, params=[min_return],
+        )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+_ANALYTICS_ENGINE: Optional[AnalyticsEngine] = None
+
+
+def get_analytics_engine() -> AnalyticsEngine:
+    """Process-wide analytics engine, created on first use."""
+    global _ANALYTICS_ENGINE
+    if _ANALYTICS_ENGINE is None:
+        _ANALYTICS_ENGINE = AnalyticsEngine()
+    return _ANALYTICS_ENGINE
@@ -0,0 +1,200 @@
+"""
+Gap-aware backfill planning for StocksPrice.
+
+One GROUP BY query over the lookback horizon gives each ticker's first and
+last stored date and row count within it. The count is compared with the trading
+calendar, and only tickers that come up short have their dates read to find the
+missing sessions. Missing sessions become contiguous date ranges, and tickers that
+need exactly the same range share one batched download.
+
+Sessions that are fetched but never arrive (trading halts, delistings,
+listings on exchanges with other holidays) would otherwise be planned again
+every day. record_backfill_attempts() stores the last session each ticker has
+received rows through, and missing sessions up to it are not planned again.
+"""
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from data.instrumentation import span
+from data.trading_calendar import get_trading_calendar
+from sqlitedb.models import BackfillAttempt, StocksPrice
+from sqlitedb.read import read_data_from_sqlite, read_date_coverage, read_ticker_window
+from sqlitedb.write import bulk_upsert_data_to_sqlite
+
+logger = logging.getLogger('stock_analytics')
+
+# How far back internal gaps are looked for; covers the longest report period
+BACKFILL_LOOKBACK_DAYS = int(os.getenv("BACKFILL_LOOKBACK_DAYS", "400"))
+
+
+@dataclass
+class FetchRange:
+    """Sessions to download for a group of tickers, end_date exclusive like Ticker.history()."""
+
+    start_date: date
+    end_date: date
+    tickers: List[str] = field(default_factory=list)
+
+
+def missing_session_ranges(stored_dates: List[date], sessions: List[date]) -> List[Tuple[date, date]]:
+    """
+    Contiguous runs of sessions with no stored row.
+
+    Parameters:
+        stored_dates (List[date]): Dates stored for one ticker.
+        sessions (List[date]): Sessions that should be stored, ascending.
+
+    Returns:
+        List[Tuple[date, date]]: (first missing session, last missing session) per run.
+    """
+    stored = set(stored_dates)
+    ranges = []
+    run_start = run_end = None
+    for session in sessions:
+        if session in stored:
+            if run_start is not None:
+                ranges.append((run_start, run_end))
+                run_start = None
+            continue
+        if run_start is None:
+            run_start = session
+        run_end = session
+    if run_start is not None:
+        ranges.append((run_start, run_end))
+    return ranges
+
+
+def read_attempted_through(tickers: List[str]) -> Dict[str, date]:
+    """Last session each of the tickers has been fetched through, for tickers fetched before."""
+    attempts = read_data_from_sqlite(BackfillAttempt)
+    attempts = attempts[attempts["Ticker"].isin(set(tickers))]
+    return dict(zip(attempts["Ticker"], attempts["AttemptedThrough"]))
+
+
+def record_backfill_attempts(fetched: List[Tuple[FetchRange, Dict[str, Optional[date]]]]) -> int:
+    """
+    Remember how far each ticker has been fetched, so plan_backfill does not
+    plan sessions that did not arrive again.
+
+    A ticker counts as fetched through the last session it received rows for.
+    Once a download of one of its ranges raises, its later ranges are not
+    counted, so the sessions of the failed range are planned again. Tickers
+    that received no rows at all are not recorded.
+
+    Parameters:
+        fetched (List[Tuple[FetchRange, Dict[str, Optional[date]]]]): Each planned
+            range, in plan order, with the last date received per ticker whose
+            download did not raise (None when it came back without rows).
+
+    Returns:
+        int: Number of tickers recorded.
+    """
+    attempted: Dict[str, date] = {}
+    failed = set()
+    for fetch_range, last_received in fetched:
+        for ticker in fetch_range.tickers:
+            if ticker in failed:
+                continue
+            if ticker not in last_received:
+                failed.add(ticker)
+                continue
+            received = last_received[ticker]
+            if received is not None:
+                attempted[ticker] = max(attempted.get(ticker, received), received)
+    if not attempted:
+        return 0
+    # Never move a ticker's attempt back, e.g. when an earlier date is replayed
+    for ticker, stored in read_attempted_through(list(attempted)).items():
+        attempted[ticker] = max(attempted[ticker], stored)
+    bulk_upsert_data_to_sqlite(
+        BackfillAttempt,
+        pd.DataFrame({"Ticker": list(attempted), "AttemptedThrough": list(attempted.values())}),
+    )
+    return len(attempted)
+
+
+def plan_backfill(
+    tickers: List[str],
+    target_date: date,
+    model=StocksPrice,
+    lookback_days: Optional[int] = None,
+) -> List[FetchRange]:
+    """
+    Minimal set of fetch ranges that brings the tickers up to target_date.
+
+    Covers the tail after each ticker's last stored date and any internal
+    gap within the lookback horizon, leaving out sessions the ticker has
+    already been fetched through. Tickers with no stored rows are left to
+    the caller's initial load.
+
+    Parameters:
+        tickers (List[str]): Tickers already stored in model.
+        target_date (date): Last session that should be stored.
+        model: SQLAlchemy ORM model holding Date/Ticker rows.
+        lookback_days (Optional[int]): Internal gap horizon, defaults to BACKFILL_LOOKBACK_DAYS.
+
+    Returns:
+        List[FetchRange]: Ranges in date order, each with the tickers that need it.
+    """
+    lookback_days = BACKFILL_LOOKBACK_DAYS if lookback_days is None else lookback_days
+    calendar = get_trading_calendar()
+    target_date = calendar.roll_back(target_date)
+    horizon_start = target_date - timedelta(days=lookback_days)
+
+    with span("db_read", tickers=len(tickers)) as read_span:
+        coverage = read_date_coverage(model, since=horizon_start)
+        coverage = coverage[coverage["Ticker"].isin(set(tickers))]
+        attempted_through = read_attempted_through(tickers)
+
+        expected_sessions: Dict[str, List[date]] = {}
+        short_tickers = []
+        for ticker, first_date, last_date, rows in coverage.itertuples(index=False):
+            sessions = calendar.trading_days(max(first_date, horizon_start), target_date)
+            attempted = attempted_through.get(ticker)
+            expected_sessions[ticker] = [session for session in sessions if attempted is None or session > attempted]
+            stored_sessions = len(calendar.trading_days(max(first_date, horizon_start), last_date))
+            if rows < stored_sessions:
+                short_tickers.append(ticker)
+
+        stored_dates: Dict[str, List[date]] = {}
+        if short_tickers:
+            dates_df = read_ticker_window(
+                model, short_tickers, horizon_start, target_date, columns_to_select=["Ticker", "Date"]
+            )
+            read_span.rows += len(dates_df)
+            for ticker, ticker_dates in dates_df.groupby("Ticker")["Date"]:
+                stored_dates[ticker] = ticker_dates.tolist()
+
+    ranges: Dict[Tuple[date, date], List[str]] = {}
+    # Tickers with no row inside the horizon are missing all of it
+    horizon_sessions = calendar.trading_days(horizon_start, target_date)
+    for ticker in sorted(set(tickers) - set(coverage["Ticker"])):
+        attempted = attempted_through.get(ticker)
+        sessions = [session for session in horizon_sessions if attempted is None or session > attempted]
+        if sessions:
+            ranges.setdefault((sessions[0], sessions[-1]), []).append(ticker)
+    for ticker, first_date, last_date, rows in coverage.itertuples(index=False):
+        sessions = expected_sessions[ticker]
+        if ticker in stored_dates:
+            missing = missing_session_ranges(stored_dates[ticker], sessions)
+        else:
+            tail = [session for session in sessions if session > last_date]
+            missing = [(tail[0], tail[-1])] if tail else []
+        for first_missing, last_missing in missing:
+            ranges.setdefault((first_missing, last_missing), []).append(ticker)
+
+    plan = [
+        FetchRange(first_missing, last_missing + timedelta(days=1), range_tickers)
+        for (first_missing, last_missing), range_tickers in sorted(ranges.items())
+    ]
+    logger.info(
+        f"Backfill plan to {target_date}: {len(plan)} ranges, "
+        f"{sum(len(fetch_range.tickers) for fetch_range in plan)} ticker ranges, "
+        f"{len(short_tickers)} tickers with internal gaps."
+    )
+    return plan
@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger('stock_analytics')
+
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "60"))
+
+# Cancellation flag of the task running on the current worker thread
+_task = threading.local()
+
+
+class _TaskState:
+    """When a submitted fetch started running, and whether it was cancelled."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.started_at: Optional[float] = None
+        self.cancelled = threading.Event()
+
+
+@dataclass
+class FetchResult:
+    ticker: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    latency: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def fetch_cancelled() -> bool:
+    """
+    True when the fetch running on this thread has timed out and been
+    reported as failed. fetch_fn checks it before writing, so a late result is
+    dropped instead of landing in SQLite while later stages read.
+    """
+    cancelled = getattr(_task, "cancelled", None)
+    return cancelled is not None and cancelled.is_set()
+
+
+def _timed_call(fetch_fn: Callable[[str], Any], ticker: str, state: _TaskState) -> FetchResult:
+    started = time.perf_counter()
+    state.started_at = started
+    state.started.set()
+    _task.cancelled = state.cancelled
+    try:
+        value = fetch_fn(ticker)
+    except Exception as e:
+        return FetchResult(ticker, error=e, latency=time.perf_counter() - started)
+    finally:
+        _task.cancelled = None
+    return FetchResult(ticker, value=value, latency=time.perf_counter() - started)
+
+
+def log_latency_summary(results: List[FetchResult], top_n: int = 5) -> None:
+    """Log mean/max fetch latency and the slowest tickers so concurrency can be tuned."""
+    if not results:
+        return
+    latencies = sorted(results, key=lambda result: result.latency, reverse=True)
+    mean_latency = sum(result.latency for result in results) / len(results)
+    slowest = ", ".join(f"{result.ticker}={result.latency:.2f}s" for result in latencies[:top_n])
+    logger.info(
+        f"Fetched {len(results)} tickers, mean latency {mean_latency:.2f}s, "
+        f"max {latencies[0].latency:.2f}s. Slowest: {slowest}"
+    )
+
+
+def run_fetch_stage(
+    tickers: List[str],
+    fetch_fn: Callable[[str], Any],
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[FetchResult]:
+    """
+    Run fetch_fn for every ticker on a bounded thread pool.
+
+    Results come back in the same order as tickers. A ticker that raises or
+    does not finish within timeout seconds of starting to run is logged and
+    returned with its error set; the other tickers are unaffected. Time spent
+    queued for a worker does not count against the timeout.
+    A timed-out call keeps running, but fetch_cancelled() turns True on its
+    thread so it can skip its write. fetch_fn can be any callable, so the
+    stage runs offline against a stub.
+
+    Parameters:
+        tickers (List[str]): Tickers to fetch.
+        fetch_fn (Callable[[str], Any]): Called once per ticker.
+        max_workers (Optional[int]): Worker threads, defaults to FETCH_MAX_WORKERS.
+        timeout (Optional[float]): Per-ticker timeout in seconds, defaults to FETCH_TIMEOUT.
+
+    Returns:
+        List[FetchResult]: One result per ticker, including its latency in seconds.
+    """
+    max_workers = max_workers or FETCH_MAX_WORKERS
+    timeout = timeout or FETCH_TIMEOUT
+    results = []
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+    try:
+        states = [_TaskState() for _ in tickers]
+        futures = [
+            executor.submit(_timed_call, fetch_fn, ticker, state)
+            for ticker, state in zip(tickers, states)
+        ]
+        for count, (ticker, future, state) in enumerate(zip(tickers, futures, states), start=1):
+            try:
+                # The deadline runs from when the task started, not from when
+                # collection reached it; a queued task waits for its worker
+                state.started.wait()
+                remaining = state.started_at + timeout - time.perf_counter()
+                result = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                state.cancelled.set()
+                future.cancel()
+                result = FetchResult(
+                    ticker,
+                    error=TimeoutError(f"timed out after {timeout}s"),
+                    latency=timeout,
+                )
+            if not result.ok:
+                logger.error(f"Error fetching data for {ticker}: {result.error}")
+                print(f"Error fetching data for {ticker}: {result.error}")
+            else:
+                print(f"Processed {count} tickers.")
+            results.append(result)
+    finally:
+        # Do not block on requests that already timed out; they skip their writes
+        executor.shutdown(wait=False, cancel_futures=True)
+    log_latency_summary(results)
+    return results
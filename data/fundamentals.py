@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from typing import List, Optional
+
+import pandas as pd
+
+from data.fetch_stage import run_fetch_stage
+from data.providers import get_provider
+from sqlitedb.models import TickerInfo
+from sqlitedb.read import read_data_from_sqlite
+from sqlitedb.write import bulk_upsert_data_to_sqlite
+
+logger = logging.getLogger('stock_analytics')
+
+FUNDAMENTALS_TTL_DAYS = int(os.getenv("FUNDAMENTALS_TTL_DAYS", "7"))
+
+# TickerInfo column -> yfinance info key, with the value stored when it is missing
+INFO_FIELDS = {
+    "CompanyName": ("longName", "N/A"),
+    "Sector": ("sector", "N/A"),
+    "Industry": ("industry", "N/A"),
+    "Country": ("country", "N/A"),
+    "MarketCap": ("marketCap", None),
+    "PERatio": ("trailingPE", None),
+    "ForwardPERatio": ("forwardPE", None),
+    "Dividend": ("dividendYield", None),
+    "ROE": ("returnOnEquity", None),
+    "ROA": ("returnOnAssets", None),
+    "Website": ("website", "N/A"),
+}
+
+
+def fetch_ticker_info(ticker: str) -> dict:
+    """
+    Fetch one ticker's fundamentals from the market data provider as a TickerInfo record.
+
+    Parameters:
+        ticker (str): Stock ticker symbol.
+
+    Returns:
+        dict: TickerInfo column-value pairs, stamped with today's LastUpdated.
+    """
+    info = get_provider().info(ticker)
+    record = {"Ticker": ticker}
+    for column, (info_key, default) in INFO_FIELDS.items():
+        value = info.get(info_key)
+        record[column] = default if value is None else value
+    record["LastUpdated"] = date.today()
+    return record
+
+
+def get_stale_tickers(tickers: List[str], max_age_days: Optional[int] = None) -> List[str]:
+    """
+    Tickers with no TickerInfo row, or one older than max_age_days.
+
+    Parameters:
+        tickers (List[str]): Tickers to check.
+        max_age_days (Optional[int]): Refresh age, defaults to FUNDAMENTALS_TTL_DAYS.
+
+    Returns:
+        List[str]: Tickers that need a refresh, in input order.
+    """
+    max_age_days = FUNDAMENTALS_TTL_DAYS if max_age_days is None else max_age_days
+    info_df = read_data_from_sqlite(TickerInfo, columns_to_select=["Ticker", "LastUpdated"])
+    last_updated = dict(zip(info_df["Ticker"], info_df["LastUpdated"]))
+    cutoff = date.today() - timedelta(days=max_age_days)
+    return [
+        ticker
+        for ticker in dict.fromkeys(tickers)
+        if last_updated.get(ticker) is None or last_updated[ticker] < cutoff
+    ]
+
+
+def refresh_fundamentals(
+    tickers: List[str], max_workers: Optional[int] = None
+) -> int:
+    """
+    Re-fetch fundamentals for the given tickers and upsert their TickerInfo rows.
+
+    The rows are written in one transaction that raises on failure, so stored
+    fundamentals are never lost to a failed write. Columns not fetched from
+    the provider, such as Description, keep their stored values.
+
+    Parameters:
+        tickers (List[str]): Tickers to refresh.
+        max_workers (Optional[int]): Concurrent info requests.
+
+    Returns:
+        int: Number of tickers refreshed.
+    """
+    if not tickers:
+        return 0
+    results = run_fetch_stage(tickers, fetch_ticker_info, max_workers=max_workers)
+    records = [result.value for result in results if result.ok]
+    if not records:
+        return 0
+    bulk_upsert_data_to_sqlite(TickerInfo, pd.DataFrame(records))
+    logger.info(f"Refreshed fundamentals for {len(records)} of {len(tickers)} tickers.")
+    return len(records)
+
+
+def refresh_stale_fundamentals(
+    tickers: List[str], max_age_days: Optional[int] = None, max_workers: Optional[int] = None
+) -> int:
+    """Refresh only the tickers whose TickerInfo is missing or older than max_age_days."""
+    stale_tickers = get_stale_tickers(tickers, max_age_days)
+    logger.info(f"{len(stale_tickers)} of {len(tickers)} tickers have stale fundamentals.")
+    return refresh_fundamentals(stale_tickers, max_workers=max_workers)
+
+
+def start_background_refresh(
+    tickers: List[str], max_age_days: Optional[int] = None, max_workers: Optional[int] = None
+) -> threading.Thread:
+    """
+    Refresh stale fundamentals on a daemon thread so the price path never waits on it.
+
+    Returns:
+        threading.Thread: The started thread; join it before the process exits.
+    """
+
+    def refresh() -> None:
+        try:
+            refresh_stale_fundamentals(tickers, max_age_days, max_workers)
+        except Exception as e:
+            logger.error(f"Error refreshing fundamentals: {e}")
+
+    thread = threading.Thread(target=refresh, name="fundamentals-refresh", daemon=True)
+    thread.start()
+    return thread
@@ -1,10 +1,8 @@
 
-from sqlitedb.models import SP500Holdings, StocksPrice, NASDAQHoldings,TickerInfo
-from data.yahoo_data import fetch_stock_data
+from sqlitedb.models import SP500Holdings, StocksPrice, NASDAQHoldings
 from sqlitedb.write import write_data_to_sqlite
-from data.utilities import read_tickers,get_all_tickers
-import pandas as  pd
-import yfinance as yf
+from data.utilities import read_tickers,get_all_tickers,fetch_stock_data
+from data.fundamentals import refresh_fundamentals
 
 def load_nasdaq_data(sp500_tickers):
     nasdaq_tickers = read_tickers(NASDAQHoldings)
@@ -39,63 +37,6 @@ def initial_laod():
 
 def populate_pe_ratio():
     sp500_tickers = get_all_tickers()
-    dfs = []
-    for each_ticker in sp500_tickers:
-        record = {}
-        ticker_obj =  yf.Ticker(each_ticker)
-        try:
-           
-            pe = ticker_obj.info['trailingPE']
- 
-        except Exception as e:
-            pe = pd.NA
-            
-        try:
-            forward_pe = ticker_obj.info['forwardPE']
-        except Exception as e:
-            forward_pe = pd.NA
-            
-        try:
-            record['Sector'] = ticker_obj.info['sector']
-        except:
-            record['Sector'] = 'N/A'
-        
-        try:
-            record['Industry'] = ticker_obj.info['industry']
-        except:
-            record['Industry'] = 'N/A'
-            
-        try:
-            record['CompanyName'] = ticker_obj.info['longName']
-        except:
-            record['CompanyName'] = 'N/A'
-            
-        try:
-            record['MarketCap'] = ticker_obj.info['marketCap'] 
-        except:
-            record['MarketCap'] = pd.NA
-        
-        try:
-            record['Dividend'] = ticker_obj.info['dividendYield']
-        except:
-            record['Dividend'] = pd.NA
-        
-        try:
-            record['ROE'] = ticker_obj.info['returnOnEquity']   
-        except: 
-            record['ROE'] = pd.NA
-            
-        try:
-            record['ROA'] = ticker_obj.info['returnOnAssets']
-        except:
-            record['ROA'] = pd.NA
-            
-        record['Ticker'] = each_ticker
-        record['PERatio'] = pe
-        record['ForwardPERatio'] = forward_pe
-        dfs.append(record)
-    df = pd.DataFrame(dfs)
-    df['LastUpdated'] = pd.Timestamp.now().date()
-    write_data_to_sqlite(TickerInfo, df)
+    refresh_fundamentals(list(sp500_tickers))
 if __name__ == "__main__":
     populate_pe_ratio()
\ No newline at end of file
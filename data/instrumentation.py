@@ -0,0 +1,318 @@
+"""
+Per-stage spans and counters for the daily pipeline.
+
+Stages (fetch, db_write, db_read, return_calc, enrichment, render, email) are
+timed with span(); everything recorded inside report_scope() is also attributed
+to that report. Work done once for several reports, such as the price ingest,
+runs in a scope of its own that names the reports sharing it (shared_by); it
+is left out of each of those reports' stages and wall time. At the end of a run write_run_summary() stores a JSON summary
+under logs/run_summaries, which this module prints when run as a CLI:
+
+    python -m data.instrumentation                    # latest run
+    python -m data.instrumentation logs/run_summaries/run_20240628_221500.json --top 20
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('stock_analytics')
+
+RUN_SUMMARY_DIR = Path(os.getenv("RUN_SUMMARY_DIR", "logs/run_summaries"))
+# Attribution for anything recorded outside a report_scope()
+RUN_SCOPE = "run"
+
+
+@dataclass
+class Span:
+    """Handle yielded by span(); set rows/tickers once they are known."""
+
+    stage: str
+    ticker: Optional[str] = None
+    rows: int = 0
+    tickers: int = 0
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    rows: int = 0
+    tickers: int = 0
+    errors: int = 0
+    busy_time: float = 0.0
+    intervals: List[Tuple[float, float]] = field(default_factory=list)
+
+    def wall_time(self) -> float:
+        """Union of the recorded intervals, so concurrent fetches are not double counted."""
+        total, current_start, current_end = 0.0, None, None
+        for start, end in sorted(self.intervals):
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            total += current_end - current_start
+        return total
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_time": round(self.wall_time(), 4),
+            "busy_time": round(self.busy_time, 4),
+            "calls": self.calls,
+            "rows": self.rows,
+            "tickers": self.tickers,
+            "errors": self.errors,
+        }
+
+
+class RunMetrics:
+    """
+    Thread-safe store of stage timings and counters for one pipeline run.
+
+    Report attribution is per thread: worker threads record under "run"
+    (fundamentals refresh) unless they enter attribute_to() with the scope
+    of the thread that started them (fetch pool).
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stages: Dict[Tuple[str, str], StageStats] = {}
+        self._report_times: Dict[str, float] = {}
+        self._shared_by: Dict[str, List[str]] = {}
+        self._ticker_times: Dict[Tuple[str, str], float] = {}
+        self._ticker_errors: Dict[Tuple[str, str], str] = {}
+
+    @property
+    def current_report(self) -> str:
+        return getattr(self._local, "report", RUN_SCOPE)
+
+    def record(
+        self,
+        stage: str,
+        started: float,
+        ended: float,
+        rows: int = 0,
+        tickers: int = 0,
+        ticker: Optional[str] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """Record one finished stage interval (perf_counter timestamps)."""
+        key = (self.current_report, stage)
+        with self._lock:
+            stats = self._stages.setdefault(key, StageStats())
+            stats.calls += 1
+            stats.rows += rows
+            stats.tickers += tickers
+            stats.busy_time += ended - started
+            stats.intervals.append((started, ended))
+            if error is not None:
+                stats.errors += 1
+            if ticker is not None:
+                ticker_key = (stage, ticker)
+                self._ticker_times[ticker_key] = self._ticker_times.get(ticker_key, 0.0) + ended - started
+                if error is not None:
+                    self._ticker_errors[ticker_key] = str(error)
+
+    def count(self, stage: str, rows: int = 0, tickers: int = 0, errors: int = 0) -> None:
+        """Add counters to a stage without timing anything."""
+        key = (self.current_report, stage)
+        with self._lock:
+            stats = self._stages.setdefault(key, StageStats())
+            stats.rows += rows
+            stats.tickers += tickers
+            stats.errors += errors
+
+    @contextmanager
+    def span(self, stage: str, ticker: Optional[str] = None, tickers: int = 0) -> Iterator[Span]:
+        """Time the enclosed block as one call of stage; an exception counts as an error."""
+        handle = Span(stage, ticker=ticker, tickers=tickers)
+        started = time.perf_counter()
+        try:
+            yield handle
+        except Exception as e:
+            self.record(stage, started, time.perf_counter(), handle.rows, handle.tickers, ticker, e)
+            raise
+        self.record(stage, started, time.perf_counter(), handle.rows, handle.tickers, ticker)
+
+    @contextmanager
+    def attribute_to(self, report: str) -> Iterator[None]:
+        """Record on this thread under report, without timing the block as part of it."""
+        previous = self.current_report
+        self._local.report = report
+        try:
+            yield
+        finally:
+            self._local.report = previous
+
+    @contextmanager
+    def report_scope(self, report: str, shared_by: Optional[List[str]] = None) -> Iterator[None]:
+        """
+        Attribute everything recorded on this thread to report until the block exits.
+
+        shared_by names the reports a shared scope serves, e.g. the ingest all
+        reports read from; the summary lists them instead of splitting the cost.
+        """
+        if shared_by:
+            with self._lock:
+                self._shared_by[report] = list(shared_by)
+        started = time.perf_counter()
+        try:
+            with self.attribute_to(report):
+                yield
+        finally:
+            with self._lock:
+                self._report_times[report] = (
+                    self._report_times.get(report, 0.0) + time.perf_counter() - started
+                )
+
+    def summary(self, status: str = "completed") -> dict:
+        """Machine-readable summary of the run so far."""
+        with self._lock:
+            stage_totals: Dict[str, StageStats] = {}
+            reports: Dict[str, dict] = {}
+            for (report, stage), stats in self._stages.items():
+                total = stage_totals.setdefault(stage, StageStats())
+                total.calls += stats.calls
+                total.rows += stats.rows
+                total.tickers += stats.tickers
+                total.errors += stats.errors
+                total.busy_time += stats.busy_time
+                total.intervals.extend(stats.intervals)
+                reports.setdefault(report, {"stages": {}})["stages"][stage] = stats.to_dict()
+            for report, wall_time in self._report_times.items():
+                reports.setdefault(report, {"stages": {}})["wall_time"] = round(wall_time, 4)
+            for report, shared_by in self._shared_by.items():
+                reports.setdefault(report, {"stages": {}})["shared_by"] = list(shared_by)
+            tickers = [
+                {
+                    "stage": stage,
+                    "ticker": ticker,
+                    "time": round(elapsed, 4),
+                    "error": self._ticker_errors.get((stage, ticker)),
+                }
+                for (stage, ticker), elapsed in self._ticker_times.items()
+            ]
+        tickers.sort(key=lambda item: item["time"], reverse=True)
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "status": status,
+            "wall_time": round(time.perf_counter() - self._started, 4),
+            "stages": {stage: stats.to_dict() for stage, stats in stage_totals.items()},
+            "reports": reports,
+            "tickers": tickers,
+        }
+
+
+_RUN_METRICS = RunMetrics()
+
+
+def get_run_metrics() -> RunMetrics:
+    return _RUN_METRICS
+
+
+def reset_run_metrics() -> RunMetrics:
+    """Start a fresh run, e.g. between benchmark cases."""
+    global _RUN_METRICS
+    _RUN_METRICS = RunMetrics()
+    return _RUN_METRICS
+
+
+def span(stage: str, ticker: Optional[str] = None, tickers: int = 0):
+    return get_run_metrics().span(stage, ticker=ticker, tickers=tickers)
+
+
+def report_scope(report: str, shared_by: Optional[List[str]] = None):
+    return get_run_metrics().report_scope(report, shared_by=shared_by)
+
+
+def current_report() -> str:
+    return get_run_metrics().current_report
+
+
+def attribute_to(report: str):
+    return get_run_metrics().attribute_to(report)
+
+
+def count(stage: str, rows: int = 0, tickers: int = 0, errors: int = 0) -> None:
+    get_run_metrics().count(stage, rows=rows, tickers=tickers, errors=errors)
+
+
+def write_run_summary(status: str = "completed", summary_dir: Optional[Path] = None) -> Path:
+    """
+    Write the current run summary as JSON.
+
+    Returns:
+        Path: The summary file, named after the run's start time.
+    """
+    metrics = get_run_metrics()
+    summary_dir = Path(summary_dir or RUN_SUMMARY_DIR)
+    os.makedirs(summary_dir, exist_ok=True)
+    summary_path = summary_dir / f"run_{metrics.started_at:%Y%m%d_%H%M%S}.json"
+    summary = metrics.summary(status)
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    logger.info(f"Run summary written to {summary_path} ({summary['wall_time']:.1f}s).")
+    return summary_path
+
+
+def latest_run_summary(summary_dir: Optional[Path] = None) -> Optional[Path]:
+    summaries = sorted(Path(summary_dir or RUN_SUMMARY_DIR).glob("run_*.json"))
+    return summaries[-1] if summaries else None
+
+
+def print_run_summary(summary: dict, top_n: int = 10) -> None:
+    """Print the slowest stages, reports and tickers of a run summary."""
+    print(f"Run started {summary['started_at']} ({summary['status']}), wall time {summary['wall_time']:.2f}s")
+    print()
+    print(f"{'Stage':<14}{'Wall s':>10}{'Busy s':>10}{'Calls':>8}{'Rows':>12}{'Tickers':>9}{'Errors':>8}")
+    stages = sorted(summary["stages"].items(), key=lambda item: item[1]["wall_time"], reverse=True)
+    for stage, stats in stages[:top_n]:
+        print(
+            f"{stage:<14}{stats['wall_time']:>10.2f}{stats['busy_time']:>10.2f}{stats['calls']:>8}"
+            f"{stats['rows']:>12}{stats['tickers']:>9}{stats['errors']:>8}"
+        )
+    print()
+    print(f"{'Report':<36}{'Wall s':>10}  Slowest stage")
+    reports = sorted(summary["reports"].items(), key=lambda item: item[1].get("wall_time", 0), reverse=True)
+    for report, report_stats in reports:
+        slowest = max(report_stats["stages"].items(), key=lambda item: item[1]["wall_time"], default=None)
+        slowest_label = f"{slowest[0]} {slowest[1]['wall_time']:.2f}s" if slowest else "-"
+        # The run scope has no wall time of its own, only its stages
+        wall_label = f"{report_stats['wall_time']:.2f}" if "wall_time" in report_stats else "-"
+        if report_stats.get("shared_by"):
+            report = f"{report} (shared by {len(report_stats['shared_by'])})"
+        print(f"{report:<36}{wall_label:>10}  {slowest_label}")
+    print()
+    print(f"{'Ticker':<12}{'Stage':<14}{'Time s':>10}  Error")
+    for item in summary["tickers"][:top_n]:
+        print(f"{item['ticker']:<12}{item['stage']:<14}{item['time']:>10.2f}  {item['error'] or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the slowest stages and tickers of a pipeline run")
+    parser.add_argument("summary", nargs="?", type=Path, help="Run summary JSON, defaults to the latest run")
+    parser.add_argument("--top", type=int, default=10, help="Rows to show per table")
+    args = parser.parse_args()
+
+    summary_path = args.summary or latest_run_summary()
+    if summary_path is None:
+        print(f"No run summaries found in {RUN_SUMMARY_DIR}")
+        return
+    with open(summary_path) as f:
+        print_run_summary(json.load(f), args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Cumulative log-return index per ticker.
+
+LogReturnIndex stores, for every ticker and session, the prefix sum of daily
+log returns since the ticker's first stored close:
+
+    CumLogReturn[t] = log(Close[t] / Close[first])
+
+so the return over any window is a single difference,
+exp(CumLogReturn[end] - CumLogReturn[start]) - 1, whatever the window length.
+The index is extended after each ingest with only the closes newer than the
+last indexed date. Split adjustments and rerun merges rewrite stored history,
+so they drop the rows of the tickers they touch (drop_log_return_index) and
+the next extension rebuilds those tickers from their full history.
+
+The screener reads it for windows the return engine has no period for
+('ytd', '2y', '45d', ...) through screen_window_returns.
+"""
+import logging
+import re
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.instrumentation import span
+from data.return_engine import PERIOD_DAYS, get_lookback_table
+from sqlitedb.delete import delete_data_from_sqlite
+from sqlitedb.models import LogReturnIndex, StocksPrice
+from sqlitedb.read import read_data_from_sqlite, read_last_dates, read_ticker_window
+from sqlitedb.write import write_data_to_sqlite
+
+logger = logging.getLogger('stock_analytics')
+
+# Relative difference at which a stored anchor close no longer matches StocksPrice
+ANCHOR_TOLERANCE = 1e-9
+WINDOW_UNIT_DAYS = {"d": 1, "mo": 30, "y": 365}
+
+
+def parse_window_days(window: str) -> int:
+    """
+    Days covered by a window string such as '45d', '7mo' or '2y'.
+    Months count 30 days and years 365, as in PERIOD_DAYS.
+    """
+    if window in PERIOD_DAYS:
+        return PERIOD_DAYS[window]
+    match = re.fullmatch(r"(\d+)(d|mo|y)", window)
+    if not match:
+        raise ValueError(f"Unsupported return window '{window}'")
+    return int(match.group(1)) * WINDOW_UNIT_DAYS[match.group(2)]
+
+
+def window_period_days(windows: List[str], report_date: date) -> Dict[str, int]:
+    """
+    period_days mapping for arbitrary windows on a report date. 'ytd' is
+    measured from the last session of the previous year.
+    """
+    period_days = {}
+    for window in windows:
+        if window == "ytd":
+            period_days[window] = (report_date - date(report_date.year - 1, 12, 31)).days
+        else:
+            period_days[window] = parse_window_days(window)
+    return period_days
+
+
+def build_log_return_rows(price_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Index rows for complete ticker histories.
+
+    Parameters:
+        price_df (pd.DataFrame): Date, Ticker and Close rows covering each ticker's full history.
+
+    Returns:
+        pd.DataFrame: Ticker, Date, Close and CumLogReturn, zero at each ticker's first close.
+    """
+    price_df = price_df[price_df["Close"] > 0].sort_values(["Ticker", "Date"])
+    log_close = np.log(price_df["Close"].to_numpy(dtype=float))
+    first_log_close = pd.Series(log_close, index=price_df.index).groupby(price_df["Ticker"]).transform("first")
+    return price_df.assign(CumLogReturn=log_close - first_log_close.to_numpy())[
+        ["Ticker", "Date", "Close", "CumLogReturn"]
+    ]
+
+
+def extend_log_return_rows(price_df: pd.DataFrame, anchors: pd.DataFrame) -> pd.DataFrame:
+    """
+    Index rows for closes newer than each ticker's last indexed row.
+
+    Parameters:
+        price_df (pd.DataFrame): Date, Ticker and Close rows from the anchor date on.
+        anchors (pd.DataFrame): Last indexed row per ticker (Ticker, Date, Close, CumLogReturn).
+
+    Returns:
+        pd.DataFrame: New Ticker, Date, Close and CumLogReturn rows.
+    """
+    anchors = anchors.rename(
+        columns={"Date": "AnchorDate", "Close": "AnchorClose", "CumLogReturn": "AnchorCumLogReturn"}
+    )
+    new_df = price_df.merge(anchors, on="Ticker")
+    new_df = new_df[(new_df["Date"] > new_df["AnchorDate"]) & (new_df["Close"] > 0)]
+    new_df = new_df.assign(
+        CumLogReturn=new_df["AnchorCumLogReturn"]
+        + np.log(new_df["Close"].to_numpy(dtype=float))
+        - np.log(new_df["AnchorClose"].to_numpy(dtype=float))
+    )
+    return new_df[["Ticker", "Date", "Close", "CumLogReturn"]]
+
+
+def extend_log_return_index(tickers: Optional[List[str]] = None, model=StocksPrice) -> int:
+    """
+    Bring LogReturnIndex up to date with the stored closes.
+
+    Tickers already indexed only get rows for the dates after their last
+    indexed date. Tickers not indexed yet, including those whose rows were
+    dropped by drop_log_return_index after a correction, are indexed from
+    their full history. As a safety net a ticker whose stored close on the
+    last indexed date differs from the index is rebuilt too; changes further
+    back are only caught through drop_log_return_index.
+
+    Parameters:
+        tickers (Optional[List[str]]): Tickers to update, all stored tickers when omitted.
+        model: SQLAlchemy ORM model holding Date/Ticker/Close rows.
+
+    Returns:
+        int: Number of index rows written.
+    """
+    with span("db_read") as read_span:
+        last_dates = read_last_dates(model).merge(
+            read_last_dates(LogReturnIndex), on="Ticker", how="left", suffixes=("", "Indexed")
+        )
+        if tickers is not None:
+            last_dates = last_dates[last_dates["Ticker"].isin(tickers)]
+        for column in ["LastDate", "LastDateIndexed"]:
+            last_dates[column] = pd.to_datetime(last_dates[column])
+        stale = last_dates[
+            last_dates["LastDateIndexed"].isna() | (last_dates["LastDate"] > last_dates["LastDateIndexed"])
+        ]
+        indexed = stale.dropna(subset=["LastDateIndexed"])
+        rebuild_tickers = stale.loc[stale["LastDateIndexed"].isna(), "Ticker"].tolist()
+        changed_tickers = []
+
+        new_frames = []
+        if not indexed.empty:
+            anchor_keys = pd.DataFrame(
+                {"Ticker": indexed["Ticker"], "Date": indexed["LastDateIndexed"].dt.date}
+            )
+            anchor_dates = sorted(anchor_keys["Date"].unique())
+            anchors = read_data_from_sqlite(LogReturnIndex, filters={"Date": anchor_dates})
+            anchors = anchors.merge(anchor_keys, on=["Ticker", "Date"])
+            price_df = read_ticker_window(
+                model,
+                anchors["Ticker"].unique().tolist(),
+                anchor_dates[0],
+                indexed["LastDate"].max().date(),
+                columns_to_select=["Date", "Ticker", "Close"],
+            )
+            # A changed close on the anchor date means the history was rewritten
+            stored = anchors.merge(price_df, on=["Ticker", "Date"], how="left", suffixes=("", "Stored"))
+            changed = ~np.isclose(stored["CloseStored"], stored["Close"], rtol=ANCHOR_TOLERANCE, atol=0)
+            changed_tickers = stored.loc[changed, "Ticker"].tolist()
+            rebuild_tickers += changed_tickers
+            new_frames.append(
+                extend_log_return_rows(price_df, anchors[~anchors["Ticker"].isin(changed_tickers)])
+            )
+            read_span.rows += len(price_df)
+        if rebuild_tickers:
+            history_df = read_ticker_window(model, rebuild_tickers, columns_to_select=["Date", "Ticker", "Close"])
+            new_frames.append(build_log_return_rows(history_df))
+            read_span.rows += len(history_df)
+
+    new_frames = [frame for frame in new_frames if not frame.empty]
+    if not new_frames:
+        logger.info("Log return index is up to date.")
+        return 0
+    index_df = pd.concat(new_frames, ignore_index=True)
+    with span("db_write", tickers=index_df["Ticker"].nunique()) as write_span:
+        if changed_tickers:
+            delete_data_from_sqlite(LogReturnIndex, filters={"Ticker": changed_tickers})
+        write_data_to_sqlite(LogReturnIndex, index_df)
+        write_span.rows = len(index_df)
+    logger.info(
+        f"Log return index extended with {len(index_df)} rows, "
+        f"{len(rebuild_tickers)} tickers indexed from their full history."
+    )
+    return len(index_df)
+
+
+def drop_log_return_index(tickers: List[str], since: Optional[date] = None) -> int:
+    """
+    Delete the index rows of tickers whose stored history was rewritten, so
+    the next extend_log_return_index rebuilds them.
+
+    Parameters:
+        tickers (List[str]): Tickers to drop.
+        since (Optional[date]): Only drop rows from this date on, for sessions
+            backfilled into the history; the next extension re-indexes them
+            from the last row kept.
+
+    Returns:
+        int: Number of index rows deleted.
+    """
+    if not tickers:
+        return 0
+    if since is not None:
+        return delete_data_from_sqlite(
+            LogReturnIndex, filters={"Ticker": sorted(tickers)}, date_range=(since, date.max)
+        )
+    return delete_data_from_sqlite(LogReturnIndex, filters={"Ticker": sorted(tickers)})
+
+
+def load_log_return_index(tickers: List[str], dates: List[date]) -> pd.DataFrame:
+    """
+    Read the index on a handful of dates only.
+
+    Parameters:
+        tickers (List[str]): Tickers to keep, in output column order.
+        dates (List[date]): Sessions to read.
+
+    Returns:
+        pd.DataFrame: Date x ticker matrix of CumLogReturn.
+    """
+    with span("db_read", tickers=len(tickers)) as read_span:
+        index_df = read_data_from_sqlite(
+            LogReturnIndex,
+            filters={"Date": sorted(set(dates))},
+            columns_to_select=["Date", "Ticker", "CumLogReturn"],
+        )
+        read_span.rows = len(index_df)
+    index_df = index_df[index_df["Ticker"].isin(tickers)]
+    matrix = index_df.pivot_table(index="Date", columns="Ticker", values="CumLogReturn", aggfunc="last")
+    matrix.index = pd.DatetimeIndex(pd.to_datetime(matrix.index)).normalize()
+    matrix.columns.name = None
+    return matrix.reindex(columns=list(dict.fromkeys(tickers)))
+
+
+def index_window_returns(
+    index_matrix: pd.DataFrame,
+    windows: List[str],
+    report_date: pd.Timestamp,
+    lookback_table: Dict[str, tuple],
+) -> pd.DataFrame:
+    """
+    Window returns as differences of the cumulative log-return index.
+
+    Follows calculate_returns_matrix: the first lookback candidate with a value
+    is used, a window with none gets 0, and tickers without a value on the
+    report date are dropped.
+
+    Parameters:
+        index_matrix (pd.DataFrame): Date x ticker CumLogReturn, covering the report
+            date and the lookback candidates.
+        windows (List[str]): Windows to compute.
+        report_date (pd.Timestamp): Date the returns are measured up to.
+        lookback_table (Dict[str, tuple]): Candidate lookback sessions per window.
+
+    Returns:
+        pd.DataFrame: One row per ticker with a '<window>_return' column per window.
+    """
+    report_date = pd.Timestamp(report_date).normalize()
+    columns = ["Ticker"] + [f"{window}_return" for window in windows]
+    nan_row = np.full(index_matrix.shape[1], np.nan)
+
+    def values_on(day) -> np.ndarray:
+        day = pd.Timestamp(day)
+        return index_matrix.loc[day].to_numpy(dtype=float) if day in index_matrix.index else nan_row
+
+    report_values = values_on(report_date)
+    has_report_value = ~np.isnan(report_values)
+    for ticker in index_matrix.columns[~has_report_value]:
+        logger.error(f"No data found for {ticker} on {report_date.date()}")
+        print(f"No data found for {ticker} on {report_date.date()}")
+    if not has_report_value.any():
+        return pd.DataFrame(columns=columns)
+
+    returns = {"Ticker": index_matrix.columns[has_report_value].tolist()}
+    for window in windows:
+        lookback_values = nan_row.copy()
+        for candidate in lookback_table[window]:
+            lookback_values = np.where(np.isnan(lookback_values), values_on(candidate), lookback_values)
+        window_returns = np.round(np.exp(report_values - lookback_values) - 1, 4)
+        window_returns = np.where(np.isnan(lookback_values), 0, window_returns)
+        returns[f"{window}_return"] = window_returns[has_report_value]
+    return pd.DataFrame(returns, columns=columns)
+
+
+def calculate_window_returns(
+    tickers: List[str], report_date: pd.Timestamp, windows: List[str]
+) -> pd.DataFrame:
+    """
+    Returns over arbitrary windows ('1d'..'1y', '45d', '2y', 'ytd', ...) from
+    the persisted index, reading only the report date and the lookback sessions.
+
+    Parameters:
+        tickers (List[str]): Stock tickers.
+        report_date (pd.Timestamp): Date the returns are measured up to.
+        windows (List[str]): Windows to compute.
+
+    Returns:
+        pd.DataFrame: One row per ticker with a '<window>_return' column per window.
+    """
+    report_date = pd.Timestamp(report_date).normalize()
+    lookback_table = get_lookback_table(report_date, window_period_days(windows, report_date.date()))
+    dates = [report_date.date()] + [
+        candidate for window in windows for candidate in lookback_table[window]
+    ]
+    index_matrix = load_log_return_index(tickers, dates)
+    return index_window_returns(index_matrix, windows, report_date, lookback_table)
+
+
+def screen_window_returns(
+    window: str, min_return: float, tickers: List[str], report_date: Optional[pd.Timestamp] = None
+) -> pd.DataFrame:
+    """
+    Tickers whose return over window is at least min_return, from the index.
+
+    Parameters:
+        window (str): Window such as '3mo', 'ytd' or '2y'.
+        min_return (float): Minimum return, e.g. 0.3 for 30%.
+        tickers (List[str]): Tickers to screen.
+        report_date (Optional[pd.Timestamp]): Date the returns are measured up to,
+            the last indexed date when omitted.
+
+    Returns:
+        pd.DataFrame: Ticker and '<window>_return', sorted by return, descending.
+    """
+    column = f"{window}_return"
+    if report_date is None:
+        last_dates = read_last_dates(LogReturnIndex)["LastDate"]
+        if last_dates.empty:
+            return pd.DataFrame(columns=["Ticker", column])
+        report_date = pd.Timestamp(last_dates.max())
+    returns_df = calculate_window_returns(tickers, report_date, [window])
+    returns_df = returns_df[returns_df[column] >= min_return]
+    return returns_df.sort_values([column, "Ticker"], ascending=[False, True]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    extend_log_return_index()
@@ -1,6 +1,5 @@
-import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
 import smtplib
 from email.message import EmailMessage
@@ -10,9 +9,9 @@ import pandas as pd
 from pandas import ExcelWriter
 import logging  # Import the logging module
 from dotenv import load_dotenv
-from typing import Optional, List
-from sqlitedb.read import read_data_from_sqlite
-from sqlitedb.write import write_data_to_sqlite
+from typing import Dict, Optional, List
+from sqlitedb.read import read_data_from_sqlite, read_last_dates
+from sqlitedb.write import bulk_upsert_data_to_sqlite, write_data_to_sqlite
 from sqlitedb.models import (
     SP500Holdings,
     SP500StocksPrice,
@@ -25,10 +24,33 @@ from sqlitedb.models import (
 )
 from data.broad_market_etfs_analysis import generate_broad_market_monitoring_report_html,generate_market_scanner_html_report
 from sqlitedb.delete import truncate_table
-from sqlitedb.update import upsert_data_in_sqlite
+from sqlitedb.update import merge_data_in_sqlite, upsert_data_in_sqlite
+from sqlitedb.storage import sync_price_store
+from sqlitedb.query_cache import enable_query_cache, query_cache_stats
 from data.watchlist import get_user_tickers
-from data.utilities import send_email,format_worksheet,get_neighbour_days,fetch_stock_data,read_tickers,get_all_tickers
+from data.utilities import send_email,format_worksheet,fetch_stock_data,fetch_stock_data_batch,read_tickers,get_all_tickers
 from data.report_generating import generate_html_report,generate_excel_report,generate_watch_list_report,generate_market_scanner_html_report
+from data.backfill_planner import FetchRange, plan_backfill, record_backfill_attempts
+from data.fetch_stage import fetch_cancelled, run_fetch_stage
+from data.providers import get_provider
+from data.instrumentation import attribute_to, current_report, report_scope, span, write_run_summary
+from data.log_return_index import drop_log_return_index, extend_log_return_index
+from data.split_adjustments import apply_split_adjustments
+from data.fundamentals import start_background_refresh
+from data.price_panel import BENCHMARK_TICKERS, PricePanel, prime_benchmark_returns
+from data.return_snapshots import (
+    SNAPSHOT_CACHE_MODES,
+    drop_return_snapshots,
+    drop_return_snapshots_covering,
+    load_return_snapshots,
+)
+from data.return_engine import (
+    PERIOD_DAYS,
+    load_close_matrix,
+    calculate_returns_range,
+    get_lookback_table,
+    get_lookback_window_start,
+)
 import traceback  
 from extract_my_ib_return import load_positions
 
@@ -55,6 +77,8 @@ logger.info("Environment variables loaded.")
 
 TODAY = datetime.now()
 REPORT_DATE = TODAY.strftime("%Y-%m-%d")
+# Columns a rerun corrects in stored price rows
+RERUN_COLUMNS = ['Date', 'Ticker', 'Close', 'Name']
 
 
 
@@ -67,6 +91,9 @@ def calculate_returns(
     """
     Calculate returns for specified periods.
 
+    Lookback sessions come from the precomputed trading-calendar table, and
+    prices are looked up through a Date -> Close dictionary built once.
+
     Parameters:
         df (pd.DataFrame): DataFrame with an 'Adj Close' column.
         periods (list): List of periods for which to calculate returns.
@@ -77,73 +104,38 @@ def calculate_returns(
         dict: Dictionary of returns for each period.
     """
     returns = {"Ticker": ticker}
+    prices = dict(zip(df["Date"], df["Close"]))
+
+    report_date_price = prices.get(report_date.date())
+    if report_date_price is None:
+        logger.error(f"No data found for {ticker} on {report_date.date()}")
+        print(f"No data found for {ticker} on {report_date.date()}")
+        raise Exception(f"No data found for {ticker} on {report_date.date()}")
+
+    try:
+        lookback_table = get_lookback_table(report_date, period_days)
+    except Exception as e:
+        logger.error(f"Error calculating start_date for {ticker}: {e}")
+        print(f"Error calculating start_date for {ticker}: {e}")
+        return {**returns, **{f"{period}_return": 0 for period in periods}}
 
     for period in periods:
-        try:
-            if period in ['1d', '3d', '5d']:
-                # Use trading days for 1d, 3d, 5d periods
-                start_date = report_date
-                trading_days = 0
-                while trading_days < period_days[period]:
-                    start_date -= timedelta(days=1)
-                    if start_date.weekday() < 5:  # Monday to Friday are trading days
-                        trading_days += 1
-                start_date = start_date.date()
-            else:
-                start_date = (report_date - timedelta(days=period_days[period])).date()
-        except Exception as e:
-            logger.error(
-                f"Error calculating start_date for {ticker} during {period}: {e}"
-            )
-            print(f"Error calculating start_date for {ticker} during {period}: {e}")
-            returns[f"{period}_return"] = 0
-            continue  # Skip to the next period
-
-        # Convert start_date to pandas Timestamp and normalize
-        # start_date_normalized = pd.Timestamp(start_date).normalize().tz_localize('UTC')
-        # Normalize dates to ignore timezone and other attributes
-        report_date_data = df[df["Date"] == report_date.date()]["Close"]
-        if report_date_data.empty:
-            logger.error(f"No data found for {ticker} on {report_date.date()}")
-            print(f"No data found for {ticker} on {report_date.date()}")
-            raise Exception(f"No data found for {ticker} on {report_date.date()}")
-        else:
-            
-            report_date_price = report_date_data.values[0]
-        if start_date in df["Date"].values:
-            try:
-
-                lookback_date_price = df[df["Date"] == start_date]["Close"].values[0]
-                returns[f"{period}_return"] = round(
-                    (report_date_price / lookback_date_price - 1), 4
-                )
-            except Exception as e:
-                logger.error(
-                    f"Error calculating return for {ticker} during {period}: {e}"
-                )
-                print(f"Error calculating return for {ticker} during {period}: {e}")
-                returns[f"{period}_return"] = 0
+        # Resolved lookback session first, then its neighbouring sessions
+        for lookback_date in lookback_table[period]:
+            if lookback_date in prices:
+                try:
+                    returns[f"{period}_return"] = round(
+                        (report_date_price / prices[lookback_date] - 1), 4
+                    )
+                    break
+                except Exception as e:
+                    logger.error(
+                        f"Error calculating return for {ticker} on {lookback_date} during {period}: {e}"
+                    )
+                    returns[f"{period}_return"] = pd.NA
+                    continue
         else:
-            # If start date is not in the data, calculate the return using the closest available date
-            neighbour_days = get_neighbour_days(start_date)
-            for adj_lookback_date in neighbour_days:
-                if adj_lookback_date in df["Date"].values:
-                    try:
-                        lookback_date_price = df[df["Date"] == adj_lookback_date][
-                            "Close"
-                        ].values[0]
-                        returns[f"{period}_return"] = round(
-                            (report_date_price / lookback_date_price - 1), 4
-                        )
-                        break
-                    except Exception as e:
-                        logger.error(
-                            f"Error calculating return for {ticker} on {adj_lookback_date} during {period}: {e}"
-                        )
-                        returns[f"{period}_return"] = pd.NA
-                        continue
-            else:
-                returns[f"{period}_return"] = 0
+            returns[f"{period}_return"] = 0
     return returns
 
 
@@ -158,11 +150,13 @@ def enrich_with_sector_industry(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: Enriched DataFrame with sector and industry columns.
     """
-    sp500_sector_df = read_data_from_sqlite(SP500Holdings)
-    nasdq_sector_df = read_data_from_sqlite(NASDAQHoldings)
-    combined_sector_df = pd.concat([sp500_sector_df, nasdq_sector_df])
-    combined_sector_df = combined_sector_df.drop_duplicates(subset=["Ticker"])
-    enriched_df = df.merge(combined_sector_df, on="Ticker", how="left")
+    with span("enrichment", tickers=len(df)) as enrich_span:
+        sp500_sector_df = read_data_from_sqlite(SP500Holdings)
+        nasdq_sector_df = read_data_from_sqlite(NASDAQHoldings)
+        combined_sector_df = pd.concat([sp500_sector_df, nasdq_sector_df])
+        combined_sector_df = combined_sector_df.drop_duplicates(subset=["Ticker"])
+        enriched_df = df.merge(combined_sector_df, on="Ticker", how="left")
+        enrich_span.rows = len(enriched_df)
     return enriched_df
 
 
@@ -173,6 +167,14 @@ from typing import List
 enrich_mapping = {"^GSPC": "S&P 500", "^IXIC": "NASDAQ"}
 
 
+def write_cancelled(ticker: str) -> bool:
+    """True when this ticker's fetch timed out in the fetch stage, so its rows must not be written."""
+    if fetch_cancelled():
+        logger.warning(f"Fetch for {ticker} timed out, skipping its write.")
+        return True
+    return False
+
+
 def ticker_data_processing(
     mode: str,
     ticker: str,
@@ -180,6 +182,7 @@ def ticker_data_processing(
     start_date: Optional[pd.Timestamp] = None,
     end_date: Optional[pd.Timestamp] = None,
     longest_period: Optional[str] = None,
+    read_back: bool = True,
 ) -> pd.DataFrame:
     """
     Fetch S&P 500 data based on the mode and date range.
@@ -188,47 +191,124 @@ def ticker_data_processing(
         mode (str): 'initial', 'daily', or 'rerun'
         start_date (Optional[pd.Timestamp]): Start date for rerun mode.
         end_date (Optional[pd.Timestamp]): End date for rerun mode.
+        read_back (bool): Whether to read the ticker's history back from SQLite
+            after ingesting. Callers that load prices in bulk pass False.
 
     Returns:
-        pd.DataFrame: DataFrame with S&P 500 data.
+        pd.DataFrame: DataFrame with S&P 500 data, None when the fetch timed
+            out in the fetch stage and nothing was written.
     """
-
+    ticker_df = None
+    new_ticker_df = None
     if mode == "initial":
         ticker_df = fetch_stock_data(ticker, longest_period)
+        if write_cancelled(ticker):
+            return None
         if ticker in enrich_mapping and model == IndexPrice:
             ticker_df["Name"] = enrich_mapping[ticker]
-        write_data_to_sqlite(model, ticker_df)
+        with span("db_write", tickers=1) as write_span:
+            write_data_to_sqlite(model, ticker_df)
+            write_span.rows = len(ticker_df)
+        new_ticker_df = ticker_df
     elif mode == "daily":
         new_ticker_df = fetch_stock_data(ticker, "1d")
+        if write_cancelled(ticker):
+            return None
         if ticker in enrich_mapping and model == IndexPrice:
             new_ticker_df["Name"] = enrich_mapping[ticker]
         if not new_ticker_df.empty:
-            write_data_to_sqlite(model, new_ticker_df)
-        ticker_df = read_data_from_sqlite(model, filters={"Ticker": ticker})
-        ticker_df = ticker_df.sort_values(by="Date")
+            with span("db_write", tickers=1) as write_span:
+                # A day already stored is overwritten rather than failing the write
+                bulk_upsert_data_to_sqlite(model, new_ticker_df)
+                write_span.rows = len(new_ticker_df)
         # sp500_df.index = pd.to_datetime(sp500_df.index)
     elif mode == "rerun":
         new_ticker_df = fetch_stock_data(
             ticker, start_date=start_date, end_date=end_date
         )
+        if write_cancelled(ticker):
+            return None
         if ticker in enrich_mapping and model == IndexPrice:
             new_ticker_df["Name"] = enrich_mapping[ticker]
-        new_records = new_ticker_df.to_dict(orient="records")[0]
-        columns = ['Date','Ticker','Close','Name']
-        records_to_update = {k: v for k, v in new_records.items() if k in columns}
-        upsert_data_in_sqlite(
-            model,
-            records_to_update,
-            filters={"Ticker": ticker, "Date": start_date},
-        )
-        ticker_df = read_data_from_sqlite(model, filters={"Ticker": ticker})
-        ticker_df = ticker_df.sort_values(by="Date")
-    elif mode == "db_rerun":
-        ticker_df = read_data_from_sqlite(model, filters={"Ticker": ticker})
+        # A range rerun fetches every day between start_date and end_date
+        if not new_ticker_df.empty:
+            with span("db_write", tickers=1) as write_span:
+                inserted, updated = merge_data_in_sqlite(
+                    model, new_ticker_df[[c for c in RERUN_COLUMNS if c in new_ticker_df.columns]]
+                )
+                write_span.rows = inserted + updated
+            if model == StocksPrice and (inserted or updated):
+                # Returns cached or indexed from the old closes are stale now
+                drop_return_snapshots([ticker])
+                drop_log_return_index([ticker])
+    if model == StocksPrice and new_ticker_df is not None:
+        # Rescale stored history for any split in the rows just fetched
+        apply_split_adjustments(new_ticker_df)
+    if mode != "initial" and read_back:
+        with span("db_read", tickers=1) as read_span:
+            ticker_df = read_data_from_sqlite(model, filters={"Ticker": ticker})
+            read_span.rows = len(ticker_df)
         ticker_df = ticker_df.sort_values(by="Date")
     return ticker_df
 
 
+def ticker_batch_processing(
+    tickers: List[str],
+    model,
+    period: Optional[str] = None,
+    start_date: Optional[pd.Timestamp] = None,
+    end_date: Optional[pd.Timestamp] = None,
+    batch_size: Optional[int] = None,
+    rerun: bool = False,
+) -> Dict[str, Optional[date]]:
+    """
+    Fetch many tickers through batched Yahoo downloads and write them in one go.
+
+    In rerun mode the fetched rows correct the stored ones through a single
+    set-based merge, restricted to RERUN_COLUMNS, and the return snapshots and
+    log-return index rows of every ticker the merge changed are dropped.
+
+    Parameters:
+        tickers (List[str]): Stock ticker symbols.
+        model: SQLAlchemy ORM model to write to.
+        period (Optional[str]): Period string for Yahoo Finance API (e.g., '1d', '1y').
+        start_date (Optional[pd.Timestamp]): Start date for fetching data.
+        end_date (Optional[pd.Timestamp]): End date for fetching data.
+        batch_size (Optional[int]): Symbols per request, defaults to FETCH_BATCH_SIZE.
+        rerun (bool): Merge the rows into the stored history instead of upserting them.
+
+    Returns:
+        Dict[str, Optional[date]]: Last date received per ticker whose download
+            did not raise, None for those that came back without rows.
+    """
+    if not tickers:
+        return {}
+    batch_df = fetch_stock_data_batch(tickers, period, start_date, end_date, batch_size)
+    if not batch_df.empty:
+        with span("db_write", tickers=batch_df["Ticker"].nunique()) as write_span:
+            if rerun:
+                inserted, updated, changed = merge_data_in_sqlite(
+                    model, batch_df[[c for c in RERUN_COLUMNS if c in batch_df.columns]],
+                    changed_column="Ticker",
+                )
+                if model == StocksPrice:
+                    # Returns cached or indexed from the old closes are stale now
+                    drop_return_snapshots(changed)
+                    drop_log_return_index(changed)
+            else:
+                inserted, updated = bulk_upsert_data_to_sqlite(model, batch_df)
+            write_span.rows = inserted + updated
+        if model == StocksPrice:
+            apply_split_adjustments(batch_df)
+    logger.info(f"Batch fetched {batch_df['Ticker'].nunique()} of {len(tickers)} tickers.")
+    failed = set(batch_df.attrs.get("failed_tickers", []))
+    last_received = {ticker: None for ticker in tickers if ticker not in failed}
+    if not batch_df.empty:
+        for ticker, last_date in batch_df.groupby("Ticker")["Date"].max().items():
+            last_received[ticker] = pd.Timestamp(last_date).date()
+    return last_received
+
+
 def fetch_sp500_data(
     mode: str,
     start_date: Optional[pd.Timestamp] = None,
@@ -269,6 +349,319 @@ def fetch_sp500_data(
     return sp500_df
 
 
+def plan_daily_ingest(
+    tickers: List[str],
+    all_tickers: List[str],
+    end_date: Optional[pd.Timestamp] = None,
+) -> List[FetchRange]:
+    """Fetch ranges a daily ingest needs for the tickers already stored, up to the day before end_date."""
+    existing_tickers = [ticker for ticker in tickers if ticker in all_tickers]
+    target_date = (end_date - timedelta(days=1)) if end_date is not None else TODAY
+    return plan_backfill(existing_tickers, pd.Timestamp(target_date).date())
+
+
+def ingest_sync_since(
+    mode: str,
+    start_date: Optional[pd.Timestamp] = None,
+    fetch_plan: Optional[List[FetchRange]] = None,
+) -> tuple:
+    """
+    First date an ingest of already stored tickers can have written, which is
+    where syncing them into the price store starts.
+
+    Parameters:
+        mode (str): 'initial', 'daily', 'rerun' or 'db_rerun'
+        start_date (Optional[pd.Timestamp]): Start date for rerun mode.
+        fetch_plan (Optional[List[FetchRange]]): The daily ingest's fetch ranges.
+
+    Returns:
+        tuple: Whether anything needs syncing, and the first
+            date to sync (None for the full history).
+    """
+    if mode == "initial":
+        return True, None
+    if mode == "rerun":
+        return True, start_date.date()
+    if mode == "daily" and fetch_plan:
+        return True, min(fetch_range.start_date for fetch_range in fetch_plan)
+    return False, None
+
+
+def ingest_prices(
+    tickers: List[str],
+    mode: str,
+    all_tickers: List[str],
+    start_date: Optional[pd.Timestamp] = None,
+    end_date: Optional[pd.Timestamp] = None,
+    longest_period: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    fetch_timeout: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    fetch_plan: Optional[List[FetchRange]] = None,
+) -> List[str]:
+    """
+    Bring StocksPrice up to date for a list of tickers according to the mode.
+
+    Parameters:
+        tickers (List[str]): Stock tickers to ingest.
+        mode (str): 'initial', 'daily', 'rerun' or 'db_rerun'
+        all_tickers (List[str]): Tickers already stored; others get an initial load.
+        start_date (Optional[pd.Timestamp]): Start date for rerun mode.
+        end_date (Optional[pd.Timestamp]): End date for rerun mode.
+        longest_period (Optional[str]): History fetched for tickers not stored yet.
+        max_workers (Optional[int]): Concurrent ticker fetches, defaults to FETCH_MAX_WORKERS.
+        fetch_timeout (Optional[float]): Per-ticker fetch timeout in seconds.
+        batch_size (Optional[int]): Symbols per Yahoo request in daily and rerun mode.
+        fetch_plan (Optional[List[FetchRange]]): Daily fetch ranges already planned
+            with plan_daily_ingest, planned here when omitted.
+
+    Returns:
+        List[str]: Tickers whose ingest did not fail.
+    """
+
+    # Fetch pool workers record under the caller's report scope
+    ingest_report = current_report()
+
+    def ingest_ticker(ticker: str) -> None:
+        ticker_mode = mode if ticker in all_tickers else "initial"
+        with attribute_to(ingest_report):
+            ticker_data_processing(
+                ticker_mode, ticker, StocksPrice, start_date, end_date, longest_period,
+                read_back=False,
+            )
+
+    if mode == "daily":
+        # Daily ingest fetches exactly the sessions each ticker is missing, one
+        # batched request per distinct range; tickers that fail to download
+        # simply have no price on the report date
+        new_tickers = [ticker for ticker in tickers if ticker not in all_tickers]
+        ticker_batch_processing(new_tickers, StocksPrice, longest_period, batch_size=batch_size)
+        if fetch_plan is None:
+            fetch_plan = plan_daily_ingest(tickers, all_tickers, end_date)
+        fetched = []
+        for fetch_range in fetch_plan:
+            last_received = ticker_batch_processing(
+                fetch_range.tickers,
+                StocksPrice,
+                start_date=pd.Timestamp(fetch_range.start_date),
+                end_date=pd.Timestamp(fetch_range.end_date),
+                batch_size=batch_size,
+            )
+            fetched.append((fetch_range, last_received))
+            # Snapshots and index rows computed before a session was backfilled
+            # are stale; the rerun merge drops them for changed tickers likewise
+            received = {ticker: last_date for ticker, last_date in last_received.items() if last_date is not None}
+            if received:
+                drop_return_snapshots_covering(list(received), fetch_range.start_date, max(received.values()))
+                drop_log_return_index(list(received), since=fetch_range.start_date)
+        # Sessions still missing before the last one a ticker received are not
+        # planned again; failed downloads and tickers without rows are retried
+        record_backfill_attempts(fetched)
+        return list(tickers)
+
+    if mode == "rerun":
+        # Every stored ticker's rerun window is fetched in batches and merged
+        # in one transaction per batch rather than row by row
+        new_tickers = [ticker for ticker in tickers if ticker not in all_tickers]
+        existing_tickers = [ticker for ticker in tickers if ticker in all_tickers]
+        ticker_batch_processing(new_tickers, StocksPrice, longest_period, batch_size=batch_size)
+        ticker_batch_processing(
+            existing_tickers, StocksPrice, start_date=start_date, end_date=end_date,
+            batch_size=batch_size, rerun=True,
+        )
+        return list(tickers)
+
+    fetch_results = run_fetch_stage(
+        tickers, ingest_ticker, max_workers=max_workers, timeout=fetch_timeout
+    )
+    return [result.ticker for result in fetch_results if result.ok]
+
+
+def build_price_panels(
+    tickers: List[str],
+    lookback_periods: list,
+    mode: str,
+    all_tickers: List[str],
+    report_dates: List[pd.Timestamp],
+    end_date: Optional[pd.Timestamp] = None,
+    benchmarks: Optional[List[str]] = None,
+    use_snapshot_cache: bool = True,
+    max_workers: Optional[int] = None,
+    fetch_timeout: Optional[float] = None,
+    batch_size: Optional[int] = None,
+) -> Dict[pd.Timestamp, PricePanel]:
+    """
+    Ingest, load and compute returns for a whole range of report dates in one pass.
+
+    Prices are fetched once for the range and read once into a single close
+    matrix; returns for every report date come from one gather over it, and
+    snapshots cached for the range are read in one query.
+
+    Parameters:
+        tickers (List[str]): Union of the stock tickers of every report.
+        lookback_periods (list): List of periods for which to calculate returns.
+        mode (str): 'initial', 'daily', 'rerun' or 'db_rerun'
+        all_tickers (List[str]): Tickers already stored in StocksPrice.
+        report_dates (List[pd.Timestamp]): Report dates, in ascending order.
+        end_date (Optional[pd.Timestamp]): Exclusive fetch end, defaults to the day
+            after the last report date.
+        benchmarks (Optional[List[str]]): Index tickers, defaults to BENCHMARK_TICKERS.
+        use_snapshot_cache (bool): In rerun/db_rerun mode, reuse returns stored in
+            ReturnSnapshot and only compute tickers missing from it. A rerun still
+            fetches every ticker, and corrected tickers lose their snapshots.
+        max_workers (Optional[int]): Concurrent ticker fetches, defaults to FETCH_MAX_WORKERS.
+        fetch_timeout (Optional[float]): Per-ticker fetch timeout in seconds.
+        batch_size (Optional[int]): Symbols per Yahoo request in daily and rerun mode.
+
+    Returns:
+        Dict[pd.Timestamp, PricePanel]: One panel per report date.
+    """
+    if not report_dates:
+        return {}
+    if benchmarks is None:
+        benchmarks = BENCHMARK_TICKERS
+    tickers = list(dict.fromkeys(tickers))
+    report_dates = [pd.Timestamp(report_date).normalize() for report_date in report_dates]
+    start_date, last_date = report_dates[0], report_dates[-1]
+    if end_date is None:
+        end_date = last_date + timedelta(days=1)
+    longest_period = max(lookback_periods, key=lambda x: PERIOD_DAYS[x])
+    window_start = get_lookback_window_start(start_date, lookback_periods, PERIOD_DAYS)
+
+    if mode == "daily":
+        # The store holds every benchmark date stored so far, so syncing from
+        # the day after the latest one appends to a cube instead of copying it
+        stored = read_last_dates(IndexPrice)
+        stored = stored[stored["Ticker"].isin(benchmarks)]
+        benchmark_since = None
+        if not stored.empty:
+            benchmark_since = pd.Timestamp(stored["LastDate"].max()).date() + timedelta(days=1)
+    for benchmark in benchmarks:
+        ticker_data_processing(
+            mode, benchmark, IndexPrice, start_date, end_date, longest_period,
+            read_back=False,
+        )
+    try:
+        # Only the dates just ingested are copied, so a Parquet store rewrites
+        # the current year's partitions rather than every year in the window
+        if mode == "daily":
+            sync_price_store(IndexPrice, benchmarks, since=benchmark_since)
+        else:
+            synced, since = ingest_sync_since(mode, start_date)
+            if synced:
+                sync_price_store(IndexPrice, benchmarks, since=since)
+    except Exception as e:
+        logger.error(f"Error syncing the price store: {e}")
+    benchmark_matrix = load_close_matrix(IndexPrice, benchmarks, window_start, last_date)
+    prime_benchmark_returns(benchmark_matrix, report_dates, lookback_periods)
+
+    if mode == "rerun":
+        # A rerun refetches every ticker so corrections are merged even when
+        # returns are cached; the merge drops the snapshots it invalidates
+        rerun_tickers = ingest_prices(
+            tickers, mode, all_tickers, start_date, end_date, longest_period,
+            max_workers=max_workers, fetch_timeout=fetch_timeout, batch_size=batch_size,
+        )
+
+    cached_df = pd.DataFrame(columns=["Date", "Ticker"])
+    if use_snapshot_cache and mode in SNAPSHOT_CACHE_MODES:
+        cached_df = load_return_snapshots(tickers, start_date, last_date, lookback_periods)
+        cached_df["Date"] = pd.to_datetime(cached_df["Date"])
+    # Only tickers cached on every report date can skip the fetch
+    cached_dates = cached_df.groupby("Ticker")["Date"].nunique()
+    fully_cached = set(cached_dates[cached_dates == len(report_dates)].index)
+    tickers_to_compute = [ticker for ticker in tickers if ticker not in fully_cached]
+    logger.info(
+        f"{len(fully_cached)} tickers served from return snapshots, "
+        f"{len(tickers_to_compute)} to compute over {len(report_dates)} report dates."
+    )
+
+    fetch_plan = plan_daily_ingest(tickers_to_compute, all_tickers, end_date) if mode == "daily" else None
+    if mode == "rerun":
+        loaded_tickers = [ticker for ticker in rerun_tickers if ticker not in fully_cached]
+    else:
+        loaded_tickers = ingest_prices(
+            tickers_to_compute, mode, all_tickers, start_date, end_date, longest_period,
+            max_workers=max_workers, fetch_timeout=fetch_timeout, batch_size=batch_size,
+            fetch_plan=fetch_plan,
+        )
+    try:
+        # Keep the cumulative log-return index in step with the new closes
+        extend_log_return_index(loaded_tickers)
+    except Exception as e:
+        logger.error(f"Error extending log return index: {e}")
+    try:
+        # Mirror the new closes into the configured price store (a no-op for
+        # SQLite): new tickers in full, stored ones from the first date ingested
+        # (split-adjusted tickers are copied in full by sync_price_store)
+        sync_price_store(StocksPrice, [t for t in loaded_tickers if t not in all_tickers])
+        synced, since = ingest_sync_since(mode, start_date, fetch_plan)
+        if synced:
+            sync_price_store(StocksPrice, [t for t in loaded_tickers if t in all_tickers], since=since)
+    except Exception as e:
+        logger.error(f"Error syncing the price store: {e}")
+    # Load every ticker's closes once and compute all periods and dates in one pass
+    close_matrix = load_close_matrix(StocksPrice, loaded_tickers, window_start, last_date)
+    computed_returns = calculate_returns_range(
+        close_matrix, lookback_periods, PERIOD_DAYS, report_dates
+    )
+
+    price_panels = {}
+    for report_date in report_dates:
+        date_cached_df = cached_df[cached_df["Date"] == report_date].drop(columns="Date")
+        date_computed_df = computed_returns[report_date]
+        date_computed_df = date_computed_df[
+            ~date_computed_df["Ticker"].isin(date_cached_df["Ticker"])
+        ]
+        price_panel = PricePanel(
+            report_date,
+            lookback_periods,
+            close_matrix,
+            benchmark_matrix,
+            date_cached_df,
+            computed_returns=date_computed_df,
+        )
+        price_panel.compute_returns()
+        price_panels[report_date] = price_panel
+    return price_panels
+
+
+def build_price_panel(
+    tickers: List[str],
+    lookback_periods: list,
+    mode: str,
+    all_tickers: List[str],
+    start_date: Optional[pd.Timestamp] = None,
+    end_date: Optional[pd.Timestamp] = None,
+    benchmarks: Optional[List[str]] = None,
+    use_snapshot_cache: bool = True,
+    max_workers: Optional[int] = None,
+    fetch_timeout: Optional[float] = None,
+    batch_size: Optional[int] = None,
+) -> PricePanel:
+    """
+    Ingest and load every ticker needed on a single report date exactly once.
+    See build_price_panels for the parameters.
+
+    Returns:
+        PricePanel: Closes and returns for the report date.
+    """
+    price_panels = build_price_panels(
+        tickers,
+        lookback_periods,
+        mode,
+        all_tickers,
+        [start_date],
+        end_date=end_date,
+        benchmarks=benchmarks,
+        use_snapshot_cache=use_snapshot_cache,
+        max_workers=max_workers,
+        fetch_timeout=fetch_timeout,
+        batch_size=batch_size,
+    )
+    return price_panels[pd.Timestamp(start_date).normalize()]
+
+
 def get_top_gainers(
     tickers: list,
     lookback_periods: list,
@@ -277,6 +670,11 @@ def get_top_gainers(
     start_date: Optional[pd.Timestamp] = None,
     end_date: Optional[pd.Timestamp] = None,
     benchmark_against_sp500: bool = True,
+    use_snapshot_cache: bool = True,
+    max_workers: Optional[int] = None,
+    fetch_timeout: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    price_panel: Optional[PricePanel] = None,
 ) -> pd.DataFrame:
     logger.info(f"Running get_top_gainers in '{mode}' mode.")
     """
@@ -289,81 +687,42 @@ def get_top_gainers(
         mode (str): 'initial', 'daily', or 'rerun'
         start_date (Optional[str]): Start date for rerun mode.
         end_date (Optional[str]): End date for rerun mode.
+        use_snapshot_cache (bool): In rerun/db_rerun mode, reuse returns stored in
+            ReturnSnapshot and only compute tickers missing from it.
+        max_workers (Optional[int]): Concurrent ticker fetches, defaults to FETCH_MAX_WORKERS.
+        fetch_timeout (Optional[float]): Per-ticker fetch timeout in seconds.
+        batch_size (Optional[int]): Symbols per Yahoo request in daily and rerun mode.
+        price_panel (Optional[PricePanel]): Run-scoped panel shared across reports.
+            When omitted a panel is built for these tickers alone.
 
     Returns:
         pd.DataFrame: DataFrame with returns for each ticker and time period,
                       including S&P 500 returns.
     """
-    results = []
-
-    # Convert periods to days for comparison
-    period_days = {
-        "1d": 1,
-        "3d": 3,
-        "5d": 5,
-        "14d": 14,
-        "21d": 21,
-        "1mo": 30,
-        "2mo": 60,
-        "3mo": 90,
-        "4mo": 120,
-        "5mo": 150,
-        "6mo": 180,
-        "1y": 365,
-        # '2y': 730,
-        # '5y': 1825
-    }
-    
-    longest_period = max(lookback_periods, key=lambda x: period_days[x])
+    if price_panel is None:
+        price_panel = build_price_panel(
+            tickers,
+            lookback_periods,
+            mode,
+            all_tickers,
+            start_date,
+            end_date,
+            benchmarks=BENCHMARK_TICKERS if benchmark_against_sp500 else [],
+            use_snapshot_cache=use_snapshot_cache,
+            max_workers=max_workers,
+            fetch_timeout=fetch_timeout,
+            batch_size=batch_size,
+        )
 
-    # Fetch S&P 500 returns
+    result_df = price_panel.get_returns(tickers)
+    result_df = result_df[
+        ["Ticker"] + [f"{period}_return" for period in lookback_periods]
+    ]
     if benchmark_against_sp500:
-        sp500_df = ticker_data_processing(
-            mode, "^GSPC", IndexPrice, start_date, end_date, longest_period
+        # Benchmark returns are cached per report date and broadcast in one go
+        result_df = result_df.assign(
+            **price_panel.get_benchmark_columns(BENCHMARK_TICKERS)
         )
-        sp500_returns = calculate_returns(
-            sp500_df, lookback_periods, period_days, "S&P500", start_date
-        )
-        nasdaq_df = ticker_data_processing(
-            mode, "^IXIC", IndexPrice, start_date, end_date, longest_period
-        )
-        nasdaq_returns = calculate_returns(
-            nasdaq_df, lookback_periods, period_days, "nasdaq", start_date
-        )
-
-    count = 0
-    for ticker in tickers:
-        count += 1
-        try:
-            if ticker not in all_tickers:
-                ticker_df = ticker_data_processing(
-                    "initial", ticker, StocksPrice, start_date, end_date, longest_period
-                )
-            else:
-                ticker_df = ticker_data_processing(
-                    mode, ticker, StocksPrice, start_date, end_date, longest_period
-                )
-
-            returns = calculate_returns(
-                ticker_df, lookback_periods, period_days, ticker, start_date
-            )
-            if benchmark_against_sp500:
-                for period in lookback_periods:
-                    returns[f"{period}_SP500_return"] = sp500_returns.get(
-                        f"{period}_return", 0
-                    )
-                for period in lookback_periods:
-                    returns[f"{period}_nasdaq_return"] = nasdaq_returns.get(
-                        f"{period}_return", 0
-                    )
-            results.append(returns)
-        except Exception as e:
-            logger.error(f"Error fetching data for {ticker}: {e}")
-            print(f"Error fetching data for {ticker}: {e}")
-            continue
-        print(f"Processed {count} tickers.")
-    # Convert results to a DataFrame
-    result_df = pd.DataFrame(results)
     result_df = result_df.sort_values(
         by=f"{lookback_periods[0]}_return", ascending=False
     )
@@ -382,7 +741,8 @@ def generate_market_scanner_report(
     current_date,
     report_name: str,
     all_tickers: List[str],
-    format :str ='html'
+    format :str ='html',
+    price_panel: Optional[PricePanel] = None,
 ) -> None:
     top_gainers = get_top_gainers(
         sp500_tickers,
@@ -391,6 +751,7 @@ def generate_market_scanner_report(
         all_tickers=all_tickers,
         start_date=current_date,
         end_date=current_date + timedelta(days=1),
+        price_panel=price_panel,
     )
 
     if top_gainers.empty:
@@ -407,14 +768,15 @@ def generate_market_scanner_report(
             "Industry",
         ]
     if format == 'html':
-        html_content = generate_html_report(top_gainers,
-        lookback_periods,
-        increase_thresholds,
-        decrease_thresholds,
-        current_date_str,
-        column_output,
-        report_name
-    )
+        with span("render"):
+            html_content = generate_html_report(top_gainers,
+            lookback_periods,
+            increase_thresholds,
+            decrease_thresholds,
+            current_date_str,
+            column_output,
+            report_name
+        )
         send_email(
         recipient=args.recipient,
         subject=f"{report_name} Report {current_date_str}",
@@ -424,15 +786,16 @@ def generate_market_scanner_report(
     elif format == 'excel':
         report_path = f"reports/{report_name}_{current_date_str}.xlsx"
         
-        generate_excel_report(
-            top_gainers,
-            lookback_periods,
-            increase_thresholds,
-            decrease_thresholds,
-            current_date_str,
-            column_output,
-            report_name,
-        )
+        with span("render"):
+            generate_excel_report(
+                top_gainers,
+                lookback_periods,
+                increase_thresholds,
+                decrease_thresholds,
+                current_date_str,
+                column_output,
+                report_name,
+            )
         send_email(
         recipient=args.recipient,
         subject=f"{report_name} Report {current_date_str}",
@@ -449,7 +812,8 @@ def generate_market_scanner_report(
 
 
 def generate_user_specific_report(
-    tickers, lookback_periods: list, args, current_date, report_name, all_tickers: List[str] = None
+    tickers, lookback_periods: list, args, current_date, report_name, all_tickers: List[str] = None,
+    price_panel: Optional[PricePanel] = None,
 ) -> None:
 
     top_gainers = get_top_gainers(
@@ -459,6 +823,7 @@ def generate_user_specific_report(
         all_tickers=all_tickers,
         start_date=current_date,
         end_date=current_date + timedelta(days=1),
+        price_panel=price_panel,
     )
 
     if top_gainers.empty and args.mode == "rerun":
@@ -470,7 +835,8 @@ def generate_user_specific_report(
     top_gainers = enrich_with_sector_industry(top_gainers)
     report_path = f"reports/{report_name}_{current_date_str}.xlsx"
 
-    generate_watch_list_report(top_gainers, current_date_str, report_name)
+    with span("render"):
+        generate_watch_list_report(top_gainers, current_date_str, report_name)
 
     send_email(
         recipient=args.recipient,
@@ -484,7 +850,8 @@ def generate_user_specific_report(
 
 
 def generate_broad_market_report(
-    tickers, lookback_periods: list, args, current_date, all_tickers: List[str] = None
+    tickers, lookback_periods: list, args, current_date, all_tickers: List[str] = None,
+    price_panel: Optional[PricePanel] = None,
 ) -> None:
 
     top_gainers = get_top_gainers(
@@ -495,6 +862,7 @@ def generate_broad_market_report(
         start_date=current_date,
         end_date=current_date + timedelta(days=1),
         benchmark_against_sp500=False,
+        price_panel=price_panel,
     )
 
     if top_gainers.empty and args.mode == "rerun":
@@ -502,9 +870,11 @@ def generate_broad_market_report(
 
     current_date_str = current_date.strftime("%Y-%m-%d")
     report_name = "Broad Market Monitoring Report"
-    broad_market_etf_df = read_data_from_sqlite(BroadMarketETFList)
-    enriched_top_gainers = pd.merge(top_gainers,broad_market_etf_df,how="left",on="Ticker")
-    html_content = generate_broad_market_monitoring_report_html(enriched_top_gainers,current_date.strftime("%Y-%m-%d"))
+    with span("enrichment", tickers=len(top_gainers)):
+        broad_market_etf_df = read_data_from_sqlite(BroadMarketETFList)
+        enriched_top_gainers = pd.merge(top_gainers,broad_market_etf_df,how="left",on="Ticker")
+    with span("render"):
+        html_content = generate_broad_market_monitoring_report_html(enriched_top_gainers,current_date.strftime("%Y-%m-%d"))
     send_email(
         recipient=args.recipient,
         subject=f"{report_name} {current_date_str}",
@@ -534,17 +904,19 @@ def main():
     parser.add_argument(
         "--start_date",
         type=str,
-        help="Start date for rerun mode",
-        default=TODAY.strftime("%Y-%m-%d"),
+        help="Start date for rerun mode, defaults to today (the archive's last date when replaying)",
     )
     parser.add_argument(
         "--end_date",
         type=str,
-        help="End date for rerun mode",
-        default=TODAY.strftime("%Y-%m-%d"),
+        help="End date for rerun mode, defaults to today (the archive's last date when replaying)",
     )
 
     args = parser.parse_args()
+    # An offline provider has no data for today; report on its last date instead
+    default_date = (get_provider().latest_date() or TODAY).strftime("%Y-%m-%d")
+    args.start_date = args.start_date or default_date
+    args.end_date = args.end_date or default_date
 
     logger.info(
         f"Parameters received - Mode: {args.mode}, Recipient: {args.recipient}, Start Date: {args.start_date}, End Date: {args.end_date}"
@@ -579,36 +951,78 @@ def main():
 
     date_range = pd.date_range(start=args.start_date, end=args.end_date)
     all_tickers = get_all_tickers()
-    for current_date in date_range:
-        generate_market_scanner_report(
-            sp500_tickers,
+    report_tickers = (
+        sp500_tickers
+        + only_nasdaq_tickers
+        + watchlist_tickers
+        + ib_tickers
+        + broadmarket_etf_list
+    )
+    # PE ratios come from TickerInfo; stale entries refresh off the price path
+    fundamentals_thread = start_background_refresh(report_tickers)
+    # Fetch and read every ticker once for the whole date range; the five
+    # reports are still generated and emailed for each date. The run summary
+    # shows the ingest as one scope shared by the reports, outside their totals
+    report_names = [
+        "SP500 Market Scanner",
+        "NASDAQ Market Scanner",
+        "Watchlist Report",
+        "IB account return report",
+        "Broad Market Monitoring Report",
+    ]
+    with report_scope("Shared price ingest", shared_by=report_names):
+        price_panels = build_price_panels(
+            report_tickers,
             lookback_periods,
-            increase_thresholds,
-            decrease_thresholds,
-            args,
-            current_date,
-            report_name="SP500 Market Scanner",
-            all_tickers=all_tickers,
-            format='excel'
+            args.mode,
+            all_tickers,
+            list(date_range),
         )
-        generate_market_scanner_report(
-            only_nasdaq_tickers,
-            lookback_periods,
-            increase_thresholds,
-            decrease_thresholds,
-            args,
-            current_date,
-            report_name="NASDAQ Market Scanner",
-            all_tickers=all_tickers,
-            format='excel'
-        )
-        generate_user_specific_report(
-            watchlist_tickers, lookback_periods, args, current_date, "Watchlist Report", all_tickers
-        )
-        generate_user_specific_report(
-            ib_tickers, lookback_periods, args, current_date,"IB account return report", all_tickers
-        )
-        generate_broad_market_report(broadmarket_etf_list,lookback_periods,args,current_date,all_tickers)
+    for current_date in date_range:
+        price_panel = price_panels[current_date.normalize()]
+        with report_scope("SP500 Market Scanner"):
+            generate_market_scanner_report(
+                sp500_tickers,
+                lookback_periods,
+                increase_thresholds,
+                decrease_thresholds,
+                args,
+                current_date,
+                report_name="SP500 Market Scanner",
+                all_tickers=all_tickers,
+                format='excel',
+                price_panel=price_panel,
+            )
+        with report_scope("NASDAQ Market Scanner"):
+            generate_market_scanner_report(
+                only_nasdaq_tickers,
+                lookback_periods,
+                increase_thresholds,
+                decrease_thresholds,
+                args,
+                current_date,
+                report_name="NASDAQ Market Scanner",
+                all_tickers=all_tickers,
+                format='excel',
+                price_panel=price_panel,
+            )
+        with report_scope("Watchlist Report"):
+            generate_user_specific_report(
+                watchlist_tickers, lookback_periods, args, current_date, "Watchlist Report", all_tickers,
+                price_panel=price_panel,
+            )
+        with report_scope("IB account return report"):
+            generate_user_specific_report(
+                ib_tickers, lookback_periods, args, current_date,"IB account return report", all_tickers,
+                price_panel=price_panel,
+            )
+        with report_scope("Broad Market Monitoring Report"):
+            generate_broad_market_report(
+                broadmarket_etf_list, lookback_periods, args, current_date, all_tickers,
+                price_panel=price_panel,
+            )
+    fundamentals_thread.join()
+    logger.info(f"Query cache: {query_cache_stats()}")
     logger.info("Script completed successfully.")
 
 
@@ -620,12 +1034,16 @@ def main():
 if __name__ == "__main__":
  
     alert_emails = os.getenv("ALERT_EMAILS").split(",")
+    # The batch run is the only writer, so its reads can be cached safely
+    enable_query_cache()
 
     try:
         main()
+        write_run_summary()
     except Exception as e:
         traceback_str = traceback.format_exc()
         logger.error(f"An error occurred while running the stock analysis script: {traceback_str}")
+        write_run_summary(status="failed")
         send_email(
             recipient=alert_emails,
             subject="Stock Analysis Report - Error",
@@ -0,0 +1,156 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from data.return_engine import PERIOD_DAYS, calculate_returns_matrix, calculate_returns_range
+from data.return_snapshots import save_return_snapshots
+
+logger = logging.getLogger('stock_analytics')
+
+BENCHMARK_TICKERS = ["^GSPC", "^IXIC"]
+# Benchmark -> label used in the '<period>_<label>_return' report columns
+BENCHMARK_COLUMN_LABELS = {"^GSPC": "SP500", "^IXIC": "nasdaq"}
+
+BENCHMARK_CACHE_SIZE = 256
+_BENCHMARK_RETURNS: "OrderedDict[tuple, Dict[str, float]]" = OrderedDict()
+
+
+def _cache_benchmark_returns(key: tuple, returns: Dict[str, float]) -> None:
+    _BENCHMARK_RETURNS[key] = returns
+    _BENCHMARK_RETURNS.move_to_end(key)
+    while len(_BENCHMARK_RETURNS) > BENCHMARK_CACHE_SIZE:
+        _BENCHMARK_RETURNS.popitem(last=False)
+
+
+def prime_benchmark_returns(
+    benchmark_matrix: pd.DataFrame, report_dates: List[pd.Timestamp], periods: List[str]
+) -> None:
+    """
+    Compute every benchmark's returns for a range of report dates in one pass
+    and store them in the benchmark cache.
+    """
+    range_returns = calculate_returns_range(benchmark_matrix, periods, PERIOD_DAYS, report_dates)
+    for report_date, returns_df in range_returns.items():
+        for row in returns_df.to_dict(orient="records"):
+            benchmark = row.pop("Ticker")
+            _cache_benchmark_returns((benchmark, report_date.date(), tuple(periods)), row)
+
+
+def get_benchmark_returns(
+    benchmark_matrix: pd.DataFrame,
+    benchmark: str,
+    report_date: pd.Timestamp,
+    periods: List[str],
+) -> Dict[str, float]:
+    """
+    Returns of a benchmark index keyed by '<period>_return', memoized per
+    (benchmark, report date, periods).
+
+    Raises:
+        Exception: If the benchmark has no close on the report date.
+    """
+    report_date = pd.Timestamp(report_date).normalize()
+    key = (benchmark, report_date.date(), tuple(periods))
+    if key not in _BENCHMARK_RETURNS:
+        returns_df = calculate_returns_matrix(
+            benchmark_matrix.reindex(columns=[benchmark]), periods, PERIOD_DAYS, report_date
+        )
+        if returns_df.empty:
+            raise Exception(f"No data found for {benchmark} on {report_date.date()}")
+        _cache_benchmark_returns(key, returns_df.drop(columns="Ticker").iloc[0].to_dict())
+    _BENCHMARK_RETURNS.move_to_end(key)
+    return _BENCHMARK_RETURNS[key]
+
+
+class PricePanel:
+    """
+    Close prices and returns for every ticker one run needs on a report date.
+
+    The panel is built once per report date for the union of all report
+    ticker lists and the benchmarks, then handed to each report so no ticker
+    is fetched or read from SQLite more than once.
+
+    Parameters:
+        report_date (pd.Timestamp): Date the returns are measured up to.
+        lookback_periods (List[str]): Periods the returns are computed for.
+        close_matrix (pd.DataFrame): Date x ticker closes for the loaded stock tickers.
+        benchmark_matrix (pd.DataFrame): Date x ticker closes for the benchmark indices.
+        cached_returns (Optional[pd.DataFrame]): Returns already served from ReturnSnapshot.
+        computed_returns (Optional[pd.DataFrame]): Returns precomputed for this date by a
+            range build; when omitted they are computed from close_matrix.
+    """
+
+    def __init__(
+        self,
+        report_date: pd.Timestamp,
+        lookback_periods: List[str],
+        close_matrix: pd.DataFrame,
+        benchmark_matrix: pd.DataFrame,
+        cached_returns: Optional[pd.DataFrame] = None,
+        computed_returns: Optional[pd.DataFrame] = None,
+    ):
+        self.report_date = pd.Timestamp(report_date)
+        self.lookback_periods = list(lookback_periods)
+        self.close_matrix = close_matrix
+        self.benchmark_matrix = benchmark_matrix
+        if cached_returns is None:
+            cached_returns = pd.DataFrame(columns=["Ticker"])
+        self.cached_returns = cached_returns
+        self.computed_returns = computed_returns
+        self._returns: Optional[pd.DataFrame] = None
+
+    def compute_returns(self, save_snapshots: bool = True) -> pd.DataFrame:
+        """
+        Compute returns for every loaded ticker in one pass, store them as
+        snapshots and combine them with the cached ones.
+        """
+        computed_df = self.computed_returns
+        if computed_df is None:
+            computed_df = calculate_returns_matrix(
+                self.close_matrix, self.lookback_periods, PERIOD_DAYS, self.report_date
+            )
+        if save_snapshots:
+            save_return_snapshots(computed_df, self.report_date, self.lookback_periods)
+        if self.cached_returns.empty:
+            self._returns = computed_df
+        elif computed_df.empty:
+            self._returns = self.cached_returns
+        else:
+            self._returns = pd.concat([self.cached_returns, computed_df], ignore_index=True)
+        self._returns = self._returns.drop_duplicates(subset=["Ticker"]).set_index("Ticker")
+        return self._returns
+
+    def get_returns(self, tickers: List[str]) -> pd.DataFrame:
+        """
+        Returns of the given tickers, in ticker order, skipping tickers with no data.
+        """
+        if self._returns is None:
+            self.compute_returns()
+        available = [ticker for ticker in dict.fromkeys(tickers) if ticker in self._returns.index]
+        return self._returns.loc[available].reset_index()
+
+    def get_benchmark_returns(self, benchmark: str) -> Dict[str, float]:
+        """
+        Returns of a benchmark index keyed by '<period>_return'.
+
+        Raises:
+            Exception: If the benchmark has no close on the report date.
+        """
+        return get_benchmark_returns(
+            self.benchmark_matrix, benchmark, self.report_date, self.lookback_periods
+        )
+
+    def get_benchmark_columns(self, benchmarks: List[str]) -> Dict[str, float]:
+        """
+        Benchmark returns as '<period>_<label>_return' report columns, ready to
+        be broadcast onto a result frame in one assignment.
+        """
+        columns = {}
+        for benchmark in benchmarks:
+            returns = self.get_benchmark_returns(benchmark)
+            label = BENCHMARK_COLUMN_LABELS.get(benchmark, benchmark)
+            for period in self.lookback_periods:
+                columns[f"{period}_{label}_return"] = returns.get(f"{period}_return", 0)
+        return columns
@@ -0,0 +1,402 @@
+"""Market-data providers: live Yahoo Finance, offline CSV replay and synthetic prices."""
+import logging
+import os
+import zlib
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.trading_calendar import get_trading_calendar
+
+logger = logging.getLogger('stock_analytics')
+
+PRICE_COLUMNS = ["Date", "Ticker", "Close", "Volume", "StockSplits"]
+ARCHIVE_PATH = Path(__file__).parent / "archive"
+SECTOR_INFO_PATH = Path(__file__).parent / "static_data" / "sp500_stocks_sector_industry_info.csv"
+NASDAQ_HOLDINGS_PATH = Path(__file__).parent / "static_data" / "qqq_holdings.csv"
+# Constituent lists the replay provider builds benchmark proxies from when the
+# archive has no CSV for the index itself
+REPLAY_BENCHMARK_CONSTITUENTS = {"^GSPC": SECTOR_INFO_PATH, "^IXIC": NASDAQ_HOLDINGS_PATH}
+REPLAY_BENCHMARK_BASE = 100.0
+
+
+def _empty_price_frame() -> pd.DataFrame:
+    return pd.DataFrame(columns=PRICE_COLUMNS)
+
+
+def _concat_batch(frames: List[pd.DataFrame], failed: List[str]) -> pd.DataFrame:
+    """Long frame of a batch fetch, with the tickers whose download raised in attrs["failed_tickers"]."""
+    frames = [frame for frame in frames if not frame.empty]
+    df = pd.concat(frames, ignore_index=True) if frames else _empty_price_frame()
+    df.attrs["failed_tickers"] = list(failed)
+    return df
+
+
+def period_start_date(period: str, as_of: date) -> Optional[date]:
+    """
+    First date covered by a Yahoo-style period string ('5d', '3mo', '1y', 'ytd', 'max')
+    ending on as_of. Day periods count trading sessions; 'max' returns None.
+    """
+    if period == "max":
+        return None
+    if period == "ytd":
+        return date(as_of.year, 1, 1)
+    if period.endswith("mo"):
+        return (pd.Timestamp(as_of) - pd.DateOffset(months=int(period[:-2]))).date()
+    if period.endswith("y"):
+        return (pd.Timestamp(as_of) - pd.DateOffset(years=int(period[:-1]))).date()
+    if period.endswith("d"):
+        calendar = get_trading_calendar()
+        return calendar.shift(as_of, -(int(period[:-1]) - 1))
+    raise ValueError(f"Unsupported period '{period}'")
+
+
+class MarketDataProvider:
+    """
+    Source of daily price history and fundamentals.
+
+    history() returns the long frame the DB layer expects: one row per day
+    with Date (datetime.date), Ticker, Close, Volume and StockSplits.
+    history_batch() also lists the tickers whose download raised in
+    df.attrs["failed_tickers"], telling them apart from tickers that simply
+    have no rows in the range.
+    """
+
+    name = "base"
+
+    def history(
+        self,
+        ticker: str,
+        period: Optional[str] = None,
+        start_date: Optional[pd.Timestamp] = None,
+        end_date: Optional[pd.Timestamp] = None,
+    ) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def history_batch(
+        self,
+        tickers: List[str],
+        period: Optional[str] = None,
+        start_date: Optional[pd.Timestamp] = None,
+        end_date: Optional[pd.Timestamp] = None,
+        batch_size: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """Default batch path: one history() call per ticker, failures logged and skipped."""
+        frames = []
+        failed = []
+        for ticker in tickers:
+            try:
+                frames.append(self.history(ticker, period, start_date, end_date))
+            except Exception as e:
+                logger.error(f"Error fetching data for {ticker}: {e}")
+                failed.append(ticker)
+        return _concat_batch(frames, failed)
+
+    def info(self, ticker: str) -> dict:
+        """Raw fundamentals using yfinance info keys (trailingPE, sector, ...)."""
+        return {}
+
+    def latest_date(self) -> Optional[date]:
+        """Last date the provider has prices for, None for live sources."""
+        return None
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = "yfinance"
+
+    def history(self, ticker, period=None, start_date=None, end_date=None) -> pd.DataFrame:
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        try:
+            if start_date and end_date:
+                df = stock.history(start=start_date, end=end_date)
+            else:
+                df = stock.history(period=period)
+        except Exception as e:
+            logger.error(f"Error fetching data for {ticker}: {e}")
+            raise
+        # df.index = pd.to_datetime(df.index, utc=True)  # Set utc=True
+        df = df.reset_index()
+        df["Date"] = pd.to_datetime(df["Date"]).dt.date
+        df["Ticker"] = ticker
+        if "Stock Splits" in df.columns:
+            df = df.rename(columns={"Stock Splits": "StockSplits"})
+        return df
+
+    def history_batch(
+        self, tickers, period=None, start_date=None, end_date=None, batch_size=None
+    ) -> pd.DataFrame:
+        import yfinance as yf
+
+        batch_size = batch_size or len(tickers) or 1
+        frames = []
+        failed = []
+        for i in range(0, len(tickers), batch_size):
+            batch = list(tickers[i:i + batch_size])
+            try:
+                # Same adjusted OHLCV and actions columns as Ticker.history()
+                download_args = dict(
+                    group_by="ticker", actions=True, auto_adjust=True, progress=False, threads=True
+                )
+                if start_date and end_date:
+                    wide_df = yf.download(batch, start=start_date, end=end_date, **download_args)
+                else:
+                    wide_df = yf.download(batch, period=period, **download_args)
+            except Exception as e:
+                logger.error(f"Error fetching batch {i // batch_size + 1} ({batch[0]}..{batch[-1]}): {e}")
+                failed.extend(batch)
+                continue
+            frames.append(split_batch_download(wide_df, batch))
+            logger.info(f"Fetched batch {i // batch_size + 1} with {len(batch)} tickers.")
+        return _concat_batch(frames, failed)
+
+    def info(self, ticker: str) -> dict:
+        import yfinance as yf
+
+        return yf.Ticker(ticker).info or {}
+
+
+def split_batch_download(wide_df: pd.DataFrame, tickers: List[str]) -> pd.DataFrame:
+    """
+    Split a multi-ticker yf.download frame back into the long per-row layout
+    returned by fetch_stock_data.
+
+    Parameters:
+        wide_df (pd.DataFrame): yf.download output grouped by ticker.
+        tickers (List[str]): Tickers requested in that download.
+
+    Returns:
+        pd.DataFrame: Long DataFrame with Date, Ticker, Close, Volume, StockSplits, ... columns.
+    """
+    frames = []
+    if isinstance(wide_df.columns, pd.MultiIndex):
+        downloaded = set(wide_df.columns.get_level_values(0))
+        for ticker in tickers:
+            if ticker not in downloaded:
+                continue
+            ticker_df = wide_df[ticker].dropna(subset=["Close"]).copy()
+            ticker_df["Ticker"] = ticker
+            frames.append(ticker_df)
+    elif len(tickers) == 1:
+        ticker_df = wide_df.dropna(subset=["Close"]).copy()
+        ticker_df["Ticker"] = tickers[0]
+        frames.append(ticker_df)
+    if not frames:
+        return _empty_price_frame()
+    df = pd.concat(frames)
+    df.index.name = "Date"
+    df.columns.name = None
+    df = df.reset_index()
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    if "Stock Splits" in df.columns:
+        df = df.rename(columns={"Stock Splits": "StockSplits"})
+    return df
+
+
+class _FrameProvider(MarketDataProvider):
+    """Shared date filtering for providers that hold full per-ticker histories in memory."""
+
+    def __init__(self, as_of: Optional[date] = None):
+        self.as_of = as_of
+
+    def _full_history(self, ticker: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def history(self, ticker, period=None, start_date=None, end_date=None) -> pd.DataFrame:
+        df = self._full_history(ticker)
+        if df.empty:
+            return _empty_price_frame()
+        as_of = self.as_of or df["Date"].max()
+        df = df[df["Date"] <= as_of]
+        if start_date and end_date:
+            # Same half-open [start, end) window as Ticker.history()
+            df = df[
+                (df["Date"] >= pd.Timestamp(start_date).date())
+                & (df["Date"] < pd.Timestamp(end_date).date())
+            ]
+        elif period:
+            first_date = period_start_date(period, as_of)
+            if first_date is not None:
+                df = df[df["Date"] >= first_date]
+        return df.reset_index(drop=True)
+
+    def latest_date(self) -> Optional[date]:
+        return self.as_of
+
+
+class ReplayProvider(_FrameProvider):
+    """
+    Offline provider replaying the per-ticker CSVs in data/archive/.
+
+    Benchmarks without a CSV of their own (^GSPC, ^IXIC) are replayed as an
+    equal-weighted index of their archived constituents, so benchmark returns
+    are available offline.
+
+    Parameters:
+        archive_path (Path): Directory of <TICKER>.csv files with Date, Close,
+            Volume, StockSplits and Ticker columns.
+        as_of (Optional[date]): Date treated as "today" for period requests,
+            defaults to REPLAY_AS_OF or else the archive's last date.
+    """
+
+    name = "replay"
+
+    def __init__(self, archive_path: Path = ARCHIVE_PATH, as_of: Optional[date] = None):
+        self.archive_path = Path(archive_path)
+        if as_of is None and os.getenv("REPLAY_AS_OF"):
+            as_of = pd.Timestamp(os.getenv("REPLAY_AS_OF")).date()
+        if as_of is None:
+            as_of = self._archive_last_date()
+        super().__init__(as_of)
+        self._histories: Dict[str, pd.DataFrame] = {}
+        self._info: Optional[pd.DataFrame] = None
+
+    def _archive_last_date(self) -> Optional[date]:
+        """Latest date in the archive, read from the last line of each CSV."""
+        last_dates = []
+        for csv_path in self.archive_path.glob("*.csv"):
+            with open(csv_path, "rb") as f:
+                f.seek(max(0, csv_path.stat().st_size - 512))
+                lines = f.read().decode(errors="ignore").strip().splitlines()
+            try:
+                last_dates.append(pd.Timestamp(lines[-1].split(",")[0]).date())
+            except (IndexError, ValueError):
+                continue
+        return max(last_dates) if last_dates else None
+
+    def _benchmark_proxy(self, benchmark: str) -> pd.DataFrame:
+        """Equal-weighted index of the benchmark's archived constituents."""
+        constituents = pd.read_csv(REPLAY_BENCHMARK_CONSTITUENTS[benchmark])["Ticker"].str.strip()
+        closes = {}
+        for ticker in constituents:
+            if (self.archive_path / f"{ticker}.csv").exists():
+                closes[ticker] = self._full_history(ticker).set_index("Date")["Close"]
+        if not closes:
+            logger.error(f"No archived constituents to replay {benchmark} from in {self.archive_path}")
+            return _empty_price_frame()
+        daily_returns = pd.DataFrame(closes).sort_index().pct_change(fill_method=None).mean(axis=1).fillna(0)
+        logger.info(f"Replaying {benchmark} as an equal-weighted index of {len(closes)} archived constituents.")
+        return pd.DataFrame({
+            "Date": daily_returns.index,
+            "Ticker": benchmark,
+            "Close": REPLAY_BENCHMARK_BASE * (1 + daily_returns).cumprod().to_numpy(),
+            "Volume": 0,
+            "StockSplits": 0.0,
+        })
+
+    def _full_history(self, ticker: str) -> pd.DataFrame:
+        if ticker not in self._histories:
+            csv_path = self.archive_path / f"{ticker}.csv"
+            if not csv_path.exists() and ticker in REPLAY_BENCHMARK_CONSTITUENTS:
+                self._histories[ticker] = self._benchmark_proxy(ticker)
+            elif not csv_path.exists():
+                logger.error(f"No replay data for {ticker} in {self.archive_path}")
+                self._histories[ticker] = _empty_price_frame()
+            else:
+                df = pd.read_csv(csv_path)
+                df["Date"] = pd.to_datetime(df["Date"]).dt.date
+                df["Ticker"] = ticker
+                self._histories[ticker] = df.sort_values("Date").reset_index(drop=True)
+        return self._histories[ticker]
+
+    def info(self, ticker: str) -> dict:
+        if self._info is None:
+            self._info = pd.read_csv(SECTOR_INFO_PATH).set_index("Ticker")
+        if ticker not in self._info.index:
+            return {}
+        row = self._info.loc[ticker]
+        return {"sector": row["Sector"], "industry": row["Industry"], "longName": row["CompanyName"]}
+
+
+class SyntheticProvider(_FrameProvider):
+    """
+    Deterministic random-walk prices on NYSE sessions, seeded per ticker so the
+    same ticker always gets the same history; providers with a later end_date
+    return the same rows for the sessions they share.
+
+    Parameters:
+        start_date (date): First session generated.
+        end_date (date): Last session generated, also the default "today".
+        seed (int): Base seed mixed with each ticker's name.
+        volatility (float): Daily log-return standard deviation.
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        start_date: date = date(2020, 1, 1),
+        end_date: Optional[date] = None,
+        seed: int = 0,
+        volatility: float = 0.02,
+    ):
+        end_date = end_date or get_trading_calendar().roll_back(date.today())
+        super().__init__(end_date)
+        self.sessions = get_trading_calendar().trading_days(start_date, end_date)
+        self.seed = seed
+        self.volatility = volatility
+        self._histories: Dict[str, pd.DataFrame] = {}
+
+    def _full_history(self, ticker: str) -> pd.DataFrame:
+        if ticker not in self._histories:
+            # One generator per quantity, so a later end_date only extends the
+            # series and never changes the price level or earlier sessions
+            ticker_seed = [self.seed, zlib.crc32(ticker.encode())]
+            start_price = np.random.default_rng(ticker_seed + [0]).uniform(10, 500)
+            log_returns = np.random.default_rng(ticker_seed + [2]).normal(0.0003, self.volatility, len(self.sessions))
+            close = start_price * np.exp(np.cumsum(log_returns))
+            volume = np.random.default_rng(ticker_seed + [3]).integers(100_000, 10_000_000, len(self.sessions))
+            self._histories[ticker] = pd.DataFrame({
+                "Date": self.sessions,
+                "Ticker": ticker,
+                "Close": close,
+                "Volume": volume,
+                "StockSplits": 0.0,
+            })
+        return self._histories[ticker]
+
+    def info(self, ticker: str) -> dict:
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode()), 1])
+        return {
+            "longName": f"{ticker} Synthetic Inc.",
+            "sector": "Synthetic",
+            "industry": "Synthetic",
+            "trailingPE": float(rng.uniform(5, 60)),
+            "forwardPE": float(rng.uniform(5, 50)),
+        }
+
+
+PROVIDERS = {
+    YFinanceProvider.name: YFinanceProvider,
+    ReplayProvider.name: ReplayProvider,
+    SyntheticProvider.name: SyntheticProvider,
+}
+
+_PROVIDER: Optional[MarketDataProvider] = None
+
+
+def get_provider() -> MarketDataProvider:
+    """
+    Process-wide provider, chosen by the MARKET_DATA_PROVIDER environment
+    variable (yfinance, replay or synthetic). Defaults to yfinance.
+    """
+    global _PROVIDER
+    if _PROVIDER is None:
+        provider_name = os.getenv("MARKET_DATA_PROVIDER", YFinanceProvider.name)
+        if provider_name not in PROVIDERS:
+            raise ValueError(
+                f"Unknown MARKET_DATA_PROVIDER '{provider_name}', expected one of {list(PROVIDERS)}"
+            )
+        _PROVIDER = PROVIDERS[provider_name]()
+        logger.info(f"Using market data provider '{provider_name}'.")
+    return _PROVIDER
+
+
+def set_provider(provider: MarketDataProvider) -> None:
+    """Swap the process-wide provider, e.g. for a replay or synthetic benchmark run."""
+    global _PROVIDER
+    _PROVIDER = provider
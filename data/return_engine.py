@@ -0,0 +1,233 @@
+import logging
+from datetime import date
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sqlitedb.storage import get_price_store
+from data.instrumentation import count, span
+from data.trading_calendar import NEIGHBOUR_OFFSETS, get_trading_calendar
+
+logger = logging.getLogger('stock_analytics')
+
+# Convert periods to days for comparison
+PERIOD_DAYS = {
+    "1d": 1,
+    "3d": 3,
+    "5d": 5,
+    "14d": 14,
+    "21d": 21,
+    "1mo": 30,
+    "2mo": 60,
+    "3mo": 90,
+    "4mo": 120,
+    "5mo": 150,
+    "6mo": 180,
+    "1y": 365,
+    # '2y': 730,
+    # '5y': 1825
+}
+# Periods counted in trading sessions rather than calendar days
+TRADING_DAY_PERIODS = ['1d', '3d', '5d']
+
+_LOOKBACK_TABLES: Dict[tuple, Dict[str, Tuple[date, ...]]] = {}
+
+
+def build_close_matrix(price_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pivot a long Date/Ticker/Close frame into a date x ticker close matrix.
+
+    Parameters:
+        price_df (pd.DataFrame): DataFrame with 'Date', 'Ticker' and 'Close' columns.
+
+    Returns:
+        pd.DataFrame: Close prices indexed by a sorted DatetimeIndex, one column per ticker.
+    """
+    if price_df.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="Date"), dtype=float)
+    matrix = price_df.pivot_table(
+        index="Date", columns="Ticker", values="Close", aggfunc="last", observed=True
+    )
+    matrix.index = pd.DatetimeIndex(pd.to_datetime(matrix.index)).normalize()
+    # Categorical tickers from a columnar read become plain labels
+    matrix.columns = matrix.columns.astype(object)
+    matrix.columns.name = None
+    return matrix.sort_index()
+
+
+def load_close_matrix(
+    model,
+    tickers: List[str],
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+) -> pd.DataFrame:
+    """
+    Load close prices for a list of tickers from the configured price store,
+    reading only those tickers within the window.
+
+    Parameters:
+        model: SQLAlchemy ORM model holding Date/Ticker/Close rows.
+        tickers (List[str]): Tickers to keep, in output column order.
+        start_date (pd.Timestamp): First date to load.
+        end_date (pd.Timestamp): Last date to load.
+
+    Returns:
+        pd.DataFrame: Date x ticker close matrix.
+    """
+    with span("db_read", tickers=len(tickers)) as read_span:
+        matrix = get_price_store().read_ticker_window(
+            model,
+            tickers,
+            pd.Timestamp(start_date).date(),
+            pd.Timestamp(end_date).date(),
+            columns_to_select=["Date", "Ticker", "Close"],
+            pivot_values="Close",
+            columnar=True,
+        )
+        read_span.rows = int(matrix.notna().to_numpy().sum())
+    matrix.index = pd.DatetimeIndex(matrix.index, name="Date").normalize()
+    return matrix
+
+
+def get_lookback_table(
+    report_date: pd.Timestamp, period_days: Dict[str, int] = PERIOD_DAYS
+) -> Dict[str, Tuple[date, ...]]:
+    """
+    Candidate lookback sessions per period for a report date, resolved once
+    from the trading calendar and then served from a dictionary.
+
+    Parameters:
+        report_date (pd.Timestamp): Date the returns are measured up to.
+        period_days (dict): Dictionary mapping periods to days.
+
+    Returns:
+        Dict[str, Tuple[date, ...]]: Resolved session first, then the neighbours to probe.
+    """
+    report_date = pd.Timestamp(report_date).date()
+    key = (report_date, tuple(period_days.items()))
+    if key not in _LOOKBACK_TABLES:
+        table = get_trading_calendar().build_lookback_table(
+            [report_date], period_days, TRADING_DAY_PERIODS
+        )
+        _LOOKBACK_TABLES[key] = table[report_date]
+    return _LOOKBACK_TABLES[key]
+
+
+def get_lookback_window_start(
+    report_date: pd.Timestamp, periods: List[str], period_days: Dict[str, int]
+) -> pd.Timestamp:
+    """
+    Earliest date the engine may probe for the given periods, including the
+    neighbour days used when a lookback date has no price.
+    """
+    lookback_table = get_lookback_table(report_date, period_days)
+    return pd.Timestamp(min(min(lookback_table[period]) for period in periods))
+
+
+def _lookback_rows(
+    dates: pd.DatetimeIndex,
+    report_dates: List[pd.Timestamp],
+    period: str,
+    period_days: Dict[str, int],
+) -> np.ndarray:
+    """
+    Matrix row of every candidate lookback session, one row per report date.
+    Missing sessions are -1, which indexes the all-NaN padding row.
+    """
+    candidate_rows = np.full((len(report_dates), len(NEIGHBOUR_OFFSETS)), -1)
+    for i, report_date in enumerate(report_dates):
+        candidates = get_lookback_table(report_date, period_days)[period]
+        candidate_rows[i, :len(candidates)] = dates.get_indexer(pd.DatetimeIndex(candidates))
+    return candidate_rows
+
+
+def calculate_returns_range(
+    close_matrix: pd.DataFrame,
+    periods: List[str],
+    period_days: Dict[str, int],
+    report_dates: List[pd.Timestamp],
+) -> Dict[pd.Timestamp, pd.DataFrame]:
+    """
+    Calculate returns for every ticker, period and report date over one close matrix.
+
+    Each period is a single gather over the matrix for all report dates at
+    once, so a whole backfill range costs about as much as one report date.
+    Per date the rows match calculate_returns_matrix.
+
+    Parameters:
+        close_matrix (pd.DataFrame): Date x ticker close matrix from build_close_matrix.
+        periods (list): List of periods for which to calculate returns.
+        period_days (dict): Dictionary mapping periods to days.
+        report_dates (List[pd.Timestamp]): Dates the returns are measured up to.
+
+    Returns:
+        Dict[pd.Timestamp, pd.DataFrame]: Report date -> one row per ticker with a
+            '<period>_return' column per period.
+    """
+    report_dates = [pd.Timestamp(report_date).normalize() for report_date in report_dates]
+    columns = ["Ticker"] + [f"{period}_return" for period in periods]
+    dates = close_matrix.index
+    n_tickers = close_matrix.shape[1]
+    with span("return_calc", tickers=n_tickers) as calc_span:
+        # Trailing all-NaN row so that index -1 (date not in the matrix) reads as missing
+        close_values = np.vstack(
+            [close_matrix.to_numpy(dtype=float), np.full((1, n_tickers), np.nan)]
+        )
+
+        report_prices = close_values[dates.get_indexer(pd.DatetimeIndex(report_dates))]
+        period_returns = {}
+        for period in periods:
+            candidate_rows = _lookback_rows(dates, report_dates, period, period_days)
+            lookback_prices = np.full((len(report_dates), n_tickers), np.nan)
+            for candidate in range(candidate_rows.shape[1]):
+                candidate_prices = close_values[candidate_rows[:, candidate]]
+                lookback_prices = np.where(
+                    np.isnan(lookback_prices), candidate_prices, lookback_prices
+                )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                returns = np.round(report_prices / lookback_prices - 1, 4)
+            period_returns[period] = np.where(np.isnan(lookback_prices), 0, returns)
+
+        results = {}
+        for i, report_date in enumerate(report_dates):
+            has_report_price = ~np.isnan(report_prices[i])
+            for ticker in close_matrix.columns[~has_report_price]:
+                logger.error(f"No data found for {ticker} on {report_date.date()}")
+                print(f"No data found for {ticker} on {report_date.date()}")
+            count("return_calc", errors=int((~has_report_price).sum()))
+            if not has_report_price.any():
+                results[report_date] = pd.DataFrame(columns=columns)
+                continue
+            returns = {"Ticker": close_matrix.columns[has_report_price].tolist()}
+            for period in periods:
+                returns[f"{period}_return"] = period_returns[period][i, has_report_price]
+            results[report_date] = pd.DataFrame(returns, columns=columns)
+        calc_span.rows = sum(len(returns_df) for returns_df in results.values())
+    return results
+
+
+def calculate_returns_matrix(
+    close_matrix: pd.DataFrame,
+    periods: List[str],
+    period_days: Dict[str, int],
+    report_date: pd.Timestamp,
+) -> pd.DataFrame:
+    """
+    Calculate returns for every ticker and period in one vectorized pass.
+
+    Produces the same rows as calling calculate_returns per ticker: tickers
+    without a close on the report date are dropped (and logged), and periods
+    whose lookback session and its neighbours all lack a price get a return of 0.
+
+    Parameters:
+        close_matrix (pd.DataFrame): Date x ticker close matrix from build_close_matrix.
+        periods (list): List of periods for which to calculate returns.
+        period_days (dict): Dictionary mapping periods to days.
+        report_date (pd.Timestamp): Date the returns are measured up to.
+
+    Returns:
+        pd.DataFrame: One row per ticker with a '<period>_return' column per period.
+    """
+    report_date = pd.Timestamp(report_date).normalize()
+    return calculate_returns_range(close_matrix, periods, period_days, [report_date])[report_date]
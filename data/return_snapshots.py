@@ -0,0 +1,148 @@
+import logging
+from datetime import date, timedelta
+from typing import List
+
+import pandas as pd
+
+from data.instrumentation import span
+from data.return_engine import PERIOD_DAYS
+from sqlitedb.delete import delete_data_from_sqlite
+from sqlitedb.models import ReturnSnapshot
+from sqlitedb.read import read_data_from_sqlite
+from sqlitedb.write import write_data_to_sqlite
+
+logger = logging.getLogger('stock_analytics')
+
+# Modes that trust previously computed snapshots instead of recomputing them
+SNAPSHOT_CACHE_MODES = ["rerun", "db_rerun"]
+# Calendar days a snapshot's lookback reaches back, rolled-back and neighbour sessions included
+SNAPSHOT_WINDOW_DAYS = max(PERIOD_DAYS.values()) + 14
+
+
+def load_return_snapshots(
+    tickers: List[str],
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+    periods: List[str],
+) -> pd.DataFrame:
+    """
+    Read cached returns for a date range in one indexed read.
+
+    Only (ticker, date) cells that have a snapshot for every requested period
+    are returned, so callers can treat anything missing as needing a recompute.
+
+    Parameters:
+        tickers (List[str]): Tickers to keep.
+        start_date (pd.Timestamp): First report date.
+        end_date (pd.Timestamp): Last report date.
+        periods (List[str]): Periods that must all be cached.
+
+    Returns:
+        pd.DataFrame: One row per (Date, Ticker) with a '<period>_return' column per period.
+    """
+    columns = ["Date", "Ticker"] + [f"{period}_return" for period in periods]
+    with span("db_read", tickers=len(tickers)) as read_span:
+        snapshot_df = read_data_from_sqlite(
+            ReturnSnapshot,
+            date_range=(pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()),
+            columns_to_select=["Date", "Ticker", "Period", "Return"],
+        )
+        read_span.rows = len(snapshot_df)
+    snapshot_df = snapshot_df[
+        snapshot_df["Ticker"].isin(tickers) & snapshot_df["Period"].isin(periods)
+    ]
+    if snapshot_df.empty:
+        return pd.DataFrame(columns=columns)
+
+    wide_df = snapshot_df.pivot_table(
+        index=["Date", "Ticker"], columns="Period", values="Return", aggfunc="last", dropna=False
+    )
+    wide_df = wide_df.reindex(columns=periods)
+    # Periods that were never stored come back as NaN from the pivot
+    stored = snapshot_df.groupby(["Date", "Ticker"])["Period"].nunique()
+    wide_df = wide_df[stored.reindex(wide_df.index) == len(periods)]
+    wide_df.columns = [f"{period}_return" for period in periods]
+    wide_df = wide_df.reset_index()
+    logger.info(
+        f"Loaded {len(wide_df)} cached return snapshots between "
+        f"{pd.Timestamp(start_date).date()} and {pd.Timestamp(end_date).date()}."
+    )
+    return wide_df[columns]
+
+
+def save_return_snapshots(
+    returns_df: pd.DataFrame, report_date: pd.Timestamp, periods: List[str]
+) -> None:
+    """
+    Persist computed returns for a report date, replacing any earlier snapshot
+    of the same tickers on that date.
+
+    Parameters:
+        returns_df (pd.DataFrame): Output of calculate_returns_matrix.
+        report_date (pd.Timestamp): Date the returns were measured up to.
+        periods (List[str]): Periods to store.
+    """
+    if returns_df.empty:
+        return
+    report_date = pd.Timestamp(report_date).date()
+    snapshot_df = returns_df.melt(
+        id_vars="Ticker",
+        value_vars=[f"{period}_return" for period in periods],
+        var_name="Period",
+        value_name="Return",
+    )
+    snapshot_df["Period"] = snapshot_df["Period"].str[: -len("_return")]
+    snapshot_df["Return"] = pd.to_numeric(snapshot_df["Return"], errors="coerce")
+    snapshot_df["Date"] = report_date
+
+    with span("db_write", tickers=len(returns_df)) as write_span:
+        delete_data_from_sqlite(
+            ReturnSnapshot,
+            filters={"Ticker": returns_df["Ticker"].tolist(), "Date": report_date},
+        )
+        write_data_to_sqlite(ReturnSnapshot, snapshot_df)
+        write_span.rows = len(snapshot_df)
+    logger.info(f"Saved {len(snapshot_df)} return snapshots for {report_date}.")
+
+
+def drop_return_snapshots(tickers: List[str]) -> int:
+    """
+    Delete every snapshot of tickers whose stored closes were corrected, so
+    the next rerun recomputes them instead of serving stale returns.
+
+    Returns:
+        int: Number of snapshot rows deleted.
+    """
+    if not tickers:
+        return 0
+    deleted = delete_data_from_sqlite(ReturnSnapshot, filters={"Ticker": sorted(tickers)})
+    logger.info(f"Dropped {deleted} return snapshots of {len(tickers)} corrected tickers.")
+    return deleted
+
+
+def drop_return_snapshots_covering(tickers: List[str], first_session: date, last_session: date) -> int:
+    """
+    Delete the snapshots of tickers whose lookback window covers any session
+    from first_session to last_session, after those sessions were backfilled.
+
+    Parameters:
+        tickers (List[str]): Tickers that received the sessions.
+        first_session (date): First backfilled session.
+        last_session (date): Last backfilled session.
+
+    Returns:
+        int: Number of snapshot rows deleted.
+    """
+    if not tickers:
+        return 0
+    deleted = delete_data_from_sqlite(
+        ReturnSnapshot,
+        filters={"Ticker": sorted(tickers)},
+        date_range=(first_session, last_session + timedelta(days=SNAPSHOT_WINDOW_DAYS)),
+    )
+    if deleted:
+        logger.info(
+            f"Dropped {deleted} return snapshots covering sessions backfilled "
+            f"from {first_session} to {last_session}."
+        )
+    return deleted
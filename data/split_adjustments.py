@@ -0,0 +1,175 @@
+"""
+Split adjustment of stored prices.
+
+Yahoo returns split-adjusted history, so closes fetched after a split are on
+the new share basis while the rows already in StocksPrice are not, which shows
+up as a fake drop (see TSCO_stock_splits_problem.PNG). Every ingested frame is
+checked for split rows; for a split not yet in SplitAdjustment, the ticker's
+rows stored before the fetched window are rescaled in one UPDATE and the
+split is recorded in the same transaction, so applying it again is a no-op.
+
+Rows stored before splits were tracked may already be on the new basis (they
+were fetched after the split), so the factor is first checked against the
+data: the last stored close before the window is compared with the first
+fetched close, and the stored rows are only rescaled when their ratio is
+nearer the split factor than 1.
+"""
+import logging
+import math
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import Integer, cast
+
+from data.instrumentation import span
+from data.log_return_index import drop_log_return_index
+from sqlitedb.connection import Session
+from sqlitedb.delete import delete_data_from_sqlite
+from sqlitedb.models import ReturnSnapshot, SplitAdjustment, StocksPrice
+from sqlitedb.query_cache import invalidate_table
+
+logger = logging.getLogger('stock_analytics')
+
+
+def detect_splits(price_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Split rows in a freshly fetched price frame.
+
+    Parameters:
+        price_df (pd.DataFrame): Fetched rows with Date, Ticker and StockSplits columns.
+
+    Returns:
+        pd.DataFrame: Ticker, Date, Factor and AdjustedBefore (the ticker's first
+            fetched date; rows before it predate the fetch and need rescaling).
+    """
+    columns = ["Ticker", "Date", "Factor", "AdjustedBefore"]
+    if price_df.empty or "StockSplits" not in price_df.columns:
+        return pd.DataFrame(columns=columns)
+    factors = pd.to_numeric(price_df["StockSplits"], errors="coerce").fillna(0)
+    splits = price_df.loc[(factors > 0) & (factors != 1), ["Ticker", "Date"]].assign(
+        Factor=factors[(factors > 0) & (factors != 1)]
+    )
+    fetch_start = price_df.groupby("Ticker")["Date"].min()
+    splits["AdjustedBefore"] = splits["Ticker"].map(fetch_start)
+    return splits[columns].sort_values(["Ticker", "Date"]).reset_index(drop=True)
+
+
+def stored_rows_need_adjustment(stored_close: float, fetched_close: float, factor: float) -> bool:
+    """
+    Whether stored history is still on the pre-split basis.
+
+    Parameters:
+        stored_close (float): Last stored close before the fetched window.
+        fetched_close (float): First fetched (split-adjusted) close.
+        factor (float): Split factor, new shares per old share.
+
+    Returns:
+        bool: True when stored_close / fetched_close is nearer factor than 1 on
+            a log scale, i.e. the stored rows still carry the pre-split price.
+    """
+    if not (stored_close > 0 and fetched_close > 0):
+        return False
+    ratio = math.log(stored_close / fetched_close)
+    return abs(ratio - math.log(factor)) < abs(ratio)
+
+
+def apply_split_adjustments(price_df: pd.DataFrame, model=StocksPrice) -> int:
+    """
+    Rescale stored history for splits found in newly ingested rows.
+
+    Close is divided and Volume multiplied by the split factor (the product
+    of the factors when several new splits arrive together) for the ticker's
+    rows dated before the fetched window, when the stored closes confirm they
+    are not already adjusted (see stored_rows_need_adjustment); otherwise the
+    split is recorded with no rows rescaled. Splits already recorded in
+    SplitAdjustment are skipped. Return snapshots and log-return index rows
+    of adjusted tickers are dropped so they are rebuilt from the adjusted closes.
+
+    Parameters:
+        price_df (pd.DataFrame): Rows just fetched and written for one or more tickers.
+        model: SQLAlchemy ORM model holding the stored prices.
+
+    Returns:
+        int: Number of stored rows rescaled.
+    """
+    splits = detect_splits(price_df)
+    if splits.empty:
+        return 0
+
+    adjusted_rows = 0
+    adjusted_tickers = []
+    with span("db_write", tickers=splits["Ticker"].nunique()) as write_span:
+        session = Session()
+        try:
+            applied = set(
+                session.query(SplitAdjustment.Ticker, SplitAdjustment.SplitDate)
+                .filter(SplitAdjustment.Ticker.in_(splits["Ticker"].unique().tolist()))
+                .all()
+            )
+            new_splits = splits[
+                [(ticker, split_date) not in applied for ticker, split_date in zip(splits["Ticker"], splits["Date"])]
+            ]
+            for ticker, ticker_splits in new_splits.groupby("Ticker"):
+                factor = float(ticker_splits["Factor"].prod())
+                adjusted_before = ticker_splits["AdjustedBefore"].iloc[0]
+                stored_close = (
+                    session.query(model.Close)
+                    .filter(model.Ticker == ticker, model.Date < adjusted_before)
+                    .order_by(model.Date.desc())
+                    .limit(1)
+                    .scalar()
+                )
+                fetched = price_df[(price_df["Ticker"] == ticker) & (price_df["Date"] == adjusted_before)]
+                fetched_close = float(fetched["Close"].iloc[0]) if not fetched.empty else float("nan")
+                rows = 0
+                if stored_close is None:
+                    pass
+                elif stored_rows_need_adjustment(stored_close, fetched_close, factor):
+                    rows = (
+                        session.query(model)
+                        .filter(model.Ticker == ticker, model.Date < adjusted_before)
+                        .update(
+                            {
+                                model.Close: model.Close / factor,
+                                model.Volume: cast(model.Volume * factor, Integer),
+                            },
+                            synchronize_session=False,
+                        )
+                    )
+                else:
+                    logger.info(
+                        f"Stored closes of {ticker} before {adjusted_before} are already adjusted for split "
+                        f"factor {factor:g} ({stored_close:g} vs fetched {fetched_close:g}); not rescaled."
+                    )
+                for split in ticker_splits.itertuples(index=False):
+                    session.add(
+                        SplitAdjustment(
+                            Ticker=ticker,
+                            SplitDate=split.Date,
+                            Factor=float(split.Factor),
+                            AdjustedBefore=adjusted_before,
+                            RowsAdjusted=rows,
+                            AppliedOn=date.today(),
+                        )
+                    )
+                adjusted_rows += rows
+                if rows:
+                    adjusted_tickers.append(ticker)
+                logger.info(
+                    f"Applied split factor {factor:g} for {ticker} to {rows} rows before {adjusted_before}."
+                )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error applying split adjustments: {e}")
+            raise e
+        finally:
+            session.close()
+            invalidate_table(model)
+            invalidate_table(SplitAdjustment)
+        write_span.rows = adjusted_rows
+
+    if adjusted_tickers:
+        delete_data_from_sqlite(ReturnSnapshot, filters={"Ticker": adjusted_tickers})
+        drop_log_return_index(adjusted_tickers)
+    return adjusted_rows
@@ -0,0 +1,263 @@
+"""NYSE trading calendar generated from holiday rules, with no network or data dependency."""
+import bisect
+import logging
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger('stock_analytics')
+
+FIRST_YEAR = 1990
+# Order in which neighbouring trading days are probed when a ticker has no
+# close on its resolved lookback date (e.g. a halt or a late listing)
+NEIGHBOUR_OFFSETS = [0, -1, 1, -2, 2, -3, 3]
+# Unscheduled closures that no rule can generate
+SPECIAL_CLOSURES = {
+    date(2001, 9, 11): "September 11 attacks",
+    date(2001, 9, 12): "September 11 attacks",
+    date(2001, 9, 13): "September 11 attacks",
+    date(2001, 9, 14): "September 11 attacks",
+    date(2004, 6, 11): "National Day of Mourning for Ronald Reagan",
+    date(2007, 1, 2): "National Day of Mourning for Gerald Ford",
+    date(2012, 10, 29): "Hurricane Sandy",
+    date(2012, 10, 30): "Hurricane Sandy",
+    date(2018, 12, 5): "National Day of Mourning for George H. W. Bush",
+    date(2025, 1, 9): "National Day of Mourning for Jimmy Carter",
+}
+
+
+def _easter_sunday(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th given weekday of a month (n=-1 for the last one)."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(holiday: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday."""
+    if holiday.weekday() == 5:
+        return holiday - timedelta(days=1)
+    if holiday.weekday() == 6:
+        return holiday + timedelta(days=1)
+    return holiday
+
+
+def nyse_holidays(year: int) -> Dict[date, str]:
+    """
+    Full-day NYSE closures for a year.
+
+    Parameters:
+        year (int): Calendar year.
+
+    Returns:
+        Dict[date, str]: Observed holiday date mapped to the holiday name.
+    """
+    holidays = {}
+    # NYSE does not observe New Year's Day on the preceding Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() == 6:
+        new_year += timedelta(days=1)
+    if new_year.weekday() < 5:
+        holidays[new_year] = "New Year's Day"
+    if year >= 1998:
+        holidays[_nth_weekday(year, 1, 0, 3)] = "Martin Luther King Jr. Day"
+    holidays[_nth_weekday(year, 2, 0, 3)] = "Presidents' Day"
+    holidays[_easter_sunday(year) - timedelta(days=2)] = "Good Friday"
+    holidays[_nth_weekday(year, 5, 0, -1)] = "Memorial Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = "Juneteenth"
+    holidays[_observed(date(year, 7, 4))] = "Independence Day"
+    holidays[_nth_weekday(year, 9, 0, 1)] = "Labor Day"
+    holidays[_nth_weekday(year, 11, 3, 4)] = "Thanksgiving Day"
+    holidays[_observed(date(year, 12, 25))] = "Christmas Day"
+    holidays.update({day: name for day, name in SPECIAL_CLOSURES.items() if day.year == year})
+    return holidays
+
+
+def nyse_early_closes(year: int) -> Dict[date, str]:
+    """
+    13:00 early closes for a year.
+
+    Parameters:
+        year (int): Calendar year.
+
+    Returns:
+        Dict[date, str]: Early close date mapped to the reason.
+    """
+    holidays = nyse_holidays(year)
+    early_closes = {}
+    candidates = {
+        date(year, 7, 3): "Day before Independence Day",
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1): "Day after Thanksgiving",
+        date(year, 12, 24): "Christmas Eve",
+    }
+    for day, reason in candidates.items():
+        if day.weekday() < 5 and day not in holidays:
+            early_closes[day] = reason
+    return early_closes
+
+
+class TradingCalendar:
+    """
+    Precomputed NYSE sessions between two years, with lookups by date.
+
+    Parameters:
+        start_year (int): First year covered.
+        end_year (int): Last year covered.
+    """
+
+    def __init__(self, start_year: int = FIRST_YEAR, end_year: Optional[int] = None):
+        if end_year is None:
+            end_year = date.today().year + 1
+        self.start_year = start_year
+        self.end_year = end_year
+        self.holidays: Dict[date, str] = {}
+        self.early_closes: Dict[date, str] = {}
+        for year in range(start_year, end_year + 1):
+            self.holidays.update(nyse_holidays(year))
+            self.early_closes.update(nyse_early_closes(year))
+        day = date(start_year, 1, 1)
+        last_day = date(end_year, 12, 31)
+        sessions = []
+        while day <= last_day:
+            if day.weekday() < 5 and day not in self.holidays:
+                sessions.append(day)
+            day += timedelta(days=1)
+        self.sessions: List[date] = sessions
+        self._session_index = {session: i for i, session in enumerate(sessions)}
+
+    def _check_range(self, day: date) -> None:
+        if not (self.start_year <= day.year <= self.end_year):
+            raise ValueError(
+                f"{day} is outside the trading calendar range "
+                f"{self.start_year}-{self.end_year}"
+            )
+
+    def is_trading_day(self, day: date) -> bool:
+        return day in self._session_index
+
+    def is_early_close(self, day: date) -> bool:
+        return day in self.early_closes
+
+    def roll_back(self, day: date) -> date:
+        """Return the day itself if it is a session, otherwise the last session before it."""
+        self._check_range(day)
+        position = bisect.bisect_right(self.sessions, day) - 1
+        return self.sessions[position]
+
+    def shift(self, session: date, offset: int) -> date:
+        """Move a session date forwards or backwards by a number of sessions."""
+        position = self._session_index[self.roll_back(session)] + offset
+        if not 0 <= position < len(self.sessions):
+            raise ValueError(f"Shifting {session} by {offset} sessions leaves the calendar range")
+        return self.sessions[position]
+
+    def previous_trading_day(self, day: date, n: int = 1) -> date:
+        """n-th session strictly before the given day."""
+        self._check_range(day)
+        position = bisect.bisect_left(self.sessions, day) - n
+        return self.sessions[position]
+
+    def trading_days(self, start_date: date, end_date: date) -> List[date]:
+        """All sessions between two dates, inclusive."""
+        left = bisect.bisect_left(self.sessions, start_date)
+        right = bisect.bisect_right(self.sessions, end_date)
+        return self.sessions[left:right]
+
+    def resolve_lookback_date(
+        self, report_date: date, period: str, period_days: Dict[str, int], trading_day_periods: Iterable[str]
+    ) -> date:
+        """
+        Session a period's return is measured from.
+
+        Trading-day periods step back that many sessions; calendar periods go
+        back that many calendar days and roll back to the last session on or
+        before that date.
+        """
+        if period in trading_day_periods:
+            return self.previous_trading_day(report_date, period_days[period])
+        return self.roll_back(report_date - timedelta(days=period_days[period]))
+
+    def build_lookback_table(
+        self,
+        report_dates: Iterable[date],
+        period_days: Dict[str, int],
+        trading_day_periods: Iterable[str],
+    ) -> Dict[date, Dict[str, Tuple[date, ...]]]:
+        """
+        Resolve every period's lookback session for each report date up front.
+
+        Each entry holds the resolved session followed by the neighbouring
+        sessions before the report date probed, in order, when a ticker has
+        no close on it.
+
+        Parameters:
+            report_dates (Iterable[date]): Report dates to resolve.
+            period_days (Dict[str, int]): Dictionary mapping periods to days.
+            trading_day_periods (Iterable[str]): Periods counted in sessions.
+
+        Returns:
+            Dict[date, Dict[str, Tuple[date, ...]]]: report date -> period -> candidate sessions.
+        """
+        trading_day_periods = set(trading_day_periods)
+        table = {}
+        for report_date in report_dates:
+            report_date = pd.Timestamp(report_date).date()
+            periods = {}
+            for period in period_days:
+                lookback_date = self.resolve_lookback_date(
+                    report_date, period, period_days, trading_day_periods
+                )
+                # Never probe the report date itself or anything after it
+                periods[period] = tuple(
+                    candidate
+                    for candidate in (
+                        self.shift(lookback_date, offset) for offset in NEIGHBOUR_OFFSETS
+                    )
+                    if candidate < report_date
+                )
+            table[report_date] = periods
+        return table
+
+
+_CALENDAR: Optional[TradingCalendar] = None
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """Process-wide calendar instance, built on first use."""
+    global _CALENDAR
+    if _CALENDAR is None:
+        _CALENDAR = TradingCalendar()
+        logger.info(
+            f"Built NYSE trading calendar {_CALENDAR.start_year}-{_CALENDAR.end_year} "
+            f"with {len(_CALENDAR.sessions)} sessions."
+        )
+    return _CALENDAR
+
+
+if __name__ == "__main__":
+    calendar = get_trading_calendar()
+    this_year = date.today().year
+    for holiday, name in sorted(nyse_holidays(this_year).items()):
+        print(f"{holiday} {name}")
+    for early_close, reason in sorted(nyse_early_closes(this_year).items()):
+        print(f"{early_close} {reason} (early close)")
@@ -1,19 +1,21 @@
 from email.message import EmailMessage
 import logging
-from typing import Optional
+from typing import List, Optional
 import os
 import smtplib
 from sqlitedb.read import read_data_from_sqlite
 from datetime import datetime, timedelta
 import pandas as pd
-import yfinance as yf
 from sqlitedb.models import StocksPrice
+from data.providers import get_provider
+from data.instrumentation import count, span
 from dotenv import load_dotenv
 load_dotenv()
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")  # Your email address
 EMAIL_PASSWORD = os.getenv(
     "EMAIL_PASSWORD"
 )  # Your email password or app-specific password
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "100"))  # Symbols per Yahoo download request
 
 
 logger = logging.getLogger('stock_analytics')
@@ -57,9 +59,10 @@ def send_email(
 
     # Send the email
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            smtp.send_message(msg)
+        with span("email"):
+            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
+                smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+                smtp.send_message(msg)
         logger.info("Email sent successfully.")
     except Exception as e:
         print(f"Error sending email: {EMAIL_ADDRESS} {EMAIL_PASSWORD}")
@@ -131,7 +134,8 @@ def  fetch_stock_data(
     end_date: Optional[pd.Timestamp] = None,
 ) -> pd.DataFrame:
     """
-    Fetch historical stock data for a specific ticker from Yahoo Finance.
+    Fetch historical stock data for a specific ticker from the configured
+    market data provider (Yahoo Finance unless MARKET_DATA_PROVIDER says otherwise).
 
     Parameters:
         ticker (str): Stock ticker symbol.
@@ -142,30 +146,46 @@ def  fetch_stock_data(
     Returns:
         pd.DataFrame: DataFrame with historical stock data.
     """
-    stock = yf.Ticker(ticker)
-    try:
-        if start_date and end_date:
-            df = stock.history(start=start_date, end=end_date)
-        else:
-            df = stock.history(period=period)
-    except Exception as e:
-        logger.error(f"Error fetching data for {ticker}: {e}")
-        raise
-    # df.index = pd.to_datetime(df.index, utc=True)  # Set utc=True
-    df = df.reset_index()
-    df["Date"] = pd.to_datetime(df["Date"]).dt.date
-    df["Ticker"] = ticker
-    try:
-        df['PERatio'] = stock.info['trailingPE']
-    except:
-        df['PERatio'] = pd.NA
-    
-    try:
-        df['ForwardPERatio'] = stock.info['forwardPE']
-    except:
-        df['ForwardPERatio'] = pd.NA
-    if "Stock Splits" in df.columns:
-        df = df.rename(columns={"Stock Splits": "StockSplits"})
+    # PE ratios are served from TickerInfo (see data/fundamentals.py), so this
+    # stays a single OHLCV request
+    with span("fetch", ticker=ticker, tickers=1) as fetch_span:
+        df = get_provider().history(ticker, period, start_date, end_date)
+        fetch_span.rows = len(df)
+    return df
+
+
+def fetch_stock_data_batch(
+    tickers: List[str],
+    period: Optional[str] = None,
+    start_date: Optional[pd.Timestamp] = None,
+    end_date: Optional[pd.Timestamp] = None,
+    batch_size: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Fetch historical stock data for many tickers with one request per batch.
+
+    With Yahoo Finance, tickers are downloaded batch_size at a time through
+    yf.download and split back into the long frame fetch_stock_data returns.
+    A failed batch is logged and skipped, so its tickers are simply missing
+    from the result.
+
+    Parameters:
+        tickers (List[str]): Stock ticker symbols.
+        period (Optional[str]): Period string for Yahoo Finance API (e.g., '1d', '1y').
+        start_date (Optional[str]): Start date for fetching data.
+        end_date (Optional[str]): End date for fetching data.
+        batch_size (Optional[int]): Symbols per request, defaults to FETCH_BATCH_SIZE.
+
+    Returns:
+        pd.DataFrame: Long DataFrame with historical stock data for every ticker.
+    """
+    with span("fetch", tickers=len(tickers)) as fetch_span:
+        df = get_provider().history_batch(
+            list(tickers), period, start_date, end_date, batch_size or FETCH_BATCH_SIZE
+        )
+        fetch_span.rows = len(df)
+    # Batch downloads log and skip failures, count the tickers that came back empty
+    count("fetch", errors=len(set(tickers)) - (df["Ticker"].nunique() if not df.empty else 0))
     return df
 
 
@@ -1,6 +1,15 @@
+import logging
+
 import dash
 from dash import html, Output, Input, callback, State
 from components.filters import stock_filters
+from components.tables import stock_table
+from data.analytics import UNIVERSES, get_analytics_engine
+from data.log_return_index import screen_window_returns
+from data.return_engine import PERIOD_DAYS
+from sqlitedb.read import read_data_from_sqlite
+
+logger = logging.getLogger('stock_analytics')
 
 dash.register_page(__name__, name="Stock Screener", path="/screener", order=2)
 
@@ -10,15 +19,44 @@ layout = html.Div([
     html.Div(id='screener-results')  # Results display section
 ])
 
-# Example callback for filter button
+
+def screen_from_index(window, min_return, universe):
+    """Screen a universe over any window from the cumulative log-return index."""
+    holdings_df = read_data_from_sqlite(
+        UNIVERSES[universe], columns_to_select=["Ticker", "CompanyName", "Sector", "Industry"]
+    ).drop_duplicates(subset=["Ticker"])
+    returns_df = screen_window_returns(window, min_return, holdings_df["Ticker"].tolist())
+    return returns_df.merge(holdings_df, on="Ticker", how="left")[
+        ["Ticker", "CompanyName", "Sector", "Industry", f"{window}_return"]
+    ]
+
+
+# Periods the return engine knows run on the DuckDB analytics engine; other
+# windows ('ytd', '2y'), and every window when duckdb is not installed, come
+# from the log-return index
 @callback(
     Output('screener-results', 'children'),
     Input('filter-button', 'n_clicks'),
     State('percentage-increase', 'value'),
+    State('stock-exchange-dropdown', 'value'),
+    State('return-window-dropdown', 'value'),
     prevent_initial_call=True
 )
-def update_results(n_clicks, threshold):
+def update_results(n_clicks, threshold, universe, window):
     if not threshold:
         return "Please enter a valid percentage."
-    return f"Showing stocks with yearly increase above {threshold}%."
-
+    window = window or '1y'
+    results = None
+    if window in PERIOD_DAYS:
+        try:
+            results = get_analytics_engine().screen(window, threshold / 100, universe=universe)
+        except ImportError as e:
+            logger.warning(f"{e}; screening from the log-return index instead.")
+    if results is None:
+        results = screen_from_index(window, threshold / 100, universe)
+    if results.empty:
+        return f"No stocks with a {window} increase above {threshold}%."
+    return html.Div([
+        html.P(f"{len(results)} stocks with a {window} increase above {threshold}%."),
+        stock_table(results),
+    ])
@@ -0,0 +1,257 @@
+"""
+Memory-mapped float32 cube of closes, dates x tickers.
+
+A cube directory holds, per price table:
+
+    meta.json          format, version, generation, shape and file names
+    close_g<N>.f32     row-major float32 closes, one row per date
+    dates_g<N>.i32     int32 days since 1970-01-01, one per row
+    tickers_g<N>.json  column order
+
+Rows are day-major, so a new day is appended to the end of both binary files
+and only meta.json is rewritten. Corrected closes on stored dates are written
+into the next generation, never into a file readers may have mapped. New
+tickers, or dates that fall between stored ones, need a rebuild from SQLite
+into the next generation. Readers size their mapping from meta.json, which
+is replaced atomically, so an append in progress is never visible; every
+change bumps the version, which readers use to tell that their mapping is
+stale.
+
+Files of older generations are deleted once meta.json points past them. A
+file that cannot be deleted yet, e.g. one still mapped by a reader on
+Windows, is left and removed by a later write.
+
+    python -m sqlitedb.close_cube          # build from SQLite
+"""
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sqlitedb.models import IndexPrice, StocksPrice
+from sqlitedb.read import read_data_from_sqlite
+
+logger = logging.getLogger('stock_analytics')
+
+CLOSE_CUBE_DIR = Path(os.getenv("CLOSE_CUBE_DIR", Path(__file__).parent / "cube"))
+CUBE_FORMAT = 1
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _cube_dir(model, root: Optional[Path] = None) -> Path:
+    return Path(root or CLOSE_CUBE_DIR) / model.__tablename__
+
+
+def _read_meta(cube_dir: Path) -> Optional[dict]:
+    meta_path = cube_dir / "meta.json"
+    if not meta_path.exists():
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("format") != CUBE_FORMAT:
+        raise ValueError(f"Unsupported close cube format {meta.get('format')} in {cube_dir}")
+    return meta
+
+
+def _write_meta(cube_dir: Path, meta: dict) -> None:
+    temp_path = cube_dir / "meta.json.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(temp_path, cube_dir / "meta.json")
+
+
+def _to_days(dates) -> np.ndarray:
+    return ((pd.DatetimeIndex(dates).values.astype("datetime64[D]") - EPOCH).astype(np.int32))
+
+
+def _remove_old_generations(cube_dir: Path, generation: int) -> None:
+    """Delete the files of generations before generation, skipping files still in use."""
+    for pattern in ("close_g*.f32", "dates_g*.i32", "tickers_g*.json"):
+        for path in cube_dir.glob(pattern):
+            try:
+                file_generation = int(path.stem.rsplit("_g", 1)[1])
+            except ValueError:
+                continue
+            if file_generation >= generation:
+                continue
+            try:
+                path.unlink()
+            except PermissionError:
+                logger.debug(f"Close cube file {path} is still mapped, removing it on a later write.")
+
+
+def _write_generation(cube_dir: Path, previous: Optional[dict], values: np.ndarray, days: np.ndarray, tickers: List[str]) -> dict:
+    """Write values, dates and tickers as the next generation, switch meta.json to it and return its meta."""
+    generation = previous["generation"] + 1 if previous else 1
+    meta = {
+        "format": CUBE_FORMAT,
+        "version": previous["version"] + 1 if previous else 1,
+        "generation": generation,
+        "dtype": "float32",
+        "n_dates": int(values.shape[0]),
+        "n_tickers": int(values.shape[1]),
+        "values_file": f"close_g{generation}.f32",
+        "dates_file": f"dates_g{generation}.i32",
+        "tickers_file": f"tickers_g{generation}.json",
+    }
+    np.ascontiguousarray(values, dtype=np.float32).tofile(cube_dir / meta["values_file"])
+    np.asarray(days, dtype=np.int32).tofile(cube_dir / meta["dates_file"])
+    with open(cube_dir / meta["tickers_file"], "w") as f:
+        json.dump([str(ticker) for ticker in tickers], f)
+    _write_meta(cube_dir, meta)
+    # Readers still mapping an older generation keep their open files
+    _remove_old_generations(cube_dir, generation)
+    return meta
+
+
+class CloseCube:
+    """Read-only mapping of one cube generation at one version."""
+
+    def __init__(self, cube_dir: Path, meta: dict):
+        self.cube_dir = cube_dir
+        self.version = meta["version"]
+        self.generation = meta["generation"]
+        n_dates, n_tickers = meta["n_dates"], meta["n_tickers"]
+        with open(cube_dir / meta["tickers_file"]) as f:
+            self.tickers: List[str] = json.load(f)
+        self._columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        days = np.fromfile(cube_dir / meta["dates_file"], dtype=np.int32, count=n_dates)
+        self.dates = pd.DatetimeIndex(EPOCH + days.astype("timedelta64[D]"), name="Date")
+        if n_dates and n_tickers:
+            self.values = np.memmap(
+                cube_dir / meta["values_file"], dtype=np.float32, mode="r", shape=(n_dates, n_tickers)
+            )
+        else:
+            self.values = np.empty((n_dates, n_tickers), dtype=np.float32)
+
+    def is_stale(self) -> bool:
+        """True once the cube on disk has changed since this mapping was opened."""
+        meta = _read_meta(self.cube_dir)
+        return meta is None or meta["version"] != self.version
+
+    def matrix(self, tickers: List[str], start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        Date x ticker closes as float64, one column per requested ticker in order.
+
+        Dates on which none of the tickers has a close are left out, as when
+        pivoting the stored rows.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        first = 0 if start_date is None else self.dates.searchsorted(pd.Timestamp(start_date), "left")
+        last = len(self.dates) if end_date is None else self.dates.searchsorted(pd.Timestamp(end_date), "right")
+        columns = np.array([self._columns.get(ticker, -1) for ticker in tickers], dtype=np.int64)
+        block = np.full((last - first, len(tickers)), np.nan)
+        present = columns >= 0
+        if present.any():
+            block[:, present] = self.values[first:last][:, columns[present]]
+        matrix = pd.DataFrame(block, index=self.dates[first:last], columns=pd.Index(tickers, dtype=object))
+        return matrix[matrix.notna().any(axis=1)]
+
+
+def open_close_cube(model=StocksPrice, root: Optional[Path] = None) -> Optional[CloseCube]:
+    """Map the current cube read-only, None when it has not been built."""
+    cube_dir = _cube_dir(model, root)
+    meta = _read_meta(cube_dir)
+    return CloseCube(cube_dir, meta) if meta else None
+
+
+def build_close_cube(model=StocksPrice, root: Optional[Path] = None) -> CloseCube:
+    """
+    Write a new cube generation from every close stored in SQLite.
+
+    Returns:
+        CloseCube: The new cube, mapped read-only.
+    """
+    cube_dir = _cube_dir(model, root)
+    cube_dir.mkdir(parents=True, exist_ok=True)
+    previous = _read_meta(cube_dir)
+
+    price_df = read_data_from_sqlite(model, columns_to_select=["Date", "Ticker", "Close"], columnar=True)
+    matrix = price_df.pivot_table(index="Date", columns="Ticker", values="Close", aggfunc="last", observed=True)
+    matrix = matrix.sort_index().sort_index(axis=1)
+    meta = _write_generation(
+        cube_dir, previous, matrix.to_numpy(dtype=np.float32), _to_days(matrix.index), list(matrix.columns)
+    )
+    logger.info(f"Built close cube {cube_dir}: {meta['n_dates']} dates x {meta['n_tickers']} tickers.")
+    return CloseCube(cube_dir, meta)
+
+
+def apply_to_close_cube(model, data: pd.DataFrame, root: Optional[Path] = None) -> tuple:
+    """
+    Bring the cube in line with rows just written to SQLite.
+
+    Dates after the last cube date are appended as new rows. Closes on dates
+    already in the cube are written, with any appended rows, into a copy of
+    the cube saved as the next generation, so open mappings never change
+    under a reader. New tickers or dates between stored ones rebuild the
+    cube from SQLite.
+
+    Parameters:
+        model: SQLAlchemy ORM model the rows were written to.
+        data (pd.DataFrame): Rows with Date, Ticker and Close columns.
+
+    Returns:
+        tuple: (appended, overwritten) closes; a rebuild counts every row as appended.
+    """
+    cube = open_close_cube(model, root)
+    data = data[["Date", "Ticker", "Close"]].drop_duplicates(subset=["Ticker", "Date"], keep="last")
+    if data.empty:
+        return 0, 0
+    if cube is None:
+        build_close_cube(model, root)
+        return len(data), 0
+
+    dates = pd.DatetimeIndex(pd.to_datetime(data["Date"])).normalize()
+    last_date = cube.dates[-1] if len(cube.dates) else pd.Timestamp.min
+    row_positions = cube.dates.get_indexer(dates)
+    new_tickers = set(data["Ticker"]) - set(cube.tickers)
+    if new_tickers or ((row_positions < 0) & (dates <= last_date)).any():
+        build_close_cube(model, root)
+        return len(data), 0
+
+    cube_dir = cube.cube_dir
+    column_positions = np.array([cube._columns[ticker] for ticker in data["Ticker"]], dtype=np.int64)
+    meta = _read_meta(cube_dir)
+    closes = data["Close"].to_numpy(dtype=np.float32)
+    existing = row_positions >= 0
+
+    appended_dates = pd.DatetimeIndex(sorted(set(dates[~existing])))
+    block = np.full((len(appended_dates), meta["n_tickers"]), np.nan, dtype=np.float32)
+    block[appended_dates.get_indexer(dates[~existing]), column_positions[~existing]] = closes[~existing]
+
+    if existing.any():
+        values = np.array(cube.values, dtype=np.float32)
+        values[row_positions[existing], column_positions[existing]] = closes[existing]
+        days = np.concatenate([_to_days(cube.dates), _to_days(appended_dates)])
+        tickers = cube.tickers
+        del cube
+        _write_generation(cube_dir, meta, np.vstack([values, block]), days, tickers)
+        return int((~existing).sum()), int(existing.sum())
+    del cube
+
+    if len(appended_dates):
+        with open(cube_dir / meta["values_file"], "ab") as f:
+            block.tofile(f)
+        with open(cube_dir / meta["dates_file"], "ab") as f:
+            _to_days(appended_dates).tofile(f)
+        meta["n_dates"] += len(appended_dates)
+
+    meta["version"] += 1
+    _write_meta(cube_dir, meta)
+    return int((~existing).sum()), int(existing.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped close cubes from SQLite")
+    parser.parse_args()
+    for model in (StocksPrice, IndexPrice):
+        build_close_cube(model)
+
+
+if __name__ == "__main__":
+    main()
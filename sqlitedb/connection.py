@@ -1,13 +1,76 @@
-from sqlalchemy import create_engine
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlitedb.models import Base
 
-DATABASE_PATH = r"C:\development\repo\stock_analytics\sqlitedb\stock_analytics.db"
+load_dotenv()
+
+DATABASE_PATH = os.getenv("SQLITE_DATABASE_PATH", r"C:\development\repo\stock_analytics\sqlitedb\stock_analytics.db")
+
+# Pragmas applied to every new connection. WAL lets readers (the Dash app)
+# run while the nightly writer commits; mmap_size lets large scans read pages
+# straight from the OS page cache. cache_size is in KiB when negative.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 2**20)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", str(-64 * 2**10)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+# Seconds a connection waits for the write lock before raising "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
+
+def _apply_pragmas(dbapi_connection, read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            # journal_mode is persistent in the database file, so only the writer sets it
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        else:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+    finally:
+        cursor.close()
+
+
+def create_sqlite_engine(database_path: str = DATABASE_PATH, read_only: bool = False):
+    """
+    Create an engine on a SQLite file with the configured pragmas applied on connect.
+
+    Parameters:
+        database_path (str): Path of the SQLite database file.
+        read_only (bool): Open the file with mode=ro, for readers such as the Dash
+            app; writes raise "attempt to write a readonly database".
+
+    Returns:
+        Engine: SQLAlchemy engine.
+    """
+    if read_only:
+        url = f"sqlite:///{Path(database_path).resolve().as_uri()}?mode=ro&uri=true"
+    else:
+        url = f"sqlite:///{database_path}"
+    engine = create_engine(url, connect_args={"timeout": SQLITE_BUSY_TIMEOUT})
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, read_only)
+
+    return engine
+
 
 # Create a SQLAlchemy engine for Alembic
-ENGINE = create_engine(f'sqlite:///{DATABASE_PATH}')
+ENGINE = create_sqlite_engine(DATABASE_PATH)
 Session = sessionmaker(bind=ENGINE)
 
+# Read-only engine for the Dash app; the file is only opened on first use
+READ_ONLY_ENGINE = create_sqlite_engine(DATABASE_PATH, read_only=True)
+ReadOnlySession = sessionmaker(bind=READ_ONLY_ENGINE)
+
 def main():
     # Perform database operations here
     pass
@@ -2,6 +2,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, Integer, String
 from sqlitedb.connection import Session
+from sqlitedb.query_cache import invalidate_table
 
 # Define the base class for the ORM models
 Base = declarative_base()
@@ -26,7 +27,61 @@ def truncate_table(model):
         print(f"Error truncating table {model.__tablename__}: {e}")
     finally:
         session.close()
-    
+        invalidate_table(model)
+
+
+def delete_data_from_sqlite(model, filters: dict = None, date_range: tuple = None, chunk_size: int = 500) -> int:
+    """
+    Delete rows from a SQLite table using ORM model with optional filters and date range.
+
+    A list value in filters matches any of its items (IN), and is sent in
+    chunks of chunk_size to stay under SQLite's bound-parameter limit.
+
+    Parameters:
+        model: SQLAlchemy ORM model.
+        filters (dict): Dictionary of column-value pairs for the WHERE clause.
+        date_range (tuple): Tuple containing the start and end dates for filtering.
+        chunk_size (int): Maximum number of values per IN clause.
+
+    Returns:
+        int: Number of rows deleted.
+    """
+    if not filters and not date_range:
+        raise ValueError("A WHERE clause or date range must be provided to delete data.")
+
+    filters = dict(filters or {})
+    list_column, list_values = None, [None]
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            list_column, list_values = column, list(value)
+            break
+    if list_column is not None:
+        filters.pop(list_column)
+
+    session = Session()
+    deleted = 0
+    try:
+        for i in range(0, len(list_values), chunk_size):
+            query = session.query(model)
+            if date_range:
+                start_date, end_date = date_range
+                query = query.filter(model.Date.between(start_date, end_date))
+            for column, value in filters.items():
+                query = query.filter(getattr(model, column) == value)
+            if list_column is not None:
+                query = query.filter(getattr(model, list_column).in_(list_values[i:i + chunk_size]))
+            deleted += query.delete(synchronize_session=False)
+        session.commit()
+        print(f"Deleted {deleted} rows from table {model.__tablename__} successfully.")
+    except Exception as e:
+        session.rollback()
+        print(f"Error deleting data from table {model.__tablename__}: {e}")
+        raise e
+    finally:
+        session.close()
+        invalidate_table(model)
+    return deleted
+
 # Function to delete data from the table
 def delete_user(user_id):
     try:
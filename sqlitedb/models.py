@@ -1,5 +1,5 @@
 """Module to store firebase table(collections) names and Alembic data models."""
-from sqlalchemy import Column, Integer, String, Float, Date, MetaData, Table, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, MetaData, Table, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -13,6 +13,10 @@ class TableList:
     SP500_SECTOR_INFO = 'SP500_SECTOR_INFO'
     SP500_STOCKS_PRICE = 'SP500_STOCKS_PRICE'
     STOCKS_PRICE = 'STOCKS_PRICE'
+    RETURN_SNAPSHOT = 'RETURN_SNAPSHOT'
+    LOG_RETURN_INDEX = 'LOG_RETURN_INDEX'
+    SPLIT_ADJUSTMENT = 'SPLIT_ADJUSTMENT'
+    BACKFILL_ATTEMPT = 'BACKFILL_ATTEMPT'
 # Association table for the many-to-many relationship
 watchlist_association = Table(
     'watchlist_association', Base.metadata,
@@ -57,7 +61,12 @@ class StocksPrice(Base):
     Volume = Column(Integer)
     StockSplits = Column(Integer)
     IndexName = Column(String)
-    
+    # Clustered on (Ticker, Date); the covering index serves date-first reads
+    __table_args__ = (
+        Index('ix_STOCKS_PRICE_Date_Ticker_Close', 'Date', 'Ticker', 'Close'),
+        {'sqlite_with_rowid': False},
+    )
+
 
 class WatchListTickers(Base):
     __tablename__ = 'WatchListTickers'
@@ -106,4 +115,40 @@ class TickerInfo(Base):
     ROA = Column(Float)
     Description = Column(String)
     Website = Column(String)
-    LastUpdated = Column(Date)
\ No newline at end of file
+    LastUpdated = Column(Date)
+
+
+class ReturnSnapshot(Base):
+    __tablename__ = TableList.RETURN_SNAPSHOT
+    Ticker = Column(String, primary_key=True)
+    Date = Column(Date, primary_key=True)
+    Period = Column(String, primary_key=True)
+    Return = Column(Float)
+    __table_args__ = (Index('ix_RETURN_SNAPSHOT_Date', 'Date'),)
+
+
+class LogReturnIndex(Base):
+    __tablename__ = TableList.LOG_RETURN_INDEX
+    Ticker = Column(String, primary_key=True)
+    Date = Column(Date, primary_key=True)
+    Close = Column(Float)
+    CumLogReturn = Column(Float)
+    __table_args__ = (Index('ix_LOG_RETURN_INDEX_Date', 'Date'),)
+
+
+class SplitAdjustment(Base):
+    """Audit of splits applied to stored StocksPrice history, one row per split."""
+    __tablename__ = TableList.SPLIT_ADJUSTMENT
+    Ticker = Column(String, primary_key=True)
+    SplitDate = Column(Date, primary_key=True)
+    Factor = Column(Float)
+    AdjustedBefore = Column(Date)
+    RowsAdjusted = Column(Integer)
+    AppliedOn = Column(Date)
+
+
+class BackfillAttempt(Base):
+    """Last session each ticker has been fetched through, whether or not rows came back."""
+    __tablename__ = TableList.BACKFILL_ATTEMPT
+    Ticker = Column(String, primary_key=True)
+    AttemptedThrough = Column(Date)
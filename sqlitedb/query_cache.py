@@ -0,0 +1,170 @@
+"""
+Process-level read-through cache for read_data_from_sqlite.
+
+Frames are kept in LRU order under a byte budget and keyed by the database,
+table, filters, date range, columns and flags of the read. Writers in
+sqlitedb/write.py, update.py and delete.py call invalidate_table() after they
+commit, which drops every cached read of that table.
+
+Writes made by another process are not seen, so the cache is off unless a
+process turns it on with enable_query_cache(). Only the daily batch run does:
+it is the one writer, and the Dash app must keep seeing its commits.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import pandas as pd
+
+# Budget of enable_query_cache(); 0 keeps the cache off even when enabled
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(256 * 2**20)))
+
+
+def _freeze(value) -> Hashable:
+    """Hashable form of a filter value; list, tuple and set filters all mean IN."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, set):
+        return tuple(sorted(value, key=repr))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class QueryCache:
+    """
+    LRU of DataFrames bounded by their total memory usage in bytes.
+
+    Frames are copied on the way in and on the way out, so callers can modify
+    what they get back. A frame larger than the whole budget is not stored.
+    Each table has a generation that invalidation bumps; a read started
+    before a write committed is not stored, even if it finishes after.
+    """
+
+    def __init__(self, max_bytes: int = QUERY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @staticmethod
+    def make_key(database: str, model, filters=None, date_range=None, columns_to_select=None, is_distinct=None, columnar=False) -> tuple:
+        return (
+            database,
+            model.__tablename__,
+            _freeze(filters or {}),
+            _freeze(date_range),
+            tuple(columns_to_select) if columns_to_select else None,
+            bool(is_distinct),
+            bool(columnar),
+        )
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self._entries.get(key)
+            if df is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return df.copy()
+
+    def generation(self, table_name: str) -> tuple:
+        with self._lock:
+            return self._epoch, self._generations.get(table_name, 0)
+
+    def put(self, key: tuple, df: pd.DataFrame, generation: tuple) -> None:
+        """Store the result of a read that started at the given table generation."""
+        size = _frame_bytes(df)
+        if size > self.max_bytes:
+            return
+        df = df.copy()
+        with self._lock:
+            if (self._epoch, self._generations.get(key[1], 0)) != generation:
+                return
+            if key in self._entries:
+                self._bytes -= self._sizes.pop(key)
+                del self._entries[key]
+            self._entries[key] = df
+            self._sizes[key] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+
+    def invalidate(self, table_name: str) -> int:
+        """Drop every cached read of table_name, in any database."""
+        with self._lock:
+            self._generations[table_name] = self._generations.get(table_name, 0) + 1
+            stale = [key for key in self._entries if key[1] == table_name]
+            for key in stale:
+                del self._entries[key]
+                self._bytes -= self._sizes.pop(key)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Off (no budget) until enable_query_cache() is called
+_query_cache = QueryCache(max_bytes=0)
+
+
+def get_query_cache() -> QueryCache:
+    return _query_cache
+
+
+def set_query_cache(cache: QueryCache) -> QueryCache:
+    """Replace the process-wide cache, e.g. with a different byte budget."""
+    global _query_cache
+    _query_cache = cache
+    return cache
+
+
+def enable_query_cache(max_bytes: int = QUERY_CACHE_MAX_BYTES) -> QueryCache:
+    """Turn the cache on for this process; only for the process that does all the writing."""
+    return set_query_cache(QueryCache(max_bytes=max_bytes))
+
+
+def invalidate_table(model) -> int:
+    """Drop the cached reads of a model's table; called by every writer after commit."""
+    return _query_cache.invalidate(model.__tablename__)
+
+
+def clear_query_cache() -> None:
+    _query_cache.clear()
+
+
+def query_cache_stats() -> dict:
+    """Hit, miss, eviction and invalidation counts and the bytes held."""
+    return _query_cache.stats()
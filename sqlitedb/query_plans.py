@@ -0,0 +1,179 @@
+"""
+EXPLAIN QUERY PLAN check for the hot reads in sqlitedb/read.py.
+
+Each query is built with the same builders read.py executes and must be
+answered from the expected index without a temporary b-tree (an extra sort or
+GROUP BY pass). By default the plans are taken on a scratch database created
+from the models, filled with a few years of sample rows and ANALYZEd as the
+migration does, so the check runs anywhere:
+
+    python -m sqlitedb.query_plans
+    python -m sqlitedb.query_plans --database path/to/stock_analytics.db
+
+The exit status is 1 when any plan regresses. tests/test_query_plans.py runs
+the same checks on a scratch database migrated to the head revision.
+"""
+import argparse
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, NamedTuple
+
+from sqlalchemy import create_engine, insert, text
+
+from sqlitedb.models import Base, LogReturnIndex, ReturnSnapshot, StocksPrice
+from sqlitedb.read import build_date_coverage_query, build_read_query
+
+SAMPLE_START = date(2024, 1, 2)
+SAMPLE_END = date(2024, 6, 28)
+SAMPLE_TICKERS = ["AAPL", "MSFT", "NVDA"]
+# Shape of the scratch database: enough rows per ticker for SQLite's
+# statistics to look like the real table
+SCRATCH_TICKERS = 50
+SCRATCH_DAYS = 750
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    query: object
+    # Substring every plan must contain, e.g. the index that should serve it
+    expected: str
+    # Require the whole plan to be exactly expected
+    exact: bool = False
+
+
+def hot_queries() -> List[PlanCheck]:
+    """The reads the daily pipeline and the screens issue most often."""
+    close_columns = ["Date", "Ticker", "Close"]
+    return [
+        PlanCheck(
+            "ticker window (read_ticker_window)",
+            build_read_query(StocksPrice, {"Ticker": SAMPLE_TICKERS}, (SAMPLE_START, SAMPLE_END), close_columns)[1],
+            "SEARCH STOCKS_PRICE USING PRIMARY KEY",
+        ),
+        PlanCheck(
+            "single ticker history",
+            build_read_query(StocksPrice, {"Ticker": "AAPL"})[1],
+            "SEARCH STOCKS_PRICE USING PRIMARY KEY",
+        ),
+        PlanCheck(
+            "closes on one date",
+            build_read_query(StocksPrice, {"Date": SAMPLE_END}, columns_to_select=close_columns)[1],
+            "USING COVERING INDEX ix_STOCKS_PRICE_Date_Ticker_Close",
+        ),
+        PlanCheck(
+            "closes in a date window",
+            build_read_query(StocksPrice, date_range=(SAMPLE_START, SAMPLE_END), columns_to_select=close_columns)[1],
+            "USING COVERING INDEX ix_STOCKS_PRICE_Date_Ticker_Close",
+        ),
+        PlanCheck(
+            "full rows in a date window",
+            build_read_query(StocksPrice, date_range=(SAMPLE_START, SAMPLE_END))[1],
+            "USING INDEX ix_STOCKS_PRICE_Date_Ticker_Close",
+        ),
+        PlanCheck(
+            # Walks the primary key and skips ahead to the next Ticker; any
+            # other index or a temporary b-tree would read every row
+            "distinct tickers",
+            build_read_query(StocksPrice, columns_to_select=["Ticker"], is_distinct=True)[1],
+            "SCAN STOCKS_PRICE",
+            exact=True,
+        ),
+        PlanCheck(
+            "date coverage per ticker (read_date_coverage)",
+            build_date_coverage_query(StocksPrice, since=SAMPLE_START),
+            "SEARCH STOCKS_PRICE USING PRIMARY KEY (ANY(Ticker) AND Date>?)",
+            exact=True,
+        ),
+        PlanCheck(
+            "return snapshots in a date window",
+            build_read_query(ReturnSnapshot, date_range=(SAMPLE_START, SAMPLE_END))[1],
+            "USING INDEX ix_RETURN_SNAPSHOT_Date",
+        ),
+        PlanCheck(
+            "log-return index on window dates",
+            build_read_query(LogReturnIndex, {"Date": [SAMPLE_START, SAMPLE_END]}, columns_to_select=["Date", "Ticker", "CumLogReturn"])[1],
+            "USING INDEX ix_LOG_RETURN_INDEX_Date",
+        ),
+    ]
+
+
+def explain(connection, query) -> List[str]:
+    """Detail lines of EXPLAIN QUERY PLAN for a SQLAlchemy select."""
+    sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def load_sample_prices(engine) -> None:
+    """Fill STOCKS_PRICE of an empty database with sample prices and ANALYZE it."""
+    first_day = SAMPLE_END - timedelta(days=SCRATCH_DAYS)
+    days = [first_day + timedelta(days=i) for i in range(SCRATCH_DAYS + 1)]
+    tickers = SAMPLE_TICKERS + [f"T{i:04d}" for i in range(SCRATCH_TICKERS - len(SAMPLE_TICKERS))]
+    with engine.begin() as connection:
+        connection.execute(
+            insert(StocksPrice.__table__),
+            [{"Ticker": ticker, "Date": day, "Close": 100.0, "Volume": 0} for ticker in tickers for day in days],
+        )
+        connection.execute(text("ANALYZE"))
+
+
+def create_scratch_database(database_path: Path):
+    """
+    Create the schema from the models in a new SQLite file, load sample
+    prices and ANALYZE it.
+
+    Returns:
+        Engine: SQLAlchemy engine on the scratch database.
+    """
+    engine = create_engine(f"sqlite:///{database_path}")
+    Base.metadata.create_all(engine)
+    load_sample_prices(engine)
+    return engine
+
+
+def check_query_plans(engine) -> List[str]:
+    """
+    Explain every hot query and collect the plans that miss their index.
+
+    Parameters:
+        engine: SQLAlchemy engine of the database to check.
+
+    Returns:
+        List[str]: One message per failing query, empty when every plan is as expected.
+    """
+    failures = []
+    with engine.connect() as connection:
+        for check in hot_queries():
+            plan = explain(connection, check.query)
+            plan_text = " | ".join(plan)
+            if check.exact and plan_text != check.expected:
+                failures.append(f"{check.name}: expected exactly '{check.expected}', got '{plan_text}'")
+            elif check.expected not in plan_text:
+                failures.append(f"{check.name}: expected '{check.expected}', got '{plan_text}'")
+            elif "USE TEMP B-TREE" in plan_text:
+                failures.append(f"{check.name}: needs a temporary b-tree, got '{plan_text}'")
+            print(f"{check.name:<48}{plan_text}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the query plans of the hot reads")
+    parser.add_argument("--database", type=Path, help="SQLite file to check, a scratch database when omitted")
+    args = parser.parse_args()
+    if args.database:
+        failures = check_query_plans(create_engine(f"sqlite:///{args.database}"))
+    else:
+        with tempfile.TemporaryDirectory(prefix="query_plans_") as work_dir:
+            engine = create_scratch_database(Path(work_dir) / "query_plans.db")
+            failures = check_query_plans(engine)
+            engine.dispose()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("All hot queries use their indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,150 @@
+from datetime import date
+import numpy as np
 import pandas as pd
+from sqlalchemy import Date, Float, Integer, String, func, inspect, select
 from sqlitedb.connection import ENGINE, Session
 from sqlitedb.models import SP500StocksPrice, Users
+from sqlitedb.query_cache import get_query_cache
 from typing import Dict, Tuple, Optional, List
 
-def read_data_from_sqlite(model, filters: Dict[str, any] = None, date_range: Tuple[str, str] = None, columns_to_select: Optional[List[str]] = None, is_distinct: Optional[bool] = None) -> pd.DataFrame:
+# Session factory the read functions use unless a call passes its own. The
+# writer Session by default; the Dash app switches to ReadOnlySession.
+_read_session = Session
+
+def get_read_session():
+    return _read_session
+
+def set_read_session(session_factory):
+    """
+    Set the session factory used by read_data_from_sqlite, read_ticker_window
+    and read_date_coverage, e.g. ReadOnlySession in a process that never writes.
+    """
+    global _read_session
+    _read_session = session_factory
+    return session_factory
+
+def _column_array(values: tuple, column_type, columnar: bool):
+    """
+    Convert one raw cursor column to a typed array.
+
+    Floats become float64 and integers int64 (float64 when SQLite holds
+    fractions or NULLs in the column). Dates are parsed once per distinct
+    value into datetime.date objects, or datetime64 when columnar is set;
+    strings become categorical when columnar is set.
+    """
+    if isinstance(column_type, Float):
+        try:
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy()
+    if isinstance(column_type, Integer):
+        array = np.array(values)
+        if array.dtype.kind in "iuf":
+            return array
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy()
+    if isinstance(column_type, Date):
+        # NULLs get code -1, which indexes the trailing missing value
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        if columnar:
+            parsed = pd.to_datetime([str(value)[:10] for value in uniques] + [None])
+            return parsed[codes]
+        parsed = np.array([date.fromisoformat(str(value)[:10]) for value in uniques] + [None], dtype=object)
+        return parsed[codes]
+    if columnar and isinstance(column_type, String):
+        return pd.Categorical(values)
+    return np.array(values, dtype=object)
+
+
+def build_read_query(model, filters: Dict[str, any] = None, date_range: Tuple[str, str] = None, columns_to_select: Optional[List[str]] = None, is_distinct: Optional[bool] = None):
+    """
+    Build the select issued by read_data_from_sqlite.
+
+    Returns:
+        Tuple[Dict[str, Column], Select]: Selected columns by name and the query.
+    """
+    if columns_to_select:
+        columns = {col: getattr(model, col) for col in columns_to_select}
+    else:
+        columns = {attr.key: attr.columns[0] for attr in inspect(model).column_attrs}
+    query = select(*columns.values())
+    
+    if is_distinct:
+        query = query.distinct()
+        
+    if date_range:
+        start_date, end_date = date_range
+        query = query.where(model.Date.between(start_date, end_date))
+    
+    if filters:
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                query = query.where(getattr(model, column).in_(list(value)))
+            else:
+                query = query.where(getattr(model, column) == value)
+    return columns, query
+
+
+def _cache_key(session_factory, model, filters, date_range, columns_to_select, is_distinct, columnar) -> Optional[tuple]:
+    """Cache key of a read, None when the cache is off or a filter value is unhashable."""
+    cache = get_query_cache()
+    if cache.max_bytes <= 0:
+        return None
+    # Session may be rebound to another database file, e.g. by the benchmarks
+    bind = session_factory.kw.get("bind")
+    try:
+        key = cache.make_key(str(bind.url) if bind is not None else None, model, filters, date_range, columns_to_select, is_distinct, columnar)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def read_data_from_sqlite(model, filters: Dict[str, any] = None, date_range: Tuple[str, str] = None, columns_to_select: Optional[List[str]] = None, is_distinct: Optional[bool] = None, columnar: bool = False, use_cache: bool = True, session_factory=None) -> pd.DataFrame:
     """
     Read data from a SQLite table using ORM model with optional filters and date range.
+
+    Rows are fetched from the raw cursor of a Core select and converted one
+    column at a time, without building ORM instances. Results go through the
+    process-level cache in sqlitedb/query_cache.py until a writer changes the
+    table; every call returns its own copy.
     
     Parameters:
         model: SQLAlchemy ORM model.
         filters (Dict[str, any]): Dictionary of column-value pairs for filtering.
+            A list value matches any of its items (IN).
         date_range (Tuple[str, str]): Tuple containing the start and end dates for filtering.
         columns_to_select (Optional[List[str]]): List of columns to select.
         is_distinct (Optional[bool]): Whether to select distinct rows.
+        columnar (bool): Return Date as datetime64 and string columns such as Ticker
+            as categoricals, for bulk numeric consumers. By default dates are
+            datetime.date objects and strings are str, as with the ORM.
+        use_cache (bool): Look the read up in the query cache and store its result.
+        session_factory: sessionmaker to read through, defaults to get_read_session().
     
     Returns:
         pd.DataFrame: DataFrame containing the query results.
     """
-    session = Session()
+    session_factory = session_factory or get_read_session()
+    key = _cache_key(session_factory, model, filters, date_range, columns_to_select, is_distinct, columnar) if use_cache else None
+    if key is not None:
+        cached = get_query_cache().get(key)
+        if cached is not None:
+            return cached
+        generation = get_query_cache().generation(model.__tablename__)
+
+    session = session_factory()
     try:
-        query = session.query(model)
-   
-        if columns_to_select:
-            query = query.with_entities(*[getattr(model, col) for col in columns_to_select])
-        # else:
-        #     query = query.with_entities(*[getattr(model, col) for col in model.__table__.columns.keys()])
+        columns, query = build_read_query(model, filters, date_range, columns_to_select, is_distinct)
         
-        if is_distinct:
-            query = query.distinct()
-            
-        if date_range:
-            start_date, end_date = date_range
-            query = query.filter(model.Date.between(start_date, end_date))
+        result = session.connection().execute(query)
+        # Raw tuples straight from the DBAPI cursor, converted column by column below
+        rows = result.cursor.fetchall()
+        result.close()
         
-        if filters:
-            for column, value in filters.items():
-                query = query.filter(getattr(model, column) == value)
-        
-        results = query.all()
-        
-        if columns_to_select:
-            df = pd.DataFrame(results, columns=columns_to_select)
-        else:
-            df = pd.DataFrame([item.__dict__ for item in results])
-        # df = pd.DataFrame(results, columns=columns_to_select)
-        if '_sa_instance_state' in df.columns:
-            df.drop('_sa_instance_state', axis=1, inplace=True)
+        column_values = list(zip(*rows)) if rows else [()] * len(columns)
+        df = pd.DataFrame({
+            name: _column_array(values, column.type, columnar)
+            for (name, column), values in zip(columns.items(), column_values)
+        })
         
         print(f"Data read from SQLite successfully.")
         
@@ -55,8 +154,120 @@ def read_data_from_sqlite(model, filters: Dict[str, any] = None, date_range: Tup
     finally:
         session.close()
     
+    if key is not None:
+        get_query_cache().put(key, df, generation)
     return df
 
+def read_ticker_window(model, tickers: List[str], start_date=None, end_date=None, columns_to_select: Optional[List[str]] = None, pivot_values: Optional[str] = None, columnar: bool = False, chunk_size: int = 500, session_factory=None) -> pd.DataFrame:
+    """
+    Read the rows of many tickers within a date window, chunk_size tickers per
+    IN (...) query, instead of one query per ticker or a scan of every ticker.
+
+    Parameters:
+        model: SQLAlchemy ORM model with Ticker and Date columns.
+        tickers (List[str]): Tickers to read.
+        start_date: First date to read; the whole history when start_date and end_date are omitted.
+        end_date: Last date to read, inclusive.
+        columns_to_select (Optional[List[str]]): List of columns to select.
+        pivot_values (Optional[str]): When set, return this column as a Date x ticker
+            matrix with one column per requested ticker, in input order.
+        columnar (bool): Typed columns as in read_data_from_sqlite; a pivoted matrix
+            then has a DatetimeIndex.
+        chunk_size (int): Maximum number of tickers per IN clause.
+        session_factory: sessionmaker to read through, defaults to get_read_session().
+
+    Returns:
+        pd.DataFrame: Long rows, or the pivoted matrix when pivot_values is set.
+    """
+    if (start_date is None) != (end_date is None):
+        raise ValueError("Both start_date and end_date must be provided for a date window.")
+    tickers = list(dict.fromkeys(tickers))
+    date_range = (start_date, end_date) if start_date is not None else None
+    frames = [
+        read_data_from_sqlite(
+            model,
+            filters={"Ticker": tickers[i:i + chunk_size]},
+            date_range=date_range,
+            columns_to_select=columns_to_select,
+            columnar=columnar,
+            session_factory=session_factory,
+        )
+        for i in range(0, len(tickers), chunk_size)
+    ]
+    if frames:
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        df = read_data_from_sqlite(model, filters={"Ticker": []}, columns_to_select=columns_to_select, columnar=columnar, session_factory=session_factory)
+    if columnar and "Ticker" in df.columns:
+        # Chunks carry their own categories; share the requested ticker list
+        df["Ticker"] = pd.Categorical(df["Ticker"], categories=tickers)
+    if pivot_values is None:
+        return df
+    return pivot_ticker_window(df, tickers, pivot_values)
+
+def pivot_ticker_window(df: pd.DataFrame, tickers: List[str], pivot_values: str) -> pd.DataFrame:
+    """Date x ticker matrix of pivot_values with one column per ticker, in input order."""
+    if df.empty:
+        return pd.DataFrame(index=pd.Index([], name="Date"), columns=pd.Index(tickers, dtype=object), dtype=float)
+
+    matrix = df.pivot_table(index="Date", columns="Ticker", values=pivot_values, aggfunc="last", observed=True)
+    matrix = matrix.reindex(columns=tickers).sort_index()
+    matrix.columns = pd.Index(tickers, dtype=object)
+    matrix.columns.name = None
+    return matrix
+
+def build_date_coverage_query(model, since=None, group_column: str = "Ticker", date_column: str = "Date"):
+    """
+    Build the GROUP BY select issued by read_date_coverage.
+
+    With since, the Date >= since range lets SQLite skip-scan the (Ticker, Date)
+    primary key instead of reading every row.
+    """
+    group = getattr(model, group_column)
+    date_col = getattr(model, date_column)
+    query = select(group, func.min(date_col), func.max(date_col), func.count(date_col)).group_by(group)
+    if since is not None:
+        query = query.where(date_col >= since)
+    return query
+
+def read_date_coverage(model, since=None, group_column: str = "Ticker", date_column: str = "Date", session_factory=None) -> pd.DataFrame:
+    """
+    First date, last date and row count per group (by default per ticker) in one GROUP BY query.
+
+    Parameters:
+        model: SQLAlchemy ORM model.
+        since: Only read rows on or after this date; the first and last dates and
+            the count then cover those rows, and groups with none are left out.
+        group_column (str): Column to group by.
+        date_column (str): Date column to aggregate.
+        session_factory: sessionmaker to read through, defaults to get_read_session().
+
+    Returns:
+        pd.DataFrame: One row per group with group_column, FirstDate, LastDate and Rows columns.
+    """
+    session = (session_factory or get_read_session())()
+    try:
+        query = build_date_coverage_query(model, since, group_column, date_column)
+        results = session.execute(query).all()
+        df = pd.DataFrame(results, columns=[group_column, "FirstDate", "LastDate", "Rows"])
+        print("Data read from SQLite successfully.")
+    except Exception as e:
+        print(f"Error reading data from SQLite: {e}")
+        raise e
+    finally:
+        session.close()
+    return df
+
+def read_last_dates(model, group_column: str = "Ticker", date_column: str = "Date") -> pd.DataFrame:
+    """
+    Latest date stored per group (by default per ticker) in one MAX(Date) GROUP BY query.
+
+    Returns:
+        pd.DataFrame: One row per group with group_column and LastDate columns.
+    """
+    coverage = read_date_coverage(model, group_column=group_column, date_column=date_column)
+    return coverage[[group_column, "LastDate"]]
+
 def main():
     filters = {"Ticker": 'AAPL'}
     date_range = ('2023-10-01', '2023-10-31')
@@ -0,0 +1,385 @@
+"""
+Price storage backends behind the read and write helpers.
+
+SQLite stays the system of record: the backfill planner, split adjustments
+and the log-return index work on its tables. The PRICE_STORE environment
+variable selects where price reads such as the scanner's close matrix are
+served from:
+
+    sqlite   - the STOCKS_PRICE / INDEX_PRICE tables (default)
+    parquet  - a columnar copy under PARQUET_STORE_DIR, one file per year
+               (and optionally per ticker bucket), kept in step with SQLite
+               by sync_price_store() after each ingest
+    cube     - closes from the memory-mapped float32 cube under
+               CLOSE_CUBE_DIR (see sqlitedb.close_cube), other columns
+               from SQLite
+
+The Parquet copy is populated the first time with:
+
+    python -m sqlitedb.storage
+"""
+import argparse
+import logging
+import os
+import zlib
+from datetime import date
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, Float, Integer, inspect
+
+from sqlitedb.close_cube import apply_to_close_cube, open_close_cube
+from sqlitedb.models import IndexPrice, SplitAdjustment, StocksPrice
+from sqlitedb.read import pivot_ticker_window, read_data_from_sqlite, read_ticker_window
+from sqlitedb.update import merge_data_in_sqlite
+from sqlitedb.write import bulk_upsert_data_to_sqlite
+
+logger = logging.getLogger('stock_analytics')
+
+PARQUET_STORE_DIR = Path(os.getenv("PARQUET_STORE_DIR", Path(__file__).parent / "parquet"))
+# 0 partitions by year only; N > 0 also splits each year into N ticker buckets
+PARQUET_TICKER_BUCKETS = int(os.getenv("PARQUET_TICKER_BUCKETS", "0"))
+PRICE_MODELS = [StocksPrice, IndexPrice]
+
+
+class PriceStore:
+    """
+    Storage for daily price tables keyed by the model's primary key.
+
+    read_ticker_window() has the signature and output of
+    sqlitedb.read.read_ticker_window; write() and merge() the semantics of
+    bulk_upsert_data_to_sqlite and merge_data_in_sqlite.
+    """
+
+    name = "base"
+
+    def read_ticker_window(
+        self,
+        model,
+        tickers: List[str],
+        start_date=None,
+        end_date=None,
+        columns_to_select: Optional[List[str]] = None,
+        pivot_values: Optional[str] = None,
+        columnar: bool = False,
+    ) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def write(self, model, data: pd.DataFrame) -> tuple:
+        raise NotImplementedError
+
+    def merge(self, model, data: pd.DataFrame) -> tuple:
+        return self.write(model, data)
+
+
+class SQLiteStore(PriceStore):
+    """The SQLite tables themselves."""
+
+    name = "sqlite"
+
+    def read_ticker_window(self, model, tickers, start_date=None, end_date=None, columns_to_select=None,
+                           pivot_values=None, columnar=False) -> pd.DataFrame:
+        return read_ticker_window(model, tickers, start_date, end_date, columns_to_select, pivot_values, columnar)
+
+    def write(self, model, data: pd.DataFrame) -> tuple:
+        return bulk_upsert_data_to_sqlite(model, data)
+
+    def merge(self, model, data: pd.DataFrame) -> tuple:
+        return merge_data_in_sqlite(model, data)
+
+
+class ParquetStore(PriceStore):
+    """
+    Prices as Parquet files under root/<table>/year=YYYY[/bucket=NN]/part-0.parquet.
+
+    Reads prune partitions by year (and ticker bucket) and push the Date and
+    Ticker predicates and the column projection down to the Parquet scan.
+    Writes rewrite only the partitions the rows fall in. Numeric columns are
+    stored as float64, since SQLite Integer columns such as StockSplits can
+    hold fractional values.
+    """
+
+    name = "parquet"
+
+    def __init__(self, root: Optional[Path] = None, ticker_buckets: Optional[int] = None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The parquet price store needs pyarrow: pip install pyarrow") from e
+        self.root = Path(root or PARQUET_STORE_DIR)
+        self.ticker_buckets = PARQUET_TICKER_BUCKETS if ticker_buckets is None else ticker_buckets
+
+    def _table_dir(self, model) -> Path:
+        return self.root / model.__tablename__
+
+    def _bucket(self, ticker: str) -> int:
+        return zlib.crc32(ticker.encode()) % self.ticker_buckets
+
+    def _partition_path(self, model, year: int, bucket: Optional[int]) -> Path:
+        path = self._table_dir(model) / f"year={year}"
+        if bucket is not None:
+            path = path / f"bucket={bucket:02d}"
+        return path / "part-0.parquet"
+
+    def _schema(self, model):
+        import pyarrow as pa
+
+        fields = []
+        for column in model.__table__.columns:
+            if isinstance(column.type, Date):
+                fields.append(pa.field(column.name, pa.date32()))
+            elif isinstance(column.type, (Float, Integer)):
+                fields.append(pa.field(column.name, pa.float64()))
+            else:
+                fields.append(pa.field(column.name, pa.string()))
+        return pa.schema(fields)
+
+    def _to_arrow(self, model, frame: pd.DataFrame):
+        import pyarrow as pa
+
+        schema = self._schema(model)
+        arrays = []
+        for field in schema:
+            values = frame[field.name] if field.name in frame.columns else pd.Series([None] * len(frame))
+            if pa.types.is_date32(field.type):
+                values = pd.to_datetime(values).dt.date
+            elif pa.types.is_floating(field.type):
+                values = pd.to_numeric(values, errors="coerce").astype("float64")
+            else:
+                values = values.astype(object).where(values.notna(), None)
+            arrays.append(pa.array(values.tolist(), type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def read_ticker_window(self, model, tickers, start_date=None, end_date=None, columns_to_select=None,
+                           pivot_values=None, columnar=False) -> pd.DataFrame:
+        import pyarrow.dataset as ds
+
+        if (start_date is None) != (end_date is None):
+            raise ValueError("Both start_date and end_date must be provided for a date window.")
+        tickers = list(dict.fromkeys(tickers))
+        columns = list(columns_to_select or [column.name for column in model.__table__.columns])
+
+        table_dir = self._table_dir(model)
+        if tickers and table_dir.exists():
+            dataset = ds.dataset(table_dir, format="parquet", partitioning="hive")
+            predicate = ds.field("Ticker").isin(tickers)
+            if start_date is not None:
+                start_date, end_date = pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()
+                predicate &= (ds.field("year") >= start_date.year) & (ds.field("year") <= end_date.year)
+                predicate &= (ds.field("Date") >= start_date) & (ds.field("Date") <= end_date)
+            if self.ticker_buckets:
+                predicate &= ds.field("bucket").isin(sorted({self._bucket(ticker) for ticker in tickers}))
+            table = dataset.to_table(columns=columns, filter=predicate)
+            df = table.to_pandas(date_as_object=not columnar)
+        else:
+            df = pd.DataFrame({column: pd.Series(dtype=object) for column in columns})
+
+        if "Ticker" in df.columns:
+            if columnar:
+                df["Ticker"] = pd.Categorical(df["Ticker"], categories=tickers)
+            else:
+                df["Ticker"] = df["Ticker"].astype(object)
+        if columnar and "Date" in df.columns:
+            df["Date"] = pd.to_datetime(df["Date"])
+        print("Data read from Parquet successfully.")
+        if pivot_values is None:
+            return df
+        return pivot_ticker_window(df, tickers, pivot_values)
+
+    def write(self, model, data: pd.DataFrame) -> tuple:
+        """
+        Upsert rows by primary key, rewriting each partition they fall in.
+
+        Only the frame's columns are written; other columns of an existing
+        row keep their values.
+
+        Returns:
+            tuple: (inserted, updated) row counts.
+        """
+        import pyarrow.parquet as pq
+
+        key_columns = [column.key for column in inspect(model).primary_key]
+        columns = [column for column in data.columns if column in model.__table__.columns]
+        data = data[columns].drop_duplicates(subset=key_columns, keep="last")
+        if data.empty:
+            return 0, 0
+        data = data.assign(Date=pd.to_datetime(data["Date"]).dt.date)
+
+        partition_keys = [pd.to_datetime(data["Date"]).dt.year.to_numpy()]
+        if self.ticker_buckets:
+            partition_keys.append(np.array([self._bucket(ticker) for ticker in data["Ticker"]]))
+        inserted = updated = 0
+        for keys, incoming in data.groupby(partition_keys):
+            keys = keys if isinstance(keys, tuple) else (keys,)
+            year, bucket = int(keys[0]), (int(keys[1]) if self.ticker_buckets else None)
+            path = self._partition_path(model, year, bucket)
+            incoming = incoming.set_index(key_columns)
+            if path.exists():
+                stored = pq.read_table(path).to_pandas(date_as_object=True).set_index(key_columns)
+                matched = incoming.index.intersection(stored.index)
+                stored.loc[matched, incoming.columns] = incoming.loc[matched]
+                added = incoming.loc[incoming.index.difference(stored.index)]
+                combined = pd.concat([stored, added]) if len(added) else stored
+            else:
+                matched, added, combined = incoming.index[:0], incoming, incoming
+            combined = combined.reset_index().sort_values(["Ticker", "Date"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write next to the partition and swap, so readers never see a partial
+            # file; pyarrow datasets skip names starting with "_", even if a
+            # write is interrupted and the temp file is left behind
+            temp_path = path.with_name(f"_{path.name}.tmp")
+            pq.write_table(self._to_arrow(model, combined), temp_path)
+            os.replace(temp_path, path)
+            inserted += len(added)
+            updated += len(matched)
+        print(f"Upserted {len(data)} rows into Parquet table {model.__tablename__}: {inserted} inserted, {updated} updated.")
+        return inserted, updated
+
+
+class CubeStore(PriceStore):
+    """
+    Closes from the memory-mapped close cube, so a cold read of the whole
+    universe is a page-cache hit instead of a SQL query.
+
+    Reads asking for columns other than Date, Ticker and Close, or for a
+    table without a cube, go to SQLite. Closes come back from float32, so
+    they match SQLite to about seven significant digits. Writes update the
+    cube in place or append the new days.
+    """
+
+    name = "cube"
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root
+        self._sqlite = SQLiteStore()
+        self._cubes = {}
+
+    def _cube(self, model):
+        cube = self._cubes.get(model.__tablename__)
+        if cube is None or cube.is_stale():
+            cube = open_close_cube(model, self.root)
+            self._cubes[model.__tablename__] = cube
+        return cube
+
+    def read_ticker_window(self, model, tickers, start_date=None, end_date=None, columns_to_select=None,
+                           pivot_values=None, columnar=False) -> pd.DataFrame:
+        columns = list(columns_to_select or [column.name for column in model.__table__.columns])
+        cube = self._cube(model) if model in PRICE_MODELS else None
+        if cube is None or not set(columns) <= {"Date", "Ticker", "Close"} or pivot_values not in (None, "Close"):
+            return self._sqlite.read_ticker_window(
+                model, tickers, start_date, end_date, columns_to_select, pivot_values, columnar
+            )
+        if (start_date is None) != (end_date is None):
+            raise ValueError("Both start_date and end_date must be provided for a date window.")
+        tickers = list(dict.fromkeys(tickers))
+        matrix = cube.matrix(tickers, start_date, end_date)
+        if pivot_values is not None:
+            if not columnar:
+                matrix.index = pd.Index(matrix.index.date, name="Date")
+            return matrix
+
+        df = matrix.stack().dropna().rename("Close").rename_axis(["Date", "Ticker"]).reset_index()
+        df = df.sort_values(["Ticker", "Date"], ignore_index=True)
+        if columnar:
+            df["Ticker"] = pd.Categorical(df["Ticker"], categories=tickers)
+        else:
+            df["Date"] = df["Date"].dt.date
+            df["Ticker"] = df["Ticker"].astype(object)
+        return df[columns]
+
+    def write(self, model, data: pd.DataFrame) -> tuple:
+        if model not in PRICE_MODELS or "Close" not in data.columns:
+            return 0, 0
+        return apply_to_close_cube(model, data, self.root)
+
+
+PRICE_STORES = {
+    SQLiteStore.name: SQLiteStore,
+    ParquetStore.name: ParquetStore,
+    CubeStore.name: CubeStore,
+}
+
+_PRICE_STORE: Optional[PriceStore] = None
+
+
+def get_price_store() -> PriceStore:
+    """
+    Process-wide price store, chosen by the PRICE_STORE environment variable
+    (sqlite, parquet or cube). Defaults to sqlite.
+    """
+    global _PRICE_STORE
+    if _PRICE_STORE is None:
+        store_name = os.getenv("PRICE_STORE", SQLiteStore.name)
+        if store_name not in PRICE_STORES:
+            raise ValueError(f"Unknown PRICE_STORE '{store_name}', expected one of {list(PRICE_STORES)}")
+        _PRICE_STORE = PRICE_STORES[store_name]()
+        logger.info(f"Using price store '{store_name}'.")
+    return _PRICE_STORE
+
+
+def set_price_store(store: PriceStore) -> None:
+    """Swap the process-wide price store, e.g. to compare backends in a benchmark."""
+    global _PRICE_STORE
+    _PRICE_STORE = store
+
+
+def sync_price_store(model=StocksPrice, tickers: Optional[List[str]] = None, since: Optional[date] = None,
+                     store: Optional[PriceStore] = None) -> int:
+    """
+    Copy SQLite price rows into a non-SQLite store.
+
+    Rows dated on or after since are copied for the given tickers. Tickers
+    with a split adjustment applied today get their full history copied,
+    since the adjustment rescaled rows before since.
+
+    Parameters:
+        model: SQLAlchemy ORM model holding the prices.
+        tickers (Optional[List[str]]): Tickers to copy, all stored tickers when omitted.
+        since (Optional[date]): First date to copy, the full history when omitted.
+        store (Optional[PriceStore]): Target store, defaults to get_price_store().
+
+    Returns:
+        int: Number of rows copied.
+    """
+    store = store or get_price_store()
+    if isinstance(store, SQLiteStore):
+        return 0
+    if tickers is None:
+        tickers = read_data_from_sqlite(model, columns_to_select=["Ticker"], is_distinct=True)["Ticker"].tolist()
+
+    copied = 0
+    full_history = set()
+    if since is not None and model == StocksPrice:
+        adjusted = read_data_from_sqlite(SplitAdjustment, filters={"AppliedOn": date.today()},
+                                         columns_to_select=["Ticker"])
+        full_history = set(adjusted["Ticker"]) & set(tickers)
+    if full_history:
+        price_df = read_ticker_window(model, sorted(full_history))
+        store.write(model, price_df)
+        copied += len(price_df)
+    recent = [ticker for ticker in tickers if ticker not in full_history]
+    if recent:
+        if since is None:
+            price_df = read_ticker_window(model, recent)
+        else:
+            price_df = read_ticker_window(model, recent, since, date.today())
+        store.write(model, price_df)
+        copied += len(price_df)
+    logger.info(f"Copied {copied} {model.__tablename__} rows to the {store.name} price store.")
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy SQLite price tables into the Parquet price store")
+    parser.add_argument("--since", type=date.fromisoformat, help="First date to copy, the full history by default")
+    args = parser.parse_args()
+
+    store = ParquetStore()
+    for model in PRICE_MODELS:
+        sync_price_store(model, since=args.since, store=store)
+
+
+if __name__ == "__main__":
+    main()
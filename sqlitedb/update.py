@@ -1,7 +1,13 @@
+from typing import Optional
+
 from alembic import op
+import pandas as pd
 import sqlalchemy as sa
+from sqlalchemy import inspect, or_
+from sqlalchemy.dialects.sqlite import insert
 from sqlitedb.connection import ENGINE, Session
 from sqlitedb.models import SP500StocksPrice
+from sqlitedb.query_cache import invalidate_table
 
 def upsert_data_in_sqlite(model, set_values: dict, filters: dict=None, date_range: tuple = None) -> None:
     """
@@ -41,6 +47,97 @@ def upsert_data_in_sqlite(model, set_values: dict, filters: dict=None, date_rang
         print(f"Error upserting data in SQLite table {model.__tablename__}: {e}")
     finally:
         session.close()
+        invalidate_table(model)
+
+def merge_data_in_sqlite(model, data: pd.DataFrame, chunk_size: int = 5000, changed_column: Optional[str] = None) -> tuple:
+    """
+    Set-based upsert of a DataFrame by primary key in one transaction.
+
+    The rows are bulk-loaded into a temporary staging table and applied with
+    a single INSERT ... SELECT ... ON CONFLICT DO UPDATE. Stored rows whose
+    values already match are left untouched. Only the frame's columns are
+    written. When a key repeats within data the last row wins.
+
+    Parameters:
+        model: SQLAlchemy ORM model.
+        data (pd.DataFrame): Rows to merge, including the primary key columns.
+        chunk_size (int): Rows per executemany batch into the staging table.
+        changed_column (Optional[str]): Also collect the distinct values of this
+            column (e.g. Ticker) among the rows the merge inserts or updates.
+
+    Returns:
+        tuple: (inserted, updated) row counts; unchanged rows are in neither.
+            With changed_column, (inserted, updated, changed) where changed is
+            the set of that column's values with inserted or updated rows.
+    """
+    table = model.__table__
+    key_columns = [column.key for column in inspect(model).primary_key]
+    columns = [column for column in data.columns if column in table.columns]
+    data = data[columns].drop_duplicates(subset=key_columns, keep="last")
+    if data.empty:
+        return (0, 0, set()) if changed_column else (0, 0)
+
+    staging = sa.Table(
+        f"_staging_{table.name}",
+        sa.MetaData(),
+        *[sa.Column(column, table.c[column].type) for column in columns],
+        prefixes=["TEMPORARY"],
+    )
+    update_columns = [column for column in columns if column not in key_columns]
+    merge = insert(table).from_select(
+        columns, sa.select(*[staging.c[column] for column in columns]).where(sa.true())
+    )
+    if update_columns:
+        merge = merge.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: merge.excluded[column] for column in update_columns},
+            # Skip rows whose stored values are already the corrected ones
+            where=or_(*[table.c[column].is_distinct_from(merge.excluded[column]) for column in update_columns]),
+        )
+    else:
+        merge = merge.on_conflict_do_nothing(index_elements=key_columns)
+    staged_rows = staging.join(table, sa.and_(*[staging.c[column] == table.c[column] for column in key_columns]))
+    matched_query = sa.select(sa.func.count()).select_from(staged_rows)
+    changed_query = None
+    if changed_column:
+        # Staged rows with no stored match are inserts; matched ones count when a value differs
+        all_staged_rows = staging.outerjoin(table, sa.and_(*[staging.c[column] == table.c[column] for column in key_columns]))
+        changed_query = sa.select(staging.c[changed_column]).distinct().select_from(all_staged_rows).where(
+            or_(
+                table.c[key_columns[0]].is_(None),
+                *[table.c[column].is_distinct_from(staging.c[column]) for column in update_columns],
+            )
+        )
+
+    records = data.to_dict(orient="records")
+    session = Session()
+    try:
+        connection = session.connection()
+        staging.create(connection)
+        try:
+            for i in range(0, len(records), chunk_size):
+                connection.execute(staging.insert(), records[i:i + chunk_size])
+            matched = connection.execute(matched_query).scalar()
+            # Read before the merge, while stored rows still hold their old values
+            changed = set(connection.execute(changed_query).scalars()) if changed_query is not None else set()
+            affected = connection.execute(merge).rowcount
+        finally:
+            staging.drop(connection)
+        session.commit()
+        inserted = len(records) - matched
+        updated = affected - inserted
+        print(
+            f"Merged {len(records)} rows into table {model.__tablename__}: "
+            f"{inserted} inserted, {updated} updated, {matched - updated} unchanged."
+        )
+    except Exception as e:
+        session.rollback()
+        print(f"Error merging data into SQLite table {model.__tablename__}: {e}")
+        raise e
+    finally:
+        session.close()
+        invalidate_table(model)
+    return (inserted, updated, changed) if changed_column else (inserted, updated)
 
 def main():
     set_values = {"Ticker": 'AAPL', "Date": '2023-10-15', "Close": 155.0}
@@ -1,8 +1,11 @@
 from sqlalchemy.orm import Session
 import pandas as pd
+from sqlalchemy import func, inspect, select, tuple_
+from sqlalchemy.dialects.sqlite import insert
 from sqlitedb.connection import ENGINE, Session
 from sqlitedb.models import SP500StocksPrice
 from sqlitedb.delete import truncate_table
+from sqlitedb.query_cache import invalidate_table
 
 import logging
 
@@ -28,6 +31,70 @@ def write_data_to_sqlite(model, data: pd.DataFrame,clear_existing_data=False) ->
 
     finally:
         session.close()
+        invalidate_table(model)
+
+def bulk_upsert_data_to_sqlite(model, data: pd.DataFrame, chunk_size: int = 5000) -> tuple:
+    """
+    Insert or update rows by primary key with INSERT ... ON CONFLICT DO UPDATE.
+
+    Rows are sent chunk_size at a time through executemany, all in one
+    transaction, so a duplicate key overwrites the stored row instead of
+    failing the batch. Only the frame's columns are written; other columns of
+    an existing row are left as they are. When a key repeats within data the
+    last row wins.
+
+    Parameters:
+        model: SQLAlchemy ORM model.
+        data (pd.DataFrame): DataFrame containing the rows to write.
+        chunk_size (int): Rows per executemany batch.
+
+    Returns:
+        tuple: (inserted, updated) row counts.
+    """
+    table = model.__table__
+    key_columns = [column.key for column in inspect(model).primary_key]
+    columns = [column for column in data.columns if column in table.columns]
+    data = data[columns].drop_duplicates(subset=key_columns, keep="last")
+    if data.empty:
+        return 0, 0
+
+    statement = insert(table)
+    update_columns = [column for column in columns if column not in key_columns]
+    if update_columns:
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: statement.excluded[column] for column in update_columns},
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=key_columns)
+    key = tuple_(*[table.c[column] for column in key_columns])
+
+    records = data.to_dict(orient="records")
+    inserted = updated = 0
+    session = Session()
+    try:
+        connection = session.connection()
+        for i in range(0, len(records), chunk_size):
+            chunk = records[i:i + chunk_size]
+            # Keys already stored are the rows the upsert will update
+            existing = connection.execute(
+                select(func.count()).select_from(table).where(
+                    key.in_([tuple(record[column] for column in key_columns) for record in chunk])
+                )
+            ).scalar()
+            connection.execute(statement, chunk)
+            updated += existing
+            inserted += len(chunk) - existing
+        session.commit()
+        print(f"Upserted {len(records)} rows into table {model.__tablename__}: {inserted} inserted, {updated} updated.")
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error upserting data into SQLite table {model.__tablename__}: {e}")
+        raise e
+    finally:
+        session.close()
+        invalidate_table(model)
+    return inserted, updated
 
 def main():
     # Example DataFrame
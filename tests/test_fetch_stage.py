@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+from data.fetch_stage import fetch_cancelled, run_fetch_stage
+from data.providers import MarketDataProvider
+
+
+class StubProvider(MarketDataProvider):
+    """Offline provider with a fixed delay per ticker and tickers that fail."""
+
+    name = "stub"
+
+    def __init__(self, delays=None, failing=()):
+        self.delays = delays or {}
+        self.failing = set(failing)
+
+    def history(self, ticker, period=None, start_date=None, end_date=None):
+        time.sleep(self.delays.get(ticker, 0))
+        if ticker in self.failing:
+            raise ValueError(f"no data for {ticker}")
+        return pd.DataFrame(
+            {"Date": [date(2024, 1, 2)], "Ticker": [ticker], "Close": [1.0], "Volume": [100], "StockSplits": [0.0]}
+        )
+
+
+def test_results_keep_ticker_order():
+    provider = StubProvider(delays={"AAA": 0.2, "BBB": 0.0, "CCC": 0.1})
+    tickers = ["AAA", "BBB", "CCC"]
+
+    results = run_fetch_stage(tickers, provider.history, max_workers=3, timeout=5)
+
+    assert [result.ticker for result in results] == tickers
+    assert all(result.ok for result in results)
+    assert results[0].latency >= 0.2
+
+
+def test_errors_are_logged_per_ticker(caplog):
+    provider = StubProvider(failing={"BAD"})
+
+    with caplog.at_level(logging.ERROR, logger="stock_analytics"):
+        results = run_fetch_stage(["GOOD", "BAD"], provider.history, max_workers=2, timeout=5)
+
+    assert results[0].ok
+    assert isinstance(results[1].error, ValueError)
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == ["Error fetching data for BAD: no data for BAD"]
+
+
+def test_timed_out_fetch_skips_its_write():
+    provider = StubProvider(delays={"SLOW": 0.5})
+    written = []
+    finished = threading.Event()
+
+    def fetch_and_write(ticker):
+        try:
+            df = provider.history(ticker)
+            if not fetch_cancelled():
+                written.append(ticker)
+            return df
+        finally:
+            if ticker == "SLOW":
+                finished.set()
+
+    results = run_fetch_stage(["SLOW", "FAST"], fetch_and_write, max_workers=2, timeout=0.1)
+
+    assert isinstance(results[0].error, TimeoutError)
+    assert results[1].ok
+    assert finished.wait(timeout=5)
+    assert written == ["FAST"]
+
+
+def test_timeout_runs_from_task_start():
+    # With one worker FAST queues behind SLOW; its deadline starts when it runs
+    provider = StubProvider(delays={"SLOW": 1.0, "FAST": 0.4})
+
+    results = run_fetch_stage(["SLOW", "FAST"], provider.history, max_workers=1, timeout=0.5)
+
+    assert isinstance(results[0].error, TimeoutError)
+    assert results[1].ok
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+
+from sqlitedb.query_plans import explain, hot_queries, load_sample_prices
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Hot queries that read every ticker by design; all others must not scan STOCKS_PRICE
+FULL_SCAN_QUERIES = {"distinct tickers": "SCAN STOCKS_PRICE"}
+
+
+@pytest.fixture(scope="module")
+def plan_connection(tmp_path_factory):
+    """Connection to a scratch database migrated to the head revision and filled with sample prices."""
+    url = f"sqlite:///{tmp_path_factory.mktemp('query_plans') / 'head.db'}"
+    config = Config()
+    config.set_main_option("script_location", str(REPO_ROOT / "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    engine = create_engine(url)
+    load_sample_prices(engine)
+    with engine.connect() as connection:
+        yield connection
+    engine.dispose()
+
+
+@pytest.mark.parametrize("check", hot_queries(), ids=lambda check: check.name)
+def test_hot_query_uses_its_index(plan_connection, check):
+    plan = " | ".join(explain(plan_connection, check.query))
+
+    if check.name in FULL_SCAN_QUERIES:
+        assert plan == FULL_SCAN_QUERIES[check.name]
+    else:
+        assert "SCAN STOCKS_PRICE" not in plan
+        assert check.expected in plan
+    assert "USE TEMP B-TREE" not in plan